@@ -0,0 +1,18 @@
+"""Benchmarks for the catalog searcher, which run entirely offline, using the
+test fixtures and local stand-ins for the upstream APIs. See "Benchmarks" in
+docs/DevelopmentSetup.md."""
+import subprocess
+from pathlib import Path
+
+# root directory of the repository
+REPO_DIR = Path(__file__).parent.parent
+
+
+def git_commit() -> str | None:
+    """Return the commit hash of the repository's HEAD, if it can be found."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
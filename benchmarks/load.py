@@ -0,0 +1,356 @@
+"""Offline load test of the catalog searcher.
+
+Starts the upstream stand-ins from `benchmarks.stubs`, runs `catalog-searcher`
+in a subprocess with its backends pointed at them, sends it a fixed number of
+search requests at the given concurrency, and reports the throughput, the
+latency percentiles, and the resident memory of the server process. The
+results are saved as JSON, so that runs can be compared over time:
+
+    python -m benchmarks.load --concurrency 20 --latency 150 --jitter 50
+    python -m benchmarks.load --compare benchmarks/results/load-20250101-120000.json
+
+Requires the "test" extra dependencies (for `psutil` and `python-dotenv`).
+"""
+import json
+import os
+import platform
+import re
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from math import ceil
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Any, NamedTuple, Sequence
+from urllib.parse import urlencode
+
+import click
+import psutil
+import requests
+from dotenv import dotenv_values
+
+from benchmarks import REPO_DIR, git_commit
+from benchmarks.stubs import Latency, StubServer
+
+# query strings of the searches to send, other than the query itself
+DEFAULT_SEARCHES = (
+    'backend=primo&endpoint=books-and-more',
+    'backend=primo&endpoint=articles',
+    'backend=alma&endpoint=books-and-more',
+    'backend=worldcat&endpoint=books-and-more',
+)
+DEFAULT_QUERIES = ('maryland', 'chesapeake bay', 'cheese making', 'climate change', 'baltimore')
+
+# settings with upstream URLs, whose scheme and host are replaced by those of the stub server
+UPSTREAM_URL_SETTINGS = (
+    'ALMA_SRU_URL_TEMPLATE',
+    'PRIMO_BOOK_SEARCH_API_URL_TEMPLATE',
+    'PRIMO_ARTICLE_SEARCH_API_URL_TEMPLATE',
+    'PRIMO_JOURNAL_SEARCH_API_URL_TEMPLATE',
+    'PRIMO_GENERAL_SEARCH_API_URL_TEMPLATE',
+    'WORLDCAT_API_BASE',
+)
+
+
+class Sample(NamedTuple):
+    search: str
+    status: int
+    seconds: float
+
+
+def server_env(stub_url: str, cache_ttl: int) -> dict[str, str]:
+    """Build the environment of the server process: the test configuration,
+    with all upstream URLs pointing to the stub server."""
+    settings = {name: value or '' for name, value in dotenv_values(REPO_DIR / 'tests/data/env').items()}
+    for name in UPSTREAM_URL_SETTINGS:
+        settings[name] = re.sub(r'^https?://[^/]+', stub_url, settings[name])
+    settings['WORLDCAT_TOKEN_URL'] = stub_url + '/token'
+    settings['SEARCH_CACHE_TTL'] = str(cache_ttl)
+    settings['FLASK_DEBUG'] = 'false'
+    return {**os.environ, **settings}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class AppServer:
+    """The catalog searcher, run with `catalog-searcher` in a subprocess."""
+    def __init__(self, env: dict[str, str], threads: int, server: str = 'waitress', log_path: str = os.devnull):
+        self.env = env
+        self.threads = threads
+        self.server = server
+        self.log_path = log_path
+        self.port = free_port()
+        self.process: subprocess.Popen | None = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.port}'
+
+    def start(self, timeout: float = 30.0):
+        with open(self.log_path, 'ab') as log:
+            self.process = subprocess.Popen(
+                [
+                    sys.executable, '-c', 'from catalog_searcher.server import run; run()',
+                    '--listen', f'127.0.0.1:{self.port}', '--threads', str(self.threads), '--server', self.server,
+                ],
+                env=self.env,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+            )
+        give_up_at = time.monotonic() + timeout
+        while time.monotonic() < give_up_at:
+            if self.process.poll() is not None:
+                raise click.ClickException(
+                    f'Server exited with status {self.process.returncode}; use --server-log to see its output'
+                )
+            try:
+                requests.get(self.url + '/ping', timeout=1).raise_for_status()
+                return
+            except requests.RequestException:
+                time.sleep(0.1)
+        raise click.ClickException(f'Server did not start within {timeout} seconds')
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait(timeout=10)
+
+    def rss(self) -> int:
+        assert self.process is not None, 'server has not been started'
+        return psutil.Process(self.process.pid).memory_info().rss
+
+
+class MemoryMonitor(Thread):
+    """Samples the resident memory of the server process every `interval` seconds,
+    keeping the peak."""
+    def __init__(self, server: AppServer, interval: float = 0.1):
+        super().__init__(name='memory-monitor', daemon=True)
+        self.server = server
+        self.interval = interval
+        self.peak = server.rss()
+        self._stopped = Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.peak = max(self.peak, self.server.rss())
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def build_urls(base_url: str, searches: Sequence[str], queries: Sequence[str]) -> list[tuple[str, str]]:
+    """Return the (search, URL) pairs to request, in order; every search is
+    combined with every query."""
+    return [
+        (search, f'{base_url}/search?{search}&{urlencode({"q": query})}')
+        for query in queries
+        for search in searches
+    ]
+
+
+def send_requests(urls: list[tuple[str, str]], total: int, concurrency: int) -> list[Sample]:
+    """Send `total` requests, cycling through the `urls`, from `concurrency`
+    threads, each with its own keep-alive session."""
+    samples: list[Sample] = []
+    lock = Lock()
+    sent = 0
+
+    def worker():
+        nonlocal sent
+        session = requests.Session()
+        while True:
+            with lock:
+                if sent >= total:
+                    return
+                search, url = urls[sent % len(urls)]
+                sent += 1
+            started = time.perf_counter()
+            try:
+                status = session.get(url).status_code
+            except requests.RequestException:
+                status = 0
+            samples.append(Sample(search, status, time.perf_counter() - started))
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='load') as executor:
+        for _ in range(concurrency):
+            executor.submit(worker)
+    return samples
+
+
+def percentile(sorted_values: Sequence[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def latency_summary(samples: Sequence[Sample]) -> dict[str, float]:
+    """Latency percentiles, mean, and maximum, in milliseconds."""
+    seconds = sorted(sample.seconds for sample in samples)
+    summary = {f'p{p}': percentile(seconds, p) for p in (50, 95, 99)}
+    summary['mean'] = sum(seconds) / len(seconds) if seconds else 0.0
+    summary['max'] = seconds[-1] if seconds else 0.0
+    return {name: round(value * 1000, 2) for name, value in summary.items()}
+
+
+def summarize(samples: list[Sample], duration: float) -> dict[str, Any]:
+    by_search: dict[str, list[Sample]] = {}
+    for sample in samples:
+        by_search.setdefault(sample.search, []).append(sample)
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if sample.status != 200),
+        'duration': round(duration, 3),
+        'throughput': round(len(samples) / duration, 2) if duration else 0.0,
+        'latency_ms': latency_summary(samples),
+        'searches': {
+            search: {
+                'requests': len(search_samples),
+                'errors': sum(1 for sample in search_samples if sample.status != 200),
+                'latency_ms': latency_summary(search_samples),
+            }
+            for search, search_samples in by_search.items()
+        },
+    }
+
+
+def print_report(results: dict[str, Any], previous: dict[str, Any] | None = None):
+    def line(label: str, path: Sequence[str], unit: str = ''):
+        value: Any = results
+        old: Any = previous
+        for key in path:
+            value = value[key]
+            old = old.get(key) if isinstance(old, dict) else None
+        number_format = ',d' if isinstance(value, int) else ',.2f'
+        text = f'{label:<14} {value:>12{number_format}}{unit}'
+        if isinstance(old, (int, float)) and old:
+            text += f'   (was {old:{number_format}}{unit}, {(value - old) / old:+.1%})'
+        click.echo(text)
+
+    line('throughput', ('results', 'throughput'), ' req/s')
+    for p in ('p50', 'p95', 'p99', 'max'):
+        line(f'latency {p}', ('results', 'latency_ms', p), ' ms')
+    for stage in ('start', 'peak', 'end'):
+        line(f'rss {stage}', ('results', 'rss_mb', stage), ' MB')
+    line('errors', ('results', 'errors'))
+
+
+@click.command()
+@click.option('-c', '--concurrency', default=10, help='Number of concurrent clients. Defaults to 10.')
+@click.option('-n', '--requests', 'total', default=2000, help='Number of requests to measure. Defaults to 2000.')
+@click.option('--warmup', default=100, help='Number of requests to send before measuring. Defaults to 100.')
+@click.option('-t', '--threads', default=10, help='Number of server threads (waitress only). Defaults to 10.')
+@click.option(
+    '-s', '--server', type=click.Choice(['waitress', 'uvicorn']), default='waitress',
+    help='Server to run the app with. Defaults to "waitress".',
+)
+@click.option('--latency', default=100.0, help='Mean delay of the stub upstream responses, in ms. Defaults to 100.')
+@click.option('--jitter', default=20.0, help='Maximum random variation of the delay, in ms. Defaults to 20.')
+@click.option('--seed', default=0, help='Seed for the random jitter. Defaults to 0.')
+@click.option(
+    '--cache-ttl', default=0,
+    help='Value of SEARCH_CACHE_TTL for the server. Defaults to 0, so every search goes upstream.',
+)
+@click.option(
+    '--search', 'searches', multiple=True, default=DEFAULT_SEARCHES, show_default=True,
+    help='Query string of a search to send, without the "q" parameter; may be repeated.',
+)
+@click.option(
+    '-q', '--query', 'queries', multiple=True, default=DEFAULT_QUERIES, show_default=True,
+    help='Search query to send; may be repeated.',
+)
+@click.option(
+    '-o', '--output-dir', type=click.Path(file_okay=False, path_type=Path), default=REPO_DIR / 'benchmarks/results',
+    help='Directory to save the results in. Defaults to "benchmarks/results".',
+)
+@click.option(
+    '--compare', type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help='Results of an earlier run to compare with.',
+)
+@click.option('--server-log', default=os.devnull, help='File to write the output of the server to.')
+def run(
+        concurrency: int,
+        total: int,
+        warmup: int,
+        threads: int,
+        server: str,
+        latency: float,
+        jitter: float,
+        seed: int,
+        cache_ttl: int,
+        searches: tuple[str, ...],
+        queries: tuple[str, ...],
+        output_dir: Path,
+        compare: Path | None,
+        server_log: str,
+):
+    """Load test the catalog searcher against local stand-ins for the upstream APIs."""
+    config = {
+        'concurrency': concurrency,
+        'requests': total,
+        'warmup': warmup,
+        'threads': threads,
+        'server': server,
+        'latency_ms': latency,
+        'jitter_ms': jitter,
+        'seed': seed,
+        'cache_ttl': cache_ttl,
+        'searches': list(searches),
+        'queries': list(queries),
+    }
+    stubs = StubServer(Latency(latency / 1000, jitter / 1000, seed))
+    stubs.start()
+    app_server = AppServer(server_env(stubs.url, cache_ttl), threads, server, server_log)
+    try:
+        app_server.start()
+        urls = build_urls(app_server.url, searches, queries)
+        send_requests(urls, warmup, concurrency)
+        stubs.requests.clear()
+
+        rss_start = app_server.rss()
+        monitor = MemoryMonitor(app_server)
+        monitor.start()
+        started = time.perf_counter()
+        samples = send_requests(urls, total, concurrency)
+        duration = time.perf_counter() - started
+        monitor.stop()
+        rss_end = app_server.rss()
+    finally:
+        app_server.stop()
+        stubs.stop()
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': config,
+        'results': {
+            **summarize(samples, duration),
+            'rss_mb': {
+                name: round(value / 2 ** 20, 2)
+                for name, value in (('start', rss_start), ('peak', monitor.peak), ('end', rss_end))
+            },
+            'upstream_requests': stubs.requests,
+        },
+    }
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_file = output_dir / f'load-{datetime.now():%Y%m%d-%H%M%S}.json'
+    output_file.write_text(json.dumps(results, indent=2) + '\n')
+
+    previous = json.loads(compare.read_text()) if compare else None
+    print_report(results, previous)
+    click.echo(f'Results saved to {output_file}')
+
+
+if __name__ == '__main__':
+    run()
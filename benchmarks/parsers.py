@@ -0,0 +1,312 @@
+"""Micro-benchmarks of the per-record and per-request hot paths: the backends'
+`parse_result()` methods, the full and selective decoding of Primo and WorldCat
+response bodies, Alma format classification, Primo subfield parsing, CQL query
+construction, and the pagination links.
+
+The inputs are built from the test fixtures, repeated to fill a page of
+`--per-page` records. Each benchmark reports its speed in operations (pages)
+per second, and the peak memory allocated while running one operation. The
+speeds are also normalized by the speed of a fixed pure-Python workload, so
+that results from different machines can be compared roughly.
+
+The results are compared with a stored baseline, and the command exits with
+status 1 if any benchmark is slower, or allocates more memory, than the
+baseline by more than the given thresholds:
+
+    python -m benchmarks.parsers
+    python -m benchmarks.parsers --update-baseline
+
+Requires the "test" extra dependencies (for `python-dotenv`).
+"""
+import json
+import platform
+import timeit
+import tracemalloc
+from datetime import datetime
+from io import BytesIO
+from itertools import cycle, islice
+from pathlib import Path
+from typing import Any, Callable, Iterable, NamedTuple, TypeVar
+
+import click
+from dotenv import load_dotenv
+from environs import Env
+
+from benchmarks import REPO_DIR, git_commit
+
+# the app reads its configuration from the environment when it is imported
+load_dotenv(REPO_DIR / 'tests/data/env')
+
+from catalog_searcher.app import get_pagination_links  # noqa: E402
+from catalog_searcher.search.alma import AlmaSearch, get_item_format  # noqa: E402
+from catalog_searcher.search.cql import cql  # noqa: E402
+from catalog_searcher.search.jsonstream import select  # noqa: E402
+from catalog_searcher.search.primo import PRIMO_RESPONSE_SELECTOR, PrimoSearch, parse_field  # noqa: E402
+from catalog_searcher.search.sru import SRUReader  # noqa: E402
+from catalog_searcher.search.worldcat import WORLDCAT_RESPONSE_SELECTOR, WorldcatSearch  # noqa: E402
+
+BASELINE_FILE = REPO_DIR / 'benchmarks/baseline.json'
+
+T = TypeVar('T')
+
+# a benchmark is set up with the number of records per page, and returns the operation to time
+Setup = Callable[[int], Callable[[], Any]]
+
+BENCHMARKS: dict[str, Setup] = {}
+
+
+def benchmark(name: str) -> Callable[[Setup], Setup]:
+    def _register(setup: Setup) -> Setup:
+        BENCHMARKS[name] = setup
+        return setup
+    return _register
+
+
+def page_of(items: Iterable[T], per_page: int) -> list[T]:
+    """Repeat the items to fill a page of `per_page` items."""
+    return list(islice(cycle(items), per_page))
+
+
+def read_fixture(path: str) -> bytes:
+    return (REPO_DIR / 'tests' / path).read_bytes()
+
+
+def primo_docs() -> list[dict[str, Any]]:
+    return [
+        doc
+        for path in ('data/primo_book_search_response.json', 'data/primo_article_search_response.json')
+        for doc in json.loads(read_fixture(path))['docs']
+    ]
+
+
+def primo_body(per_page: int) -> bytes:
+    """A Primo search response body with a page of `per_page` records."""
+    data = json.loads(read_fixture('data/primo_book_search_response.json'))
+    return json.dumps({**data, 'docs': page_of(primo_docs(), per_page)}).encode()
+
+
+def worldcat_body(per_page: int) -> bytes:
+    """A WorldCat search response body with a page of `per_page` records."""
+    data = json.loads(read_fixture('test_worldcat/response.json'))
+    return json.dumps({**data, 'detailedRecords': page_of(data['detailedRecords'], per_page)}).encode()
+
+
+def alma_records() -> list[Any]:
+    return list(SRUReader(BytesIO(read_fixture('data/alma_response.xml'))))
+
+
+@benchmark('primo_parse_result')
+def primo_parse_result(per_page: int) -> Callable[[], Any]:
+    search = PrimoSearch(PrimoSearch.configure(Env()), 'books', 'maryland', 0, per_page)
+    docs = page_of(primo_docs(), per_page)
+    return lambda: [search.parse_result(doc) for doc in docs]
+
+
+@benchmark('primo_decode')
+def primo_decode(per_page: int) -> Callable[[], Any]:
+    body = primo_body(per_page)
+    return lambda: json.loads(body)
+
+
+@benchmark('primo_decode_selective')
+def primo_decode_selective(per_page: int) -> Callable[[], Any]:
+    body = primo_body(per_page)
+    return lambda: select(body, PRIMO_RESPONSE_SELECTOR)
+
+
+@benchmark('primo_parse_field')
+def primo_parse_field(per_page: int) -> Callable[[], Any]:
+    # every subfield-coded value of a page of records
+    fields = [
+        value
+        for doc in page_of(primo_docs(), per_page)
+        for section in doc['pnx'].values()
+        for values in section.values()
+        if isinstance(values, list)
+        for value in values
+        if isinstance(value, str) and '$$' in value
+    ]
+    return lambda: [parse_field(field) for field in fields]
+
+
+@benchmark('alma_parse_result')
+def alma_parse_result(per_page: int) -> Callable[[], Any]:
+    search = AlmaSearch(AlmaSearch.configure(Env()), 'books', 'maryland', 0, per_page)
+    records = page_of(alma_records(), per_page)
+    return lambda: [search.parse_result(record) for record in records]
+
+
+@benchmark('alma_get_item_format')
+def alma_get_item_format(per_page: int) -> Callable[[], Any]:
+    records = page_of(alma_records(), per_page)
+    return lambda: [get_item_format(record) for record in records]
+
+
+@benchmark('worldcat_parse_result')
+def worldcat_parse_result(per_page: int) -> Callable[[], Any]:
+    search = WorldcatSearch(WorldcatSearch.configure(Env()), 'books', 'maryland', 0, per_page)
+    items = page_of(json.loads(read_fixture('test_worldcat/response.json'))['detailedRecords'], per_page)
+    return lambda: [search.parse_result(item) for item in items]
+
+
+@benchmark('worldcat_decode')
+def worldcat_decode(per_page: int) -> Callable[[], Any]:
+    body = worldcat_body(per_page)
+    return lambda: json.loads(body)
+
+
+@benchmark('worldcat_decode_selective')
+def worldcat_decode_selective(per_page: int) -> Callable[[], Any]:
+    body = worldcat_body(per_page)
+    return lambda: select(body, WORLDCAT_RESPONSE_SELECTOR)
+
+
+@benchmark('cql')
+def cql_construction(_per_page: int) -> Callable[[], Any]:
+    # the query built by AlmaSearch.build_request() for an articles search
+    def build() -> str:
+        query = cql('alma.all_for_ui', '=', 'chesapeake bay') & ('alma.mms_tagSuppressed', '=', 'false')
+        return str(cql('alma.genre_form', '=', 'article') & query)
+    return build
+
+
+@benchmark('pagination_links')
+def pagination_links(per_page: int) -> Callable[[], Any]:
+    url = f'http://localhost:5000/search?q=chesapeake+bay&backend=primo&endpoint=articles&per_page={per_page}&page=3'
+    return lambda: get_pagination_links(url, last_page=100)
+
+
+def calibration() -> Any:
+    """Fixed pure-Python workload, used to normalize the speeds of the benchmarks."""
+    values = {str(i): i * i for i in range(200)}
+    return sorted(values.items(), key=lambda item: (item[1] % 7, item[0]))
+
+
+class Measurement(NamedTuple):
+    ops_per_sec: float
+    peak_bytes: int
+
+
+def measure(op: Callable[[], Any], repeat: int) -> Measurement:
+    """Time the operation `repeat` times, with enough loops for each repeat to
+    take about 0.2 seconds, and keep the fastest. The memory is measured on a
+    single run, after a warm-up run, so that caches are already filled."""
+    timer = timeit.Timer(op)
+    loops, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=loops))
+
+    op()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        op()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return Measurement(loops / best, peak - start)
+
+
+def compare(
+        results: dict[str, Any],
+        baseline: dict[str, Any],
+        threshold: float,
+        memory_threshold: float,
+) -> list[str]:
+    """Return a description of each regression from the baseline. Speeds are
+    compared after normalizing them by the calibration speed of their run."""
+    regressions = []
+    for name, result in results['benchmarks'].items():
+        expected = baseline['benchmarks'].get(name)
+        if expected is None:
+            continue
+        speed = result['ops_per_sec'] / results['calibration_ops_per_sec']
+        expected_speed = expected['ops_per_sec'] / baseline['calibration_ops_per_sec']
+        if speed < expected_speed * (1 - threshold):
+            regressions.append(f'{name}: {speed / expected_speed - 1:+.1%} speed')
+        if result['peak_bytes'] > expected['peak_bytes'] * (1 + memory_threshold):
+            regressions.append(f'{name}: {result["peak_bytes"] / expected["peak_bytes"] - 1:+.1%} peak memory')
+    return regressions
+
+
+@click.command()
+@click.option('-p', '--per-page', default=25, help='Number of records in each parsed page. Defaults to 25.')
+@click.option('-r', '--repeat', default=5, help='Number of timing runs of each benchmark. Defaults to 5.')
+@click.option('-k', '--select', 'selected', help='Only run the benchmarks whose names contain this string.')
+@click.option(
+    '--threshold', default=0.25,
+    help='Proportion by which a benchmark may be slower than the baseline. Defaults to 0.25.',
+)
+@click.option(
+    '--memory-threshold', default=0.1,
+    help='Proportion by which a benchmark may allocate more memory than the baseline. Defaults to 0.1.',
+)
+@click.option(
+    '--baseline', type=click.Path(dir_okay=False, path_type=Path), default=BASELINE_FILE,
+    help='Baseline results file. Defaults to "benchmarks/baseline.json".',
+)
+@click.option('--update-baseline', is_flag=True, help='Save the results as the new baseline, instead of comparing.')
+@click.option(
+    '-o', '--output-dir', type=click.Path(file_okay=False, path_type=Path), default=REPO_DIR / 'benchmarks/results',
+    help='Directory to save the results in. Defaults to "benchmarks/results".',
+)
+def run(
+        per_page: int,
+        repeat: int,
+        selected: str | None,
+        threshold: float,
+        memory_threshold: float,
+        baseline: Path,
+        update_baseline: bool,
+        output_dir: Path,
+):
+    """Run the parser micro-benchmarks, and compare them with the baseline."""
+    calibration_speed = measure(calibration, repeat).ops_per_sec
+    measurements = {}
+    for name, setup in BENCHMARKS.items():
+        if selected and selected not in name:
+            continue
+        measurement = measure(setup(per_page), repeat)
+        measurements[name] = {
+            'ops_per_sec': round(measurement.ops_per_sec, 1),
+            'peak_bytes': measurement.peak_bytes,
+        }
+        click.echo(f'{name:<26} {measurement.ops_per_sec:>12,.1f} ops/s {measurement.peak_bytes:>12,d} bytes')
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'per_page': per_page,
+        'calibration_ops_per_sec': round(calibration_speed, 1),
+        'benchmarks': measurements,
+    }
+
+    if update_baseline:
+        baseline.write_text(json.dumps(results, indent=2) + '\n')
+        click.echo(f'Baseline saved to {baseline}')
+        return
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_file = output_dir / f'parsers-{datetime.now():%Y%m%d-%H%M%S}.json'
+    output_file.write_text(json.dumps(results, indent=2) + '\n')
+    click.echo(f'Results saved to {output_file}')
+
+    if not baseline.exists():
+        click.echo(f'No baseline at {baseline}; run with --update-baseline to create it')
+        return
+    baseline_results = json.loads(baseline.read_text())
+    if baseline_results.get('per_page') != per_page:
+        raise click.ClickException(f'The baseline was recorded with --per-page {baseline_results.get("per_page")}')
+    regressions = compare(results, baseline_results, threshold, memory_threshold)
+    if regressions:
+        click.echo('Regressions from the baseline:', err=True)
+        for regression in regressions:
+            click.echo(f'  {regression}', err=True)
+        raise SystemExit(1)
+    click.echo('No regressions from the baseline')
+
+
+if __name__ == '__main__':
+    run()
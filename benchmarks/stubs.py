@@ -0,0 +1,136 @@
+"""Local stand-ins for the upstream APIs (Primo, Alma SRU, WorldCat Discovery,
+and the OCLC OAuth token endpoint), which answer every request by replaying a
+response from the test fixtures after a configurable delay."""
+import json
+import logging
+import random
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Lock, Thread
+from typing import Mapping, NamedTuple
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks import REPO_DIR
+
+logger = logging.getLogger(__name__)
+
+FIXTURES_DIR = REPO_DIR / 'tests'
+
+
+class StubResponse(NamedTuple):
+    content_type: str
+    body: bytes
+
+
+def load_responses(fixtures_dir: Path = FIXTURES_DIR) -> dict[str, StubResponse]:
+    """Read the fixture responses, keyed by the name of the upstream API."""
+    def read(path: str) -> bytes:
+        return (fixtures_dir / path).read_bytes()
+
+    return {
+        'primo_books': StubResponse('application/json', read('data/primo_book_search_response.json')),
+        'primo_articles': StubResponse('application/json', read('data/primo_article_search_response.json')),
+        'alma': StubResponse('text/xml;charset=UTF-8', read('data/alma_response.xml')),
+        'worldcat': StubResponse('application/json', read('test_worldcat/response.json')),
+        # long-lived, so that the token endpoint is only hit once per run
+        'oauth': StubResponse('application/json', json.dumps({'access_token': 'TOKEN', 'expires_in': 1199}).encode()),
+    }
+
+
+def route(path: str, query: Mapping[str, list[str]]) -> str | None:
+    """Return the name of the upstream API that a request is for, or `None` if
+    it is not for any of them."""
+    if path.startswith('/primo/v1/search'):
+        return 'primo_articles' if query.get('tab') == ['Articles'] else 'primo_books'
+    if path.startswith('/view/sru'):
+        return 'alma'
+    if path.endswith('/detailed-bibs'):
+        return 'worldcat'
+    if path == '/token':
+        return 'oauth'
+    return None
+
+
+class Latency:
+    """Delay of each stub response: `mean` seconds, plus or minus a uniformly
+    distributed `jitter` of up to that many seconds. The jitter is drawn from a
+    generator seeded with `seed`, so that runs are repeatable."""
+    def __init__(self, mean: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        self.mean = mean
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = Lock()
+
+    def next(self) -> float:
+        if not self.jitter:
+            return self.mean
+        with self._lock:
+            offset = self._random.uniform(-self.jitter, self.jitter)
+        return max(0.0, self.mean + offset)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # keep connections open, as the real APIs do, so that the app's connection pools are exercised
+    protocol_version = 'HTTP/1.1'
+    # the headers and body are written separately, which would otherwise stall on delayed ACKs
+    disable_nagle_algorithm = True
+    server: 'StubServer'
+
+    def do_GET(self):
+        self.respond()
+
+    def do_POST(self):
+        # discard the body of token requests
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.respond()
+
+    def respond(self):
+        url = urlsplit(self.path)
+        name = route(url.path, parse_qs(url.query))
+        if name is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        time.sleep(self.server.latency.next())
+        self.server.count(name)
+        response = self.server.responses[name]
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', response.content_type)
+        self.send_header('Content-Length', str(len(response.body)))
+        self.end_headers()
+        self.wfile.write(response.body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+class StubServer(ThreadingHTTPServer):
+    """HTTP server for all the upstream stand-ins, which runs in a background
+    thread. Listens on a random port of the loopback interface by default."""
+    daemon_threads = True
+
+    def __init__(self, latency: Latency | None = None, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((host, port), StubHandler)
+        self.latency = latency or Latency()
+        self.responses = load_responses()
+        self.requests: dict[str, int] = {}
+        self._lock = Lock()
+        self._thread: Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.socket.getsockname()[:2]
+        return f'http://{host}:{port}'
+
+    def count(self, name: str):
+        with self._lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+
+    def start(self):
+        self._thread = Thread(target=self.serve_forever, name='stub-server', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -1,12 +1,36 @@
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from http import HTTPStatus
 from math import ceil
+from typing import Any, Mapping, NamedTuple
 
 from environs import Env
-from flask import Flask, request
+from flask import Flask, Response, g, request
+from flask.typing import ResponseReturnValue
 from urlobject import URLObject
 
-from catalog_searcher.search import Search, SearchError
+from catalog_searcher import metrics
+from catalog_searcher.capture import raw_capture
+from catalog_searcher.compression import compressor
+from catalog_searcher.httpcache import http_cache_policy
+from catalog_searcher.jsonprovider import SearchJSONProvider
+from catalog_searcher.logs import queue_logging
+from catalog_searcher.search import Search, SearchError, SearchResponse, SearchResult, SearchTimeout
+from catalog_searcher.search.breaker import CircuitOpen, circuit_breakers
+from catalog_searcher.search.cache import CacheKey, cache_key, normalize_query, search_cache
+from catalog_searcher.search.deadline import deadline_policy
+from catalog_searcher.search.federated import merge_results
+from catalog_searcher.search.jsonstream import response_decoder
+from catalog_searcher.search.pool import session_pool
+from catalog_searcher.search.prefetch import prefetcher
+from catalog_searcher.search.singleflight import search_flights
+from catalog_searcher.search.timing import Timings
+
+# valid values of the "endpoint" request parameter
+ENDPOINT_NAMES = ('books-and-more', 'articles', 'journals', 'general')
+
+logger = logging.getLogger(__name__)
 
 env = Env()
 env.read_env()
@@ -15,14 +39,116 @@ debug = env.bool('FLASK_DEBUG', default=False)
 default_page = env.int('DEFAULT_PAGE', 0)
 default_per_page = env.int('DEFAULT_PER_PAGE', 3)
 default_backend = env.str('SEARCH_BACKEND', 'primo')
+bento_endpoints = env.list('BENTO_ENDPOINTS', list(ENDPOINT_NAMES))
+federated_deadline = env.float('FEDERATED_DEADLINE', 10.0)
+search_block_size = env.int('SEARCH_BLOCK_SIZE', 0)
+search_block_sizes: dict[str, int] = env.dict('SEARCH_BLOCK_SIZES', subcast_values=int, default={})
 
-logging.basicConfig(
+queue_logging.configure(env)
+queue_logging.start(
     level=logging.DEBUG if debug else logging.INFO,
-    format='%(levelname)s:%(name)s:%(threadName)s:%(message)s',
+    fmt='%(levelname)s:%(name)s:%(threadName)s:%(message)s',
 )
 
+session_pool.configure(env)
+search_cache.configure(env)
+deadline_policy.configure(env)
+circuit_breakers.configure(env)
+prefetcher.configure(env)
+compressor.configure(env)
+http_cache_policy.configure(env)
+raw_capture.configure(env)
+response_decoder.configure(env)
+
+# bounded pool of threads used to run the searches for bento and federated requests concurrently
+search_executor = ThreadPoolExecutor(max_workers=env.int('SEARCH_MAX_WORKERS', 8), thread_name_prefix='search')
+
 app = Flask(__name__)
-app.config['JSON_AS_ASCII'] = False
+app.json = SearchJSONProvider(app)
+# send non-ASCII characters as UTF-8, instead of escaping them (Flask 3 no longer reads JSON_AS_ASCII)
+app.json.ensure_ascii = False
+
+metrics.registry.register(metrics.CallbackGauge(
+    'catalog_searcher_search_cache_hit_ratio',
+    'Proportion of search cache lookups that were hits',
+    lambda: {(): search_cache.stats()['hit_ratio']},
+))
+
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_started = time.monotonic()
+    g.metrics_route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    metrics.http_requests_in_flight.inc(g.metrics_route)
+
+
+@app.after_request
+def record_request_metrics(response: Response) -> Response:
+    record_request(response.status_code)
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(error: BaseException | None):
+    if 'metrics_started' not in g:
+        return
+    if error is not None:
+        # an unhandled exception, for which after_request functions are not called
+        record_request(HTTPStatus.INTERNAL_SERVER_ERROR)
+    metrics.http_requests_in_flight.dec(g.metrics_route)
+
+
+def record_request(status: int):
+    if 'metrics_started' not in g or 'metrics_recorded' in g:
+        return
+    g.metrics_recorded = True
+    backend, endpoint = g.get('metrics_labels', ('', ''))
+    labels = (g.metrics_route, backend, endpoint, str(status))
+    metrics.http_requests.inc(*labels)
+    metrics.http_request_duration.observe(*labels, value=time.monotonic() - g.metrics_started)
+
+
+@app.before_request
+def start_request_timing():
+    g.timings = Timings()
+    g.timing_started = time.perf_counter()
+
+
+@app.after_request
+def add_server_timing(response: Response) -> Response:
+    """Report the durations of the phases of the request, if it recorded any, in
+    a `Server-Timing` header, along with its total duration."""
+    if 'timings' in g and g.timings.durations:
+        g.timings.add('total', time.perf_counter() - g.timing_started)
+        response.headers['Server-Timing'] = g.timings.server_timing()
+    return response
+
+
+# registered after add_server_timing, so that it runs first, and the compression is timed
+@app.after_request
+def compress_search_response(response: Response) -> Response:
+    """Compress `/search` response bodies, with the encoding negotiated through
+    the `Accept-Encoding` request header."""
+    if request.endpoint == 'search':
+        started = time.perf_counter()
+        if compressor.compress_response(response, request.accept_encodings, g.get('search_cache_key')):
+            g.timings.add('compress', time.perf_counter() - started)
+    return response
+
+
+# registered after compress_search_response, so that it runs first, and a 304 response is not compressed
+@app.after_request
+def make_search_response_conditional(response: Response) -> Response:
+    """Add the ETag and `Cache-Control` headers to `/search` responses, and
+    answer the requests whose `If-None-Match` header matches with `304 Not Modified`."""
+    if request.endpoint == 'search' and 'search_params' in g:
+        http_cache_policy.apply(response, request, g.search_params.backends, g.search_params.endpoint)
+    return response
+
+
+def label_request(backend: str, endpoint: str):
+    """Set the backend and endpoint labels of the current request's metrics."""
+    g.metrics_labels = (backend, endpoint)
 
 
 @app.route('/')
@@ -35,67 +161,524 @@ def ping():
     return {'status': 'ok'}
 
 
+@app.route('/stats')
+def stats():
+    return {
+        'http_pools': session_pool.stats(),
+        'search_cache': search_cache.stats(),
+        'search_coalescing': search_flights.stats(),
+        'circuit_breakers': circuit_breakers.stats(),
+        'prefetch': prefetcher.stats(),
+        'compression': compressor.stats(),
+        'logging': queue_logging.stats(),
+        'raw_capture': raw_capture.stats(),
+    }
+
+
+@app.route('/metrics')
+def get_metrics():
+    return Response(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/debug/raw/<capture_id>')
+def get_raw_capture(capture_id: str):
+    """Return the full raw data of a captured search, in debug mode."""
+    data = raw_capture.load(capture_id) if debug else None
+    if data is None:
+        return error_response('debug', message=f'no raw capture with ID "{capture_id}"', status=HTTPStatus.NOT_FOUND)
+    return Response(data, mimetype='application/json')
+
+
 @app.route('/search')
 def search():
-    args = request.args
+    try:
+        params = parse_search_args(request.args)
+    except InvalidRequest as e:
+        return error_response(e.endpoint, message=str(e))
+
+    label_request(','.join(params.backends), params.endpoint)
+    g.search_params = params
+    capture = capture_requested()
+    # a captured search needs the upstream data, which is not cached
+    use_cache = use_cache_requested() and not capture
+    backend_statuses = None
+    try:
+        with g.timings.phase('search'):
+            if len(params.backends) > 1:
+                response, backend_statuses = run_federated_search(
+                    params.backends, params.endpoint, params.query, params.page, params.per_page, use_cache,
+                    params.timeout, include_raw=capture,
+                )
+            else:
+                response = run_search(
+                    params.backends[0], params.endpoint, params.query, params.page, params.per_page, use_cache,
+                    params.timeout, include_raw=capture,
+                )
+    except SearchTimeout as e:
+        return error_response(params.endpoint, message=str(e), status=HTTPStatus.GATEWAY_TIMEOUT)
+    except CircuitOpen as e:
+        return error_response(params.endpoint, message=str(e), status=HTTPStatus.SERVICE_UNAVAILABLE)
+    except SearchError as e:
+        return error_response(params.endpoint, message=str(e), status=HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    g.timings.update(response.timings)
+    if backend_statuses is None:
+        remember_cache_key(params, use_cache)
+    return json_response(build_search_response(params, response, request.url, backend_statuses, capture))
+
+
+class InvalidRequest(ValueError):
+    def __init__(self, *args, endpoint: str = ''):
+        super().__init__(*args)
+        self.endpoint = endpoint
+
 
-    # Defaulting to books and more search. Confirm with stakeholders.
-    endpoint = 'books-and-more'
-    if 'endpoint' in args and args['endpoint'] == 'articles':
-        endpoint = 'articles'
-    elif 'endpoint' in args and args['endpoint'] == 'journals':
-        endpoint = 'journals'
-    elif 'endpoint' in args and args['endpoint'] == 'books-and-more':
-        endpoint = 'books'
-    elif 'endpoint' in args and args['endpoint'] == 'general':
-        endpoint = 'general'
-
-    # Check query param
-    if 'q' not in args or args['q'] == '':
-        return error_response(endpoint, message='q parameter is required')
-    query = args['q']
+class SearchParams(NamedTuple):
+    endpoint: str
+    query: str
+    page: int
+    per_page: int
+    backends: list[str]
+    timeout: float | None = None
+
+
+def parse_search_args(args: Mapping[str, str]) -> SearchParams:
+    """Parse and validate the `/search` request parameters. Raises an `InvalidRequest`
+    if any of them are missing or invalid."""
+    endpoint = get_endpoint(args.get('endpoint'))
+
+    # Check query param; it is normalized as it is in the cache key, so that a
+    # cached response is only served for the query that was searched for
+    query = normalize_query(args.get('q', ''))
+    if query == '':
+        raise InvalidRequest('q parameter is required', endpoint=endpoint)
 
     try:
         per_page = int(args.get('per_page', default_per_page))
     except ValueError:
-        return error_response(endpoint, message='per_page parameter value is invalid; must be an integer')
+        per_page = 0
+    if per_page < 1:
+        raise InvalidRequest('per_page parameter value is invalid; must be a positive integer', endpoint=endpoint)
 
     try:
         page = int(args.get('page', default_page))
     except ValueError:
-        return error_response(endpoint, message='page parameter value is invalid; must be an integer')
+        raise InvalidRequest('page parameter value is invalid; must be an integer', endpoint=endpoint)
 
-    backend = args.get('backend', default_backend)
     try:
-        search_class = get_search_class(backend)
+        timeout = parse_timeout(args)
     except ValueError as e:
-        return error_response(endpoint, message=str(e))
+        raise InvalidRequest(str(e), endpoint=endpoint)
+
+    # a comma-separated list of backends requests a federated search
+    backends = list(dict.fromkeys(args.get('backend', default_backend).split(',')))
+    for name in backends:
+        try:
+            get_search_class(name)
+        except ValueError as e:
+            raise InvalidRequest(str(e), endpoint=endpoint)
+        if name not in backend_configs:
+            raise InvalidRequest(f'backend "{name}" is not enabled', endpoint=endpoint)
+
+    return SearchParams(endpoint, query, page, per_page, backends, timeout)
+
 
+def remember_cache_key(params: SearchParams, use_cache: bool):
+    """Record the key of the search cache entry of a single-backend search in
+    the request context, so that the compressed response body can be attached
+    to it. When the page is sliced from blocks of results, only the blocks are
+    cached, so the body is attached to the entry of the first block. Debug
+    responses include the request's timings, so they are never the same twice,
+    and are not attached."""
+    if not use_cache or debug:
+        return
+    backend = params.backends[0]
+    window = get_block_window(backend, params.page, params.per_page)
+    if window is None:
+        g.search_cache_key = cache_key(backend, params.endpoint, params.query, params.page, params.per_page)
+    else:
+        g.search_cache_key = cache_key(backend, params.endpoint, params.query, window.blocks[0], window.size)
+
+
+def parse_timeout(args: Mapping[str, str]) -> float | None:
+    """Parse the optional "timeout" request parameter, the number of seconds the
+    client is willing to wait for a search. Raises a `ValueError` if it is invalid."""
+    if not args.get('timeout'):
+        return None
     try:
-        response = search_class(env, endpoint, query, page, per_page).search()
-    except SearchError as e:
-        return error_response(endpoint, message=str(e), status=HTTPStatus.INTERNAL_SERVER_ERROR)
+        timeout = float(args['timeout'])
+    except ValueError:
+        timeout = 0
+    if not timeout > 0:
+        raise ValueError('timeout parameter value is invalid; must be a positive number of seconds')
+    return timeout
 
-    last_page = ceil(response.total / per_page)
+
+def build_search_response(
+        params: SearchParams,
+        response: SearchResponse,
+        request_url: str,
+        backend_statuses: dict[str, dict[str, Any]] | None = None,
+        capture: bool = False,
+) -> dict[str, Any]:
+    """Build the `/search` response body for a completed search. In debug mode,
+    the body includes the durations of the phases of the request so far, in
+    milliseconds, and any raw upstream data, which is captured if `capture` is
+    true."""
+    last_page = ceil(response.total / params.per_page)
+    with g.timings.phase('pagination'):
+        pagination_links = get_pagination_links(request_url, last_page=last_page)
 
     api_response = {
-        'results': response.results,
+        'results': serialize_results(response.results),
         'total': response.total,
-        'endpoint': endpoint,
-        'query': query,
-        'page': page,
-        'per_page': per_page,
+        'endpoint': params.endpoint,
+        'query': params.query,
+        'page': params.page,
+        'per_page': params.per_page,
         'module_link': response.module_link,
-        'backend': backend,
-        **get_pagination_links(request.url, last_page=last_page)
+        'backend': ','.join(params.backends),
+        **pagination_links,
     }
 
+    if backend_statuses is not None:
+        api_response['backends'] = backend_statuses
+        api_response['partial'] = any('error' in status for status in backend_statuses.values())
+
     if debug:
-        api_response['raw'] = response.raw
+        raw = raw_capture.capture(response.raw) if capture else response.raw
+        api_response['raw'] = {**raw, 'timings': g.timings.milliseconds()}
 
     return api_response
 
 
+def serialize_results(results: list[SearchResult | Mapping[str, Any]]) -> list[dict[str, Any]]:
+    """Return the fields of the results, which may be either `SearchResult`
+    objects or dictionaries, that are sent to the client. Their identifiers are
+    only used to remove duplicates from federated results."""
+    return [
+        {k: v for k, v in (result if isinstance(result, Mapping) else vars(result)).items() if k != 'identifiers'}
+        for result in results
+    ]
+
+
+def json_response(body: Any) -> ResponseReturnValue:
+    """Serialize a JSON response body, timing it as the "serialize" phase of the
+    request."""
+    with g.timings.phase('serialize'):
+        return app.json.response(body)
+
+
+@app.route('/bento')
+def bento():
+    """Run the searches for several endpoints of a single backend concurrently, and
+    return their results in a single response."""
+    args = request.args
+    names = args['endpoints'].split(',') if args.get('endpoints') else bento_endpoints
+
+    query = normalize_query(args.get('q', ''))
+    if query == '':
+        return error_response('bento', message='q parameter is required')
+
+    unknown_names = [name for name in names if name not in ENDPOINT_NAMES]
+    if unknown_names:
+        return error_response('bento', message=f'unknown endpoints: {", ".join(unknown_names)}')
+
+    try:
+        per_page = int(args.get('per_page', default_per_page))
+    except ValueError:
+        per_page = 0
+    if per_page < 1:
+        return error_response('bento', message='per_page parameter value is invalid; must be a positive integer')
+
+    try:
+        timeout = parse_timeout(args)
+    except ValueError as e:
+        return error_response('bento', message=str(e))
+
+    backend = args.get('backend', default_backend)
+    try:
+        get_search_class(backend)
+    except ValueError as e:
+        return error_response('bento', message=str(e))
+    if backend not in backend_configs:
+        return error_response('bento', message=f'backend "{backend}" is not enabled')
+
+    label_request(backend, '')
+    capture = capture_requested()
+    use_cache = use_cache_requested() and not capture
+    futures = {
+        name: search_executor.submit(
+            run_search, backend, get_endpoint(name), query, 0, per_page, use_cache, timeout, include_raw=capture,
+        )
+        for name in names
+    }
+
+    endpoints: dict[str, dict[str, Any]] = {}
+    for name, future in futures.items():
+        try:
+            with g.timings.phase('search'):
+                response = future.result()
+        except Exception as e:
+            # a failed endpoint only fails its own part of the response
+            endpoints[name] = {'error': {'msg': error_message(e, name)}}
+            continue
+        g.timings.update(response.timings, prefix=f'{name}.')
+        endpoints[name] = {
+            'results': serialize_results(response.results),
+            'total': response.total,
+            'module_link': response.module_link,
+        }
+        if debug:
+            endpoints[name]['raw'] = raw_capture.capture(response.raw) if capture else response.raw
+
+    return json_response({
+        'query': query,
+        'backend': backend,
+        'per_page': per_page,
+        'endpoints': endpoints,
+    })
+
+
+def run_federated_search(
+        backends: list[str],
+        endpoint: str,
+        query: str,
+        page: int,
+        per_page: int,
+        use_cache: bool = True,
+        timeout: float | None = None,
+        include_raw: bool = False,
+) -> tuple[SearchResponse, dict[str, dict[str, Any]]]:
+    """Run the same search on several backends concurrently, and merge their results,
+    dropping duplicate items, into a page of at most `per_page` results. Backends
+    that have not responded within the federated deadline are left out of the
+    response (their searches still finish in the background, and populate the cache).
+
+    Returns the merged response, along with a status for each backend, which has
+    either the backend's `total` and `module_link`, or an `error`. Raises a
+    `SearchTimeout` if none of the backends responded in time, or a `SearchError`
+    if none of the backends returned a response for any other reason."""
+    futures = {
+        name: search_executor.submit(
+            run_search, name, endpoint, query, page, per_page, use_cache, timeout, include_raw=include_raw,
+        )
+        for name in backends
+    }
+    wait(futures.values(), timeout=federated_deadline)
+
+    responses: dict[str, SearchResponse] = {}
+    statuses: dict[str, dict[str, Any]] = {}
+    timed_out = 0
+    for name, future in futures.items():
+        if not future.done():
+            logger.warning('Backend %s did not respond within %ss; omitting its results', name, federated_deadline)
+            statuses[name] = {'error': {'msg': f'no response within {federated_deadline} seconds'}}
+            timed_out += 1
+            continue
+        try:
+            responses[name] = future.result()
+        except Exception as e:
+            # a failed backend only fails its own part of the response
+            statuses[name] = {'error': {'msg': error_message(e, name)}}
+            timed_out += isinstance(e, SearchTimeout)
+            continue
+        statuses[name] = {'total': responses[name].total, 'module_link': responses[name].module_link}
+
+    if not responses:
+        if timed_out == len(futures):
+            raise SearchTimeout('No backend responded in time', endpoint=endpoint)
+        raise SearchError('No backend returned a response', endpoint=endpoint)
+
+    response = SearchResponse(
+        # each backend returns up to a page of results, so the merged list is cut back to one page
+        results=merge_results([r.results for r in responses.values()])[:per_page],
+        # summing the totals would count items found by several backends more than
+        # once; the largest total lets the pagination links reach the end of the longest list
+        total=max(r.total for r in responses.values()),
+        module_link=next(iter(responses.values())).module_link,
+        raw={name: r.raw for name, r in responses.items()},
+        timings={f'{name}.{phase}': seconds for name, r in responses.items() for phase, seconds in r.timings.items()},
+    )
+    return response, statuses
+
+
+def error_message(error: Exception, name: str) -> str:
+    """Return the message to report for a failed search in a bento or federated
+    response. Unexpected errors are logged, and reported as a plain search error."""
+    if isinstance(error, SearchError):
+        return str(error)
+    logger.error('Search of %s failed', name, exc_info=error)
+    return 'Search error'
+
+
+def capture_requested() -> bool:
+    """In debug mode, the raw upstream data is captured for the searches that
+    ask for it with a "raw=true" parameter, and for a sample of the others."""
+    return debug and raw_capture.requested(request.args)
+
+
+def use_cache_requested() -> bool:
+    """Clients can skip the search cache with a "Cache-Control: no-cache" header
+    or a "cache=false" parameter."""
+    return not (request.cache_control.no_cache or request.args.get('cache') == 'false')
+
+
+def get_endpoint(name: str | None) -> str:
+    """Map the value of the "endpoint" request parameter to the endpoint name used
+    by the backends."""
+    match name:
+        case 'articles' | 'journals' | 'general':
+            return name
+        case 'books-and-more':
+            return 'books'
+        case _:
+            # Defaulting to books and more search. Confirm with stakeholders.
+            return 'books-and-more'
+
+
+def run_search(
+        backend: str,
+        endpoint: str,
+        query: str,
+        page: int,
+        per_page: int,
+        use_cache: bool = True,
+        timeout: float | None = None,
+        prefetch_next: bool = True,
+        include_raw: bool = False,
+) -> SearchResponse:
+    """Run a search using the given backend. Unless `use_cache` is false, a cached
+    response is returned if there is one. Identical searches that are already in
+    progress are joined instead of being sent upstream again (and searched again
+    if the joined search times out while this search still has time left). Fresh
+    responses are always added to the cache, and unless `prefetch_next` is false,
+    the next page is prefetched if prefetching is enabled. If `include_raw` is
+    true, the response's `raw` field has all of the upstream data.
+
+    If block fetching is enabled for the backend, the page is sliced from the
+    aligned block (or blocks) of results that contain it, which are searched and
+    cached instead of the page itself.
+
+    The search must complete within the backend's configured timeout, or within
+    `timeout` seconds if that is shorter. Raises a `SearchTimeout` if it does not,
+    a `CircuitOpen` error without contacting the backend if its circuit breaker is
+    open, or a `SearchError` if the search fails."""
+    window = get_block_window(backend, page, per_page)
+    if window is None:
+        return fetch_page(backend, endpoint, query, page, per_page, use_cache, timeout, prefetch_next, include_raw)
+
+    responses: list[SearchResponse] = []
+    for block in window.blocks:
+        if responses and block * window.size >= responses[0].total:
+            # the page runs past the last result
+            break
+        responses.append(fetch_page(
+            backend, endpoint, query, block, window.size, use_cache, timeout, prefetch_next, include_raw,
+        ))
+    return window.slice(responses, per_page)
+
+
+def fetch_page(
+        backend: str,
+        endpoint: str,
+        query: str,
+        page: int,
+        per_page: int,
+        use_cache: bool = True,
+        timeout: float | None = None,
+        prefetch_next: bool = True,
+        include_raw: bool = False,
+) -> SearchResponse:
+    """Search for exactly the given page, using the cache, in-progress searches,
+    and prefetching as described for `run_search()`."""
+    key = cache_key(backend, endpoint, query, page, per_page)
+    if use_cache:
+        response = search_cache.get(key)
+        metrics.search_cache_lookups.inc(backend, 'miss' if response is None else 'hit')
+        if response is not None:
+            return response
+
+    deadline = deadline_policy.deadline(backend, timeout)
+    searched = False
+
+    def _search() -> SearchResponse:
+        nonlocal searched
+        searched = True
+        search = get_search_class(backend)(
+            backend_configs[backend], endpoint, query, page, per_page, deadline, include_raw=include_raw
+        )
+        try:
+            response = circuit_breakers.get(backend).call(search.search, deadline.client_limited)
+            response = response._replace(timings=search.timings.durations)
+        except Exception as e:
+            metrics.count_search_error(backend, e)
+            raise
+        metrics.observe_search(backend, endpoint, search)
+        cache_response(key, response)
+        if prefetch_next:
+            prefetch_next_page(backend, endpoint, query, page, per_page, response.total)
+        return response
+
+    while True:
+        try:
+            # a search for the raw data can't be served by one without it
+            return search_flights.do((key, include_raw), _search, timeout=deadline.remaining())
+        except TimeoutError:
+            raise deadline.error(endpoint)
+        except SearchTimeout:
+            # the search this caller joined may have had a shorter deadline than
+            # this caller's; if so, search again with the time that is left
+            if searched or deadline.expired:
+                raise
+
+
+class BlockWindow(NamedTuple):
+    """The aligned blocks of `size` results that contain a page of results,
+    which starts at `start` within the first block."""
+    blocks: range
+    size: int
+    start: int
+
+    def slice(self, responses: list[SearchResponse], per_page: int) -> SearchResponse:
+        """Return the response for the page, from the responses for the blocks."""
+        results = [result for response in responses for result in response.results]
+        timings = Timings()
+        for response in responses:
+            timings.update(response.timings)
+        return responses[0]._replace(results=results[self.start:self.start + per_page], timings=timings.durations)
+
+
+def get_block_window(backend: str, page: int, per_page: int) -> BlockWindow | None:
+    """Return the blocks to search for a page of results, or `None` if block
+    fetching is not enabled for the backend, or the page is at least as large
+    as a block."""
+    size = search_block_sizes.get(backend, search_block_size)
+    if size <= 0 or per_page >= size:
+        return None
+    first = page * per_page
+    last = first + per_page - 1
+    return BlockWindow(blocks=range(first // size, last // size + 1), size=size, start=first % size)
+
+
+def prefetch_next_page(backend: str, endpoint: str, query: str, page: int, per_page: int, total: int):
+    """Schedule a background search for the page after the given one, if there
+    is one, so that it is cached by the time the user asks for it."""
+    if (page + 1) * per_page >= total:
+        return
+    prefetcher.submit(
+        backend,
+        cache_key(backend, endpoint, query, page + 1, per_page),
+        lambda: run_search(backend, endpoint, query, page + 1, per_page, prefetch_next=False),
+    )
+
+
+def cache_response(key: CacheKey, response: SearchResponse):
+    # the raw upstream data is only for the request that captured it, so don't spend cache space on it;
+    # the timings are those of the original search, so they would be misleading for a cache hit
+    search_cache.put(key, response._replace(raw={}, timings={}))
+
+
 def get_search_class(backend: str) -> type[Search]:
     match backend:
         case 'worldcat':
@@ -111,6 +694,11 @@ def get_search_class(backend: str) -> type[Search]:
             raise ValueError(f'unknown backend "{backend}"')
 
 
+def configure_backends(backends: list[str]) -> dict[str, Any]:
+    """Build the configuration for each of the given backends, keyed by backend name."""
+    return {backend: get_search_class(backend).configure(env) for backend in backends}
+
+
 def get_pagination_links(
         request_url: str,
         last_page: int,
@@ -134,3 +722,8 @@ def get_pagination_links(
 def error_response(endpoint: str, message: str, status: int = HTTPStatus.BAD_REQUEST) -> tuple[dict, int]:
     """Utility function for returning a simple error response."""
     return {'endpoint': endpoint, 'error': {'msg': message}}, status
+
+
+# build and validate the configuration of each enabled backend at startup, so
+# that the app fails to boot instead of failing on the first search request
+backend_configs = configure_backends(env.list('SEARCH_BACKENDS', ['alma', 'primo', 'worldcat']))
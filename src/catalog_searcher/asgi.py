@@ -0,0 +1,259 @@
+"""ASGI entry point for the catalog searcher, used by `catalog-searcher --server uvicorn`.
+
+Single-backend searches are handled natively, using the asyncio search backends,
+so that a waiting upstream request does not tie up a thread, and one process can
+hold many of them in flight. Every other request is passed to the Flask app,
+which runs in a thread pool.
+
+This module requires the optional "asgi" dependencies.
+"""
+import logging
+import sys
+from http import HTTPStatus
+from io import BytesIO
+from typing import Any, Awaitable, Callable, MutableMapping
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import Response, g, request
+
+from catalog_searcher import metrics
+from catalog_searcher.app import (
+    InvalidRequest,
+    app as flask_app,
+    backend_configs,
+    build_search_response,
+    cache_response,
+    capture_requested,
+    env,
+    error_response,
+    get_block_window,
+    json_response,
+    label_request,
+    parse_search_args,
+    prefetch_next_page,
+    remember_cache_key,
+    stats,
+    use_cache_requested,
+)
+from catalog_searcher.search import SearchError, SearchResponse, SearchTimeout
+from catalog_searcher.search.aio import async_client_pool, get_async_search_class
+from catalog_searcher.search.breaker import CircuitOpen, circuit_breakers
+from catalog_searcher.search.cache import cache_key, search_cache
+from catalog_searcher.search.deadline import deadline_policy
+from catalog_searcher.search.prefetch import prefetcher
+from catalog_searcher.search.singleflight import async_search_flights
+
+Scope = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[MutableMapping[str, Any]]]
+Send = Callable[[MutableMapping[str, Any]], Awaitable[None]]
+
+logger = logging.getLogger(__name__)
+
+async_client_pool.configure(env)
+
+wsgi_app = WsgiToAsgi(flask_app)
+
+
+async def app(scope: Scope, receive: Receive, send: Send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+
+    if scope['type'] == 'http' and scope['method'] == 'GET' and scope['path'] in native_routes:
+        with flask_app.request_context(build_environ(scope)):
+            response = await native_routes[scope['path']]()
+        if response is not None:
+            await send_response(send, response)
+            return
+
+    await wsgi_app(scope, receive, send)
+
+
+async def lifespan(receive: Receive, send: Send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await async_client_pool.aclose()
+            prefetcher.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def search() -> Response | None:
+    """Asyncio version of the Flask app's `/search` route. Returns `None` for
+    federated searches, which are left to the Flask app."""
+    rv = flask_app.preprocess_request()
+    if rv is None:
+        rv = await run_search_route()
+        if rv is None:
+            return None
+
+    return flask_app.finalize_request(rv)
+
+
+async def run_search_route() -> Any:
+    try:
+        params = parse_search_args(request.args)
+    except InvalidRequest as e:
+        return error_response(e.endpoint, message=str(e))
+
+    if len(params.backends) > 1:
+        return None
+
+    label_request(params.backends[0], params.endpoint)
+    g.search_params = params
+    capture = capture_requested()
+    use_cache = use_cache_requested() and not capture
+    try:
+        with g.timings.phase('search'):
+            response = await run_search(
+                params.backends[0], params.endpoint, params.query, params.page, params.per_page,
+                use_cache, params.timeout, include_raw=capture,
+            )
+    except SearchTimeout as e:
+        return error_response(params.endpoint, message=str(e), status=HTTPStatus.GATEWAY_TIMEOUT)
+    except CircuitOpen as e:
+        return error_response(params.endpoint, message=str(e), status=HTTPStatus.SERVICE_UNAVAILABLE)
+    except SearchError as e:
+        return error_response(params.endpoint, message=str(e), status=HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    g.timings.update(response.timings)
+    remember_cache_key(params, use_cache)
+    return json_response(build_search_response(params, response, request.url, capture=capture))
+
+
+async def async_stats() -> Response:
+    """The Flask app's `/stats`, with the statistics of the asyncio backends added."""
+    flask_app.preprocess_request()
+    return flask_app.finalize_request({
+        **stats(),
+        'async_http_pools': async_client_pool.stats(),
+        'async_search_coalescing': async_search_flights.stats(),
+    })
+
+
+native_routes: dict[str, Callable[[], Awaitable[Response | None]]] = {
+    '/search': search,
+    '/stats': async_stats,
+}
+
+
+async def run_search(
+        backend: str,
+        endpoint: str,
+        query: str,
+        page: int,
+        per_page: int,
+        use_cache: bool = True,
+        timeout: float | None = None,
+        include_raw: bool = False,
+) -> SearchResponse:
+    """Asyncio version of `catalog_searcher.app.run_search()`, which shares its
+    response cache, deadline, and block fetching settings."""
+    window = get_block_window(backend, page, per_page)
+    if window is None:
+        return await fetch_page(backend, endpoint, query, page, per_page, use_cache, timeout, include_raw)
+
+    responses: list[SearchResponse] = []
+    for block in window.blocks:
+        if responses and block * window.size >= responses[0].total:
+            # the page runs past the last result
+            break
+        responses.append(await fetch_page(
+            backend, endpoint, query, block, window.size, use_cache, timeout, include_raw,
+        ))
+    return window.slice(responses, per_page)
+
+
+async def fetch_page(
+        backend: str,
+        endpoint: str,
+        query: str,
+        page: int,
+        per_page: int,
+        use_cache: bool = True,
+        timeout: float | None = None,
+        include_raw: bool = False,
+) -> SearchResponse:
+    """Asyncio version of `catalog_searcher.app.fetch_page()`."""
+    key = cache_key(backend, endpoint, query, page, per_page)
+    if use_cache:
+        response = search_cache.get(key)
+        metrics.search_cache_lookups.inc(backend, 'miss' if response is None else 'hit')
+        if response is not None:
+            return response
+
+    deadline = deadline_policy.deadline(backend, timeout)
+    searched = False
+
+    async def _search() -> SearchResponse:
+        nonlocal searched
+        searched = True
+        search = get_async_search_class(backend)(
+            backend_configs[backend], endpoint, query, page, per_page, deadline, include_raw=include_raw
+        )
+        try:
+            response = await circuit_breakers.get(backend).call_async(search.search, deadline.client_limited)
+        except Exception as e:
+            metrics.count_search_error(backend, e)
+            raise
+        response = response._replace(timings=search.timings.durations)
+        metrics.observe_search(backend, endpoint, search)
+        cache_response(key, response)
+        # the prefetch runs with the sync backend, in the prefetcher's threads
+        prefetch_next_page(backend, endpoint, query, page, per_page, response.total)
+        return response
+
+    while True:
+        try:
+            return await async_search_flights.do((key, include_raw), _search, timeout=deadline.remaining())
+        except TimeoutError:
+            raise deadline.error(endpoint)
+        except SearchTimeout:
+            # the search this caller joined may have had a shorter deadline than this caller's
+            if searched or deadline.expired:
+                raise
+
+
+def build_environ(scope: Scope) -> dict[str, Any]:
+    """Build a WSGI environ from the ASGI scope of a request without a body, so
+    that the Flask request context is available to the native routes."""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ: dict[str, Any] = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+        'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+        'QUERY_STRING': scope['query_string'].decode('ascii'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin1').upper().replace('-', '_')
+        if name not in ('CONTENT_LENGTH', 'CONTENT_TYPE'):
+            name = 'HTTP_' + name
+        value = raw_value.decode('latin1')
+        environ[name] = environ[name] + ',' + value if name in environ else value
+    return environ
+
+
+async def send_response(send: Send, response: Response):
+    await send({
+        'type': 'http.response.start',
+        'status': response.status_code,
+        'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in response.headers],
+    })
+    # a 304 response has the headers, but not the body, of the response it stands for
+    body = b'' if response.status_code == HTTPStatus.NOT_MODIFIED else response.get_data()
+    await send({'type': 'http.response.body', 'body': body})
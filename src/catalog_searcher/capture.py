@@ -0,0 +1,149 @@
+"""Capture of the raw upstream data of searches, for debugging. Only the
+searches that ask for it with a "raw=true" parameter, and a sample of the
+others, are captured. The full data is written to a file in a directory that
+keeps only the most recent captures, and the response only includes a copy of
+it that is truncated to a size limit, along with the capture ID that the full
+data can be retrieved by.
+"""
+import json
+import logging
+import os
+import random
+import re
+import secrets
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import Any, Mapping
+
+from environs import Env
+
+from catalog_searcher.jsonprovider import default
+
+logger = logging.getLogger(__name__)
+
+# capture IDs start with a timestamp, so that they sort by age
+CAPTURE_ID_PATTERN = re.compile(r'^\d{8}T\d{6}\.\d{6}-[0-9a-f]{8}$')
+
+
+class RawCapture:
+    """Captures the raw data of the searches that request it, and of a
+    `sample_rate` proportion of the other searches.
+
+    The inline copy of each field of the raw data is limited to
+    `max_inline_bytes` of JSON; longer fields are replaced by their truncated
+    JSON text. The full data is stored in `directory`, which keeps the newest
+    `max_files` captures; if `max_files` is 0, the full data is not stored.
+    """
+    def __init__(
+            self,
+            sample_rate: float = 0.0,
+            max_inline_bytes: int = 16384,
+            directory: Path | None = None,
+            max_files: int = 100,
+    ):
+        self.sample_rate = sample_rate
+        self.max_inline_bytes = max_inline_bytes
+        self.directory = directory or Path(tempfile.gettempdir()) / 'catalog-searcher-raw'
+        self.max_files = max_files
+        self._lock = Lock()
+        self._counters = {'captured': 0, 'truncated': 0, 'stored': 0, 'store_errors': 0}
+
+    def configure(self, env: Env):
+        """Apply the settings from the `RAW_CAPTURE_*` environment variables."""
+        with env.prefixed('RAW_CAPTURE_'):
+            self.sample_rate = env.float('SAMPLE_RATE', self.sample_rate)
+            self.max_inline_bytes = env.int('MAX_INLINE_BYTES', self.max_inline_bytes)
+            self.directory = env.path('DIR', self.directory)
+            self.max_files = env.int('MAX_FILES', self.max_files)
+
+    def requested(self, args: Mapping[str, str]) -> bool:
+        """Return true if the raw data of the search with the given request
+        parameters should be captured."""
+        return args.get('raw') == 'true' or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def capture(self, raw: Mapping[str, Any]) -> dict[str, Any]:
+        """Store the raw data, and return the copy of it to include in the
+        response, with the ID of the capture if it was stored."""
+        inline: dict[str, Any] = {}
+        truncated = []
+        for name, value in raw.items():
+            inline[name], was_truncated = truncate(value, self.max_inline_bytes)
+            if was_truncated:
+                truncated.append(name)
+        if truncated:
+            inline['truncated'] = truncated
+        capture_id = self.store(raw)
+        if capture_id is not None:
+            inline['capture_id'] = capture_id
+        with self._lock:
+            self._counters['captured'] += 1
+            self._counters['truncated'] += bool(truncated)
+        return inline
+
+    def store(self, raw: Mapping[str, Any]) -> str | None:
+        """Write the raw data to a new file in the capture directory, and delete
+        the oldest files beyond `max_files`. Returns the ID of the capture, or
+        `None` if it was not stored."""
+        if self.max_files <= 0:
+            return None
+        capture_id = f'{datetime.now():%Y%m%dT%H%M%S.%f}-{secrets.token_hex(4)}'
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # write to a temporary file first, so that a capture is never read half-written
+            path = self.directory / f'{capture_id}.json'
+            temp_path = path.with_suffix('.tmp')
+            # served as application/json, so always UTF-8; a lone surrogate, which
+            # UTF-8 cannot encode, is written as its JSON escape sequence instead
+            data = json.dumps(raw, default=default, ensure_ascii=False)
+            temp_path.write_bytes(data.encode('utf-8', 'backslashreplace'))
+            os.replace(temp_path, path)
+            self.rotate()
+        except OSError as e:
+            logger.warning('Unable to store raw capture %s: %s', capture_id, e)
+            with self._lock:
+                self._counters['store_errors'] += 1
+            return None
+        with self._lock:
+            self._counters['stored'] += 1
+        return capture_id
+
+    def rotate(self):
+        with self._lock:
+            paths = sorted(self.directory.glob('*.json'))
+            for path in paths[:max(len(paths) - self.max_files, 0)]:
+                path.unlink(missing_ok=True)
+
+    def load(self, capture_id: str) -> bytes | None:
+        """Return the stored JSON of the capture with the given ID, or `None` if
+        there is no such capture (any more)."""
+        if not CAPTURE_ID_PATTERN.match(capture_id):
+            return None
+        try:
+            return (self.directory / f'{capture_id}.json').read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                'sample_rate': self.sample_rate,
+                **self._counters,
+            }
+
+
+def truncate(value: Any, max_bytes: int) -> tuple[Any, bool]:
+    """Return the value if its JSON encoding is at most `max_bytes` long, or
+    otherwise the first `max_bytes` bytes of its JSON text (or of the string
+    itself, for a string), along with whether it was truncated."""
+    text = value if isinstance(value, str) else json.dumps(value, default=default, ensure_ascii=False)
+    data = text.encode()
+    if len(data) <= max_bytes:
+        return value, False
+    # drop any character that was cut in half
+    return data[:max_bytes].decode(errors='ignore'), True
+
+
+# process-wide raw data capture settings
+raw_capture = RawCapture()
@@ -0,0 +1,128 @@
+"""Compression of response bodies, negotiated with the `Accept-Encoding` request
+header. Gzip is always available; Brotli is offered when the [Brotli] package
+is installed (it is in the optional "compression" dependencies).
+
+When a response body is serialized from a cached search response, its
+compressed bytes are attached to the cache entry, so that later requests for
+the same body are served without compressing it again.
+
+[Brotli]: https://github.com/google/brotli
+"""
+import gzip
+import hashlib
+from http import HTTPStatus
+from threading import Lock
+from typing import Any
+
+from environs import Env
+from werkzeug.datastructures import Accept
+from werkzeug.wrappers import Response
+
+from catalog_searcher.search.cache import CacheKey, search_cache
+
+try:
+    import brotli  # type: ignore[import-untyped]
+except ImportError:
+    brotli = None  # type: ignore[assignment]
+
+
+class Compressor:
+    """Compresses response bodies of at least `min_size` bytes with the first of
+    the `encodings` that the client accepts with the highest quality.
+    `gzip_level` (1-9) and `brotli_quality` (0-11) trade compression speed for
+    size; an empty list of encodings disables compression."""
+    def __init__(
+            self,
+            encodings: list[str] | None = None,
+            min_size: int = 1024,
+            gzip_level: int = 6,
+            brotli_quality: int = 4,
+    ):
+        self.encodings = ['br', 'gzip'] if encodings is None else encodings
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._lock = Lock()
+        self._counters = {'compressed': 0, 'reused': 0, 'skipped': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+    def configure(self, env: Env):
+        """Apply the settings from the `COMPRESSION_*` environment variables."""
+        with env.prefixed('COMPRESSION_'):
+            self.encodings = env.list('ENCODINGS', self.encodings)
+            self.min_size = env.int('MIN_SIZE', self.min_size)
+            self.gzip_level = env.int('GZIP_LEVEL', self.gzip_level)
+            self.brotli_quality = env.int('BROTLI_QUALITY', self.brotli_quality)
+        unknown = [encoding for encoding in self.encodings if encoding not in ('br', 'gzip')]
+        if unknown:
+            raise ValueError(f'unsupported compression encodings: {", ".join(unknown)}')
+
+    def available(self) -> list[str]:
+        """The configured encodings that can be used, in order of preference."""
+        return [encoding for encoding in self.encodings if encoding != 'br' or brotli is not None]
+
+    def negotiate(self, accept_encodings: Accept) -> str | None:
+        """Return the encoding to use for a client's `Accept-Encoding` header, or
+        `None` to send the body uncompressed."""
+        return accept_encodings.best_match(self.available())
+
+    def compress(self, data: bytes, encoding: str) -> bytes:
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        # a fixed modification time makes the output depend only on the input
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def compress_response(self, response: Response, accept_encodings: Accept, key: CacheKey | None = None) -> bool:
+        """Compress the body of a successful response in place, if it is large
+        enough, and the client accepts one of the available encodings. If `key`
+        is given, the compressed body is looked up in, and attached to, the
+        search cache entry with that key. Returns true if the body was compressed."""
+        if response.direct_passthrough or not self.encodings:
+            return False
+        if response.status_code in (HTTPStatus.OK, HTTPStatus.NOT_MODIFIED):
+            # a 304 response has the same headers as the response it stands for
+            response.vary.add('Accept-Encoding')
+        if response.status_code != HTTPStatus.OK or 'Content-Encoding' in response.headers:
+            return False
+        encoding = self.negotiate(accept_encodings)
+        if encoding is None:
+            return False
+        data = response.get_data()
+        if len(data) < self.min_size:
+            with self._lock:
+                self._counters['skipped'] += 1
+            return False
+
+        # the body depends on more than the cache key, such as the request URL in the
+        # pagination links, so the attachment is specific to this exact body
+        name = (encoding, self.level(encoding), hashlib.blake2b(data, digest_size=16).digest())
+        compressed = search_cache.get_attachment(key, name) if key is not None else None
+        reused = compressed is not None
+        if compressed is None:
+            compressed = self.compress(data, encoding)
+            if key is not None:
+                search_cache.attach(key, name, compressed)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        with self._lock:
+            self._counters['reused' if reused else 'compressed'] += 1
+            self._counters['bytes_in'] += len(data)
+            self._counters['bytes_out'] += len(compressed)
+        return True
+
+    def level(self, encoding: str) -> int:
+        return self.brotli_quality if encoding == 'br' else self.gzip_level
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            'encodings': self.available(),
+            'min_size': self.min_size,
+            **counters,
+            'ratio': counters['bytes_out'] / counters['bytes_in'] if counters['bytes_in'] else None,
+        }
+
+
+# process-wide compressor for the response bodies
+compressor = Compressor()
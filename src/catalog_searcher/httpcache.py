@@ -0,0 +1,80 @@
+"""HTTP caching of `/search` responses by clients and intermediaries, such as
+a CDN: validation with an ETag, and freshness with `Cache-Control`."""
+import hashlib
+
+from environs import Env
+from werkzeug.wrappers import Request, Response
+
+
+class HTTPCachePolicy:
+    """Determines the `Cache-Control` header of search responses, and answers
+    conditional requests for them.
+
+    Responses may be reused without revalidation for `max_age` seconds, and
+    while they are revalidated in the background for a further
+    `stale_while_revalidate` seconds. Both can be overridden for a backend, or
+    for an endpoint of a backend, in `max_ages` and `stale_while_revalidates`,
+    whose keys are either `backend` or `backend:endpoint`. When `max_age` is 0,
+    responses must be revalidated every time they are reused.
+    """
+    def __init__(
+            self,
+            max_age: int = 0,
+            stale_while_revalidate: int = 0,
+            max_ages: dict[str, int] | None = None,
+            stale_while_revalidates: dict[str, int] | None = None,
+    ):
+        self.max_age = max_age
+        self.stale_while_revalidate = stale_while_revalidate
+        self.max_ages = max_ages or {}
+        self.stale_while_revalidates = stale_while_revalidates or {}
+
+    def configure(self, env: Env):
+        """Apply the settings from the `HTTP_CACHE_*` environment variables."""
+        with env.prefixed('HTTP_CACHE_'):
+            self.max_age = env.int('MAX_AGE', self.max_age)
+            self.stale_while_revalidate = env.int('STALE_WHILE_REVALIDATE', self.stale_while_revalidate)
+            self.max_ages = env.dict('MAX_AGES', subcast_values=int, default=self.max_ages)
+            self.stale_while_revalidates = env.dict(
+                'STALE_WHILE_REVALIDATES', subcast_values=int, default=self.stale_while_revalidates,
+            )
+
+    def freshness(self, backends: list[str], endpoint: str) -> tuple[int, int]:
+        """Return the `max-age` and `stale-while-revalidate` seconds for a search
+        of the endpoint. A federated search is only fresh for as long as all of
+        its backends' responses would be."""
+        return (
+            min(lookup(self.max_ages, self.max_age, backend, endpoint) for backend in backends),
+            min(
+                lookup(self.stale_while_revalidates, self.stale_while_revalidate, backend, endpoint)
+                for backend in backends
+            ),
+        )
+
+    def apply(self, response: Response, request: Request, backends: list[str], endpoint: str):
+        """Add the ETag and `Cache-Control` headers to a successful search
+        response, and turn it into a `304 Not Modified` response if the request's
+        `If-None-Match` header has the same ETag.
+
+        The ETag is computed from the uncompressed body, so it is weak: the
+        gzip and Brotli encodings of the same body share it."""
+        if response.status_code != 200:
+            return
+        response.set_etag(hashlib.blake2b(response.get_data(), digest_size=16).hexdigest(), weak=True)
+        max_age, stale_while_revalidate = self.freshness(backends, endpoint)
+        if max_age > 0:
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            if stale_while_revalidate > 0:
+                response.cache_control.stale_while_revalidate = stale_while_revalidate
+        else:
+            response.cache_control.no_cache = True
+        response.make_conditional(request)
+
+
+def lookup(overrides: dict[str, int], default: int, backend: str, endpoint: str) -> int:
+    return overrides.get(f'{backend}:{endpoint}', overrides.get(backend, default))
+
+
+# process-wide HTTP caching settings for the search responses
+http_cache_policy = HTTPCachePolicy()
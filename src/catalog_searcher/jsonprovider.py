@@ -0,0 +1,79 @@
+"""JSON provider for the Flask app, which serializes responses with [orjson]
+when it is installed (it is in the optional "json" dependencies), and with the
+standard library's `json` module otherwise.
+
+Both produce the same bytes for the app's responses: orjson is only used
+with the options that match the standard library's output (sorted keys, and
+either compact or 2-space indented), and not at all if non-ASCII characters
+must be escaped. Values that orjson cannot serialize, such as integers larger
+than 64 bits, are passed to the standard library instead.
+
+[orjson]: https://github.com/ijl/orjson
+"""
+import dataclasses
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.sansio.response import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+
+def default(obj: Any) -> Any:
+    """Serialize the types that JSON does not support. Dataclass instances, such
+    as `SearchResult`, are serialized from their attributes, without the deep
+    copy made by `dataclasses.asdict()`."""
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type) and hasattr(obj, '__dict__'):
+        return obj.__dict__
+    return DefaultJSONProvider.default(obj)
+
+
+class SearchJSONProvider(DefaultJSONProvider):
+    default = staticmethod(default)  # type: ignore[assignment]
+
+    # whether to use orjson when the output options allow it
+    use_orjson = orjson is not None
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        data = self._orjson_dumps(obj, kwargs)
+        if data is None:
+            return super().dumps(obj, **kwargs)
+        return data.decode()
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            dump_args: dict[str, Any] = {'indent': 2}
+        else:
+            dump_args = {'separators': (',', ':')}
+
+        data = self._orjson_dumps(obj, dump_args)
+        if data is None:
+            return super().response(obj)
+        # skip the round trip through str that the standard library needs
+        return self._app.response_class(data + b'\n', mimetype=self.mimetype)  # type: ignore[arg-type]
+
+    def _orjson_dumps(self, obj: Any, kwargs: dict[str, Any]) -> bytes | None:
+        """Serialize `obj` with orjson, if it is available and can produce the
+        same output as `json.dumps(obj, **kwargs)`. Otherwise, return `None`."""
+        if not self.use_orjson or kwargs.get('ensure_ascii', self.ensure_ascii):
+            return None
+
+        # dataclasses and datetimes are passed to the default function, as with the standard library
+        option = orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent') == 2 and 'separators' not in kwargs:
+            option |= orjson.OPT_INDENT_2
+        elif kwargs.get('indent') is not None or tuple(kwargs.get('separators', ())) != (',', ':'):
+            return None
+        if set(kwargs) - {'default', 'ensure_ascii', 'sort_keys', 'indent', 'separators'}:
+            return None
+
+        try:
+            return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option)
+        except orjson.JSONEncodeError:
+            return None
@@ -0,0 +1,196 @@
+"""Non-blocking logging. Request threads put log records on a bounded queue,
+and a single background thread formats them and writes them to the console,
+so that a slow console or log collector does not hold up requests.
+
+The WSGI access log is written by `AccessLogMiddleware`, which replaces Paste's
+`TransLogger`, keeps its Apache combined log format, and can log a sample of
+the successful requests.
+"""
+import atexit
+import copy
+import logging
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from queue import Full, Queue
+from threading import Lock
+from typing import IO, Any, Callable, Iterable, Mapping, NamedTuple
+from urllib.parse import quote
+
+from environs import Env
+
+# name of the logger of the access log
+ACCESS_LOGGER = 'wsgi'
+
+# types of log message arguments that cannot change after the call to the logger, so
+# they can be merged into the message by the background thread instead of the caller
+IMMUTABLE_ARGS = (str, int, float, bool, type(None))
+
+
+class AccessEntry(NamedTuple):
+    """The fields of a line in the access log, which is only formatted when it
+    is written."""
+    remote_addr: str
+    remote_user: str
+    started: float
+    method: str
+    uri: str
+    protocol: str
+    status: str
+    bytes: str
+    referer: str
+    user_agent: str
+
+    def __str__(self) -> str:
+        timestamp = time.strftime('%d/%b/%Y:%H:%M:%S %z', time.localtime(self.started))
+        return (
+            f'{self.remote_addr} - {self.remote_user} [{timestamp}] "{self.method} {self.uri} {self.protocol}" '
+            f'{self.status} {self.bytes} "{self.referer}" "{self.user_agent}"'
+        )
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Queue handler that leaves as much of the formatting of a record as it can
+    to the listener's thread. The message is only merged with its arguments by
+    the caller if some of them could change before the record is written, and
+    the exception traceback is always formatted by the listener.
+
+    If the queue is full, the record is dropped and counted, rather than
+    blocking the caller."""
+    def __init__(self, queue: Queue):
+        super().__init__(queue)
+        self._lock = Lock()
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args.values() if isinstance(record.args, Mapping) else record.args or ()
+        if all(isinstance(arg, IMMUTABLE_ARGS + (AccessEntry,)) for arg in args):
+            return record
+        # other handlers of the same logger may still need the original record
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            with self._lock:
+                self.dropped += 1
+
+
+class QueueLogging:
+    """Configures the root logger to send its records through a queue of at most
+    `queue_size` records to a background thread, which writes them to standard
+    error. If `enabled` is false, records are written by the threads that log
+    them instead."""
+    def __init__(self, enabled: bool = True, queue_size: int = 10000):
+        self.enabled = enabled
+        self.queue_size = queue_size
+        self.handler: DeferredQueueHandler | None = None
+        self.listener: QueueListener | None = None
+        self._logger = logging.getLogger()
+
+    def configure(self, env: Env):
+        """Apply the settings from the `LOG_QUEUE*` environment variables."""
+        with env.prefixed('LOG_'):
+            self.enabled = env.bool('QUEUE', self.enabled)
+            self.queue_size = env.int('QUEUE_SIZE', self.queue_size)
+
+    def start(self, level: int, fmt: str, stream: IO[str] | None = None, logger: logging.Logger | None = None):
+        """Set up the logger (the root logger by default) to write to `stream`
+        (standard error by default), through the queue and its background thread
+        if queueing is enabled. Records from the access logger are written
+        without the `fmt` prefix. As with `logging.basicConfig()`, this does
+        nothing if the logger already has handlers."""
+        logger = logger or logging.getLogger()
+        if logger.handlers:
+            return
+        stream = stream or sys.stderr
+        console = logging.StreamHandler(stream)
+        console.setFormatter(logging.Formatter(fmt))
+        console.addFilter(lambda record: record.name != ACCESS_LOGGER)
+        access = logging.StreamHandler(stream)
+        access.setFormatter(logging.Formatter('%(message)s'))
+        access.addFilter(lambda record: record.name == ACCESS_LOGGER)
+
+        logger.setLevel(level)
+        if not self.enabled:
+            logger.addHandler(console)
+            logger.addHandler(access)
+            return
+
+        self.handler = DeferredQueueHandler(Queue(self.queue_size))
+        self.listener = QueueListener(self.handler.queue, console, access, respect_handler_level=True)
+        self.listener.start()
+        logger.addHandler(self.handler)
+        self._logger = logger
+
+    def stop(self):
+        """Stop queueing records, and write the ones that are already queued."""
+        if self.handler is not None:
+            self._logger.removeHandler(self.handler)
+            self.handler = None
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def stats(self) -> dict[str, Any]:
+        if self.handler is None:
+            return {'enabled': False}
+        return {
+            'enabled': True,
+            'queued': self.handler.queue.qsize(),  # type: ignore[attr-defined]
+            'dropped': self.handler.dropped,
+        }
+
+
+class AccessLogMiddleware:
+    """WSGI middleware that logs each request in the Apache combined log format
+    to the "wsgi" logger at the INFO level, as Paste's `TransLogger` does. Only
+    a `sample_rate` proportion of the requests with a successful or redirect
+    status are logged; client and server errors always are."""
+    def __init__(self, app: Callable, sample_rate: float = 1.0, logger: logging.Logger | None = None):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.logger = logger or logging.getLogger(ACCESS_LOGGER)
+
+    def __call__(self, environ: dict[str, Any], start_response: Callable) -> Iterable[bytes]:
+        started = time.time()
+
+        def _start_response(status: str, headers: list[tuple[str, str]], exc_info: Any = None):
+            self.log(environ, started, status, headers)
+            return start_response(status, headers, exc_info)
+
+        return self.app(environ, _start_response)
+
+    def sampled(self, status: str) -> bool:
+        return self.sample_rate >= 1 or int(status[:3]) >= 400 or random.random() < self.sample_rate
+
+    def log(self, environ: dict[str, Any], started: float, status: str, headers: list[tuple[str, str]]):
+        if not self.logger.isEnabledFor(logging.INFO) or not self.sampled(status):
+            return
+        uri = quote(environ.get('SCRIPT_NAME', '') + environ.get('PATH_INFO', ''))
+        if environ.get('QUERY_STRING'):
+            uri += '?' + environ['QUERY_STRING']
+        length = next((value for name, value in headers if name.lower() == 'content-length'), '-')
+        entry = AccessEntry(
+            remote_addr=environ.get('HTTP_X_FORWARDED_FOR') or environ.get('REMOTE_ADDR') or '-',
+            remote_user=environ.get('REMOTE_USER') or '-',
+            started=started,
+            method=environ['REQUEST_METHOD'],
+            uri=uri,
+            protocol=environ.get('SERVER_PROTOCOL', '-'),
+            status=status.split(None, 1)[0],
+            bytes=length,
+            referer=environ.get('HTTP_REFERER', '-'),
+            user_agent=environ.get('HTTP_USER_AGENT', '-'),
+        )
+        self.logger.info('%s', entry)
+
+
+# process-wide logging pipeline
+queue_logging = QueueLogging()
+atexit.register(queue_logging.stop)
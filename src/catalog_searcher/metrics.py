@@ -0,0 +1,250 @@
+"""Application metrics, in the Prometheus text exposition format, for the
+`/metrics` endpoint.
+
+Updating a metric does not take a lock: each thread updates its own copy of
+the metric's values, and the copies are only added together when the metrics
+are rendered. Creating a thread's copy, which happens once per thread, is the
+only time a lock is needed.
+"""
+import math
+import threading
+from bisect import bisect_left
+from typing import Any, Callable, Iterable, Iterator, Sequence
+
+from catalog_searcher.search import Search, SearchError
+
+# upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = tuple[str, ...]
+
+
+def escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names: Sequence[str], values: Iterable[Any]) -> str:
+    pairs = [f'{name}="{escape(str(value))}"' for name, value in zip(names, values)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    """Base class for metrics with a fixed set of label names."""
+    type = 'untyped'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._local = threading.local()
+        self._shards: list[dict[LabelValues, Any]] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> dict[LabelValues, Any]:
+        """Return the current thread's copy of this metric's values."""
+        try:
+            return self._local.values
+        except AttributeError:
+            values: dict[LabelValues, Any] = {}
+            with self._shards_lock:
+                self._shards.append(values)
+            self._local.values = values
+            return values
+
+    def _collect_shards(self) -> Iterator[tuple[LabelValues, Any]]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            # copying a dict is atomic, so this is safe while its thread updates it
+            yield from shard.copy().items()
+
+    def samples(self) -> Iterator[tuple[str, str, float]]:
+        """Yield the (name, labels, value) of each sample of this metric."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        lines.extend(f'{name}{labels} {format_value(value)}' for name, labels, value in self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, *label_values: str, amount: float = 1):
+        values = self._shard()
+        values[label_values] = values.get(label_values, 0) + amount
+
+    def totals(self) -> dict[LabelValues, float]:
+        totals: dict[LabelValues, float] = {}
+        for label_values, value in self._collect_shards():
+            totals[label_values] = totals.get(label_values, 0) + value
+        return totals
+
+    def samples(self) -> Iterator[tuple[str, str, float]]:
+        for label_values, value in sorted(self.totals().items()):
+            yield self.name, format_labels(self.labels, label_values), value
+
+
+class Gauge(Counter):
+    """Gauge that is changed with `inc()` and `dec()`, whose value is the sum of
+    the changes from all threads."""
+    type = 'gauge'
+
+    def dec(self, *label_values: str, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+
+class CallbackGauge(Metric):
+    """Gauge whose samples are read, when the metrics are rendered, from a
+    function that returns a mapping of label values to values."""
+    type = 'gauge'
+
+    def __init__(self, name: str, help: str, callback: Callable[[], dict[LabelValues, float]], labels=()):
+        super().__init__(name, help, labels)
+        self.callback = callback
+
+    def samples(self) -> Iterator[tuple[str, str, float]]:
+        for label_values, value in sorted(self.callback().items()):
+            yield self.name, format_labels(self.labels, label_values), value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *label_values: str, value: float):
+        values = self._shard()
+        counts = values.get(label_values)
+        if counts is None:
+            # a count for each bucket, then the +Inf bucket, then the sum
+            counts = values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def samples(self) -> Iterator[tuple[str, str, float]]:
+        totals: dict[LabelValues, list[float]] = {}
+        for label_values, counts in self._collect_shards():
+            counts = list(counts)
+            if label_values in totals:
+                totals[label_values] = [a + b for a, b in zip(totals[label_values], counts)]
+            else:
+                totals[label_values] = counts
+
+        for label_values, counts in sorted(totals.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield (
+                    f'{self.name}_bucket',
+                    format_labels(self.labels + ('le',), label_values + (format_value(bound),)),
+                    cumulative,
+                )
+            labels = format_labels(self.labels, label_values)
+            yield f'{self.name}_sum', labels, counts[-1]
+            yield f'{self.name}_count', labels, cumulative
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Any:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = ()) -> Histogram:
+        return self.register(Histogram(name, help, labels))
+
+    def render(self) -> str:
+        """Render all the metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+# process-wide registry of the application's metrics
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    'catalog_searcher_http_requests_total',
+    'HTTP requests handled',
+    labels=('route', 'backend', 'endpoint', 'status'),
+)
+http_request_duration = registry.histogram(
+    'catalog_searcher_http_request_duration_seconds',
+    'Time taken to handle HTTP requests',
+    labels=('route', 'backend', 'endpoint', 'status'),
+)
+http_requests_in_flight = registry.gauge(
+    'catalog_searcher_http_requests_in_flight',
+    'HTTP requests currently being handled',
+    labels=('route',),
+)
+upstream_duration = registry.histogram(
+    'catalog_searcher_upstream_duration_seconds',
+    'Time spent getting auth tokens and waiting for upstream search responses',
+    labels=('backend', 'endpoint'),
+)
+parse_duration = registry.histogram(
+    'catalog_searcher_parse_duration_seconds',
+    'Time taken to parse upstream search responses',
+    labels=('backend', 'endpoint'),
+)
+search_errors = registry.counter(
+    'catalog_searcher_search_errors_total',
+    'Backend searches that failed, by cause',
+    labels=('backend', 'cause'),
+)
+search_cache_lookups = registry.counter(
+    'catalog_searcher_search_cache_lookups_total',
+    'Search cache lookups, by result ("hit" or "miss")',
+    labels=('backend', 'result'),
+)
+
+
+def observe_search(backend: str, endpoint: str, search: Search):
+    """Record the upstream and parse durations of a completed search. The time
+    spent getting an auth token counts as upstream time."""
+    durations = search.timings.durations
+    upstream_duration.observe(backend, endpoint, value=durations.get('auth', 0.0) + durations.get('upstream', 0.0))
+    parse_duration.observe(backend, endpoint, value=durations.get('parse', 0.0))
+
+
+def count_search_error(backend: str, error: Exception):
+    cause = error.cause if isinstance(error, SearchError) else 'exception'
+    search_errors.inc(backend, cause)
+
+
+def register_waitress_metrics(dispatcher: Any):
+    """Add gauges for the task queue and worker threads of a waitress
+    `ThreadedTaskDispatcher`."""
+    registry.register(CallbackGauge(
+        'catalog_searcher_waitress_queue_depth',
+        'Requests waiting for a waitress worker thread',
+        lambda: {(): len(dispatcher.queue)},
+    ))
+    registry.register(CallbackGauge(
+        'catalog_searcher_waitress_active_threads',
+        'Waitress worker threads that are handling a request',
+        lambda: {(): dispatcher.active_count},
+    ))
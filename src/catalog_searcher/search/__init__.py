@@ -1,9 +1,19 @@
+import logging
+import re
 from abc import ABC
-from dataclasses import dataclass
-from typing import Any, Callable, Mapping, NamedTuple
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import TYPE_CHECKING, Any, Callable, Mapping, NamedTuple
 
 from environs import Env
 
+from catalog_searcher.search.timing import Timings
+
+if TYPE_CHECKING:
+    from catalog_searcher.search.deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
 
 def with_key(key: str) -> Callable[[Mapping], bool]:
     def _with_key(item: Mapping[str, Any]) -> bool:
@@ -11,10 +21,39 @@ def with_key(key: str) -> Callable[[Mapping], bool]:
     return _with_key
 
 
+def identifiers(oclc: str | None = None, mms: str | None = None, doi: str | None = None) -> dict[str, str]:
+    """Build the normalized identifiers of a search result, which are used to recognize
+    the same item in the results from different backends. OCLC numbers may have an
+    "(OCoLC)" prefix and leading zeros, and DOIs may be given as "doi.org" URLs; both
+    are removed. DOIs are case-insensitive, so they are lowercased."""
+    ids = {}
+    if oclc:
+        oclc = re.sub(r'^\(ocolc\)', '', oclc.strip(), flags=re.IGNORECASE).lstrip('0')
+        if oclc:
+            ids['oclc'] = oclc
+    if mms:
+        ids['mms'] = mms.strip()
+    if doi:
+        ids['doi'] = re.sub(r'^https?://(dx\.)?doi\.org/', '', doi.strip(), flags=re.IGNORECASE).lower()
+    return ids
+
+
 class SearchError(Exception):
-    def __init__(self, *args, endpoint: str = ''):
+    # short description of what went wrong, for metrics
+    cause = 'error'
+
+    def __init__(self, *args, endpoint: str = '', cause: str | None = None, status: int | None = None):
         super().__init__(*args)
         self.endpoint = endpoint
+        if cause is not None:
+            self.cause = cause
+        # the status of the upstream response, if it had an error status
+        self.status = status
+
+
+class SearchTimeout(SearchError):
+    """Raised when a search does not complete before its deadline."""
+    cause = 'timeout'
 
 
 @dataclass
@@ -26,6 +65,13 @@ class SearchResult:
     item_format: str = ''
     link: str = ''
     availability: str = ''
+    identifiers: dict[str, str] = field(default_factory=dict)
+
+
+class UpstreamRequest(NamedTuple):
+    url: str
+    params: Mapping[str, str] | None = None
+    headers: Mapping[str, str] | None = None
 
 
 class SearchResponse(NamedTuple):
@@ -33,16 +79,89 @@ class SearchResponse(NamedTuple):
     total: int
     module_link: str
     raw: Mapping[str, Any]
+    # durations, in seconds, of the phases of the search that produced this response
+    timings: Mapping[str, float] = {}
 
 
 class Search(ABC):
-    """Abstract base class for search implementations."""
-    def __init__(self, env: Env, endpoint: str, query: str, page: int, per_page: int):
+    """Abstract base class for search implementations.
+
+    Each implementation has an immutable configuration object that is built and
+    validated once, by `configure()`, when the application starts. Search objects
+    themselves are created for each request, and only hold a reference to that
+    configuration along with the request parameters.
+
+    If a `deadline` is given, the upstream requests are sent with timeouts that
+    end at the deadline, and a `SearchTimeout` is raised if it passes before the
+    search is complete. If `include_raw` is false, implementations may leave
+    upstream data that is expensive to keep out of the response's `raw` field.
+
+    Implementations record the time spent getting auth tokens, waiting for the
+    upstream response, and parsing it, as the "auth", "upstream", and "parse"
+    phases of `timings`."""
+    def __init__(
+            self,
+            config: Any,
+            endpoint: str,
+            query: str,
+            page: int,
+            per_page: int,
+            deadline: 'Deadline | None' = None,
+            include_raw: bool = True,
+    ):
+        self.config = config
+        self.endpoint = endpoint
+        self.query = query
+        self.page = page
+        self.per_page = per_page
+        self.deadline = deadline
+        self.include_raw = include_raw
+        # durations of the "auth", "upstream", and "parse" phases of the search
+        self.timings = Timings()
+
+    @classmethod
+    def configure(cls, env: Env) -> Any:
+        """Read and validate this implementation's configuration from the environment.
+        Raises an `environs.EnvError` if any required values are missing or invalid."""
         raise NotImplementedError
 
     def search(self) -> SearchResponse:
         raise NotImplementedError
 
+    def build_request(self) -> UpstreamRequest:
+        """Build the request to send to the upstream search API."""
+        raise NotImplementedError
+
+    def parse_response(self, request: UpstreamRequest, response: Any) -> SearchResponse:
+        """Parse the upstream response to the given request. The response may be either
+        a `requests.Response` or an `httpx.Response`, so only the attributes that they
+        have in common (`status_code`, `content`, `text`, and `json()`) are used.
+        Raises a `SearchError` if the response is an error."""
+        raise NotImplementedError
+
+    def timeout(self) -> tuple[float, float] | None:
+        """Return the (connect, read) timeout for the next upstream request, or `None`
+        to wait indefinitely if there is no deadline. Raises a `SearchTimeout` if the
+        deadline has already passed."""
+        if self.deadline is None:
+            return None
+        return self.deadline.timeout(endpoint=self.endpoint)
+
+    def check_response(self, response: Any):
+        """Raise a `SearchTimeout` if the deadline passed while waiting for the upstream
+        response, so that it is not parsed, or a `SearchError` if the upstream response
+        has an error status."""
+        if self.deadline is not None:
+            self.deadline.check(endpoint=self.endpoint)
+        if response.status_code >= HTTPStatus.BAD_REQUEST:
+            logger.error(f'Received {response.status_code} with q={self.query}')
+            raise SearchError(
+                f'Received {response.status_code} for q={self.query}',
+                endpoint=self.endpoint,
+                cause='upstream_status',
+                status=response.status_code,
+            )
+
     def __call__(self, *args, **kwargs) -> SearchResponse:
         """Alias for `search()`"""
         return self.search(*args, **kwargs)
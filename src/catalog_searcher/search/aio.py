@@ -0,0 +1,195 @@
+"""Asyncio versions of the search backends, which send their upstream requests
+with a non-blocking `httpx.AsyncClient` instead of a blocking `requests.Session`.
+
+This module requires the optional "asgi" dependencies.
+"""
+import asyncio
+import logging
+from http import HTTPStatus
+from typing import Any
+from urllib.parse import urlsplit
+
+import httpx
+from environs import Env
+
+from catalog_searcher.search import Search, SearchError, SearchResponse, SearchTimeout, UpstreamRequest
+from catalog_searcher.search.alma import AlmaSearch
+from catalog_searcher.search.primo import PrimoSearch
+from catalog_searcher.search.worldcat import WorldcatSearch
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncClientPool:
+    """Registry of keep-alive `httpx.AsyncClient` objects, one per upstream host,
+    the asyncio counterpart of `catalog_searcher.search.pool.SessionPool`. It uses
+    the same settings: each client keeps up to `pool_size` idle connections to its
+    host (or the value for that host in `host_limits`), and closes connections that
+    have been idle for more than `max_idle` seconds. When `block` is true, requests
+    beyond a host's connection limit wait for a free connection instead of opening
+    an extra one.
+
+    Clients are bound to the event loop they were created in, so the pool starts
+    over with new clients if it is used from a different event loop.
+    """
+    def __init__(
+            self,
+            pool_size: int = 10,
+            max_idle: float = 60.0,
+            host_limits: dict[str, int] | None = None,
+            block: bool = False,
+            transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.pool_size = pool_size
+        self.max_idle = max_idle
+        self.host_limits = host_limits or {}
+        self.block = block
+        self.transport = transport
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._counters: dict[str, dict[str, int]] = {}
+
+    def configure(self, env: Env):
+        """Apply the pool settings from the `HTTP_POOL_*` environment variables.
+        The new settings take effect for clients created after this call."""
+        with env.prefixed('HTTP_POOL_'):
+            self.pool_size = env.int('SIZE', self.pool_size)
+            self.max_idle = env.float('MAX_IDLE', self.max_idle)
+            self.host_limits = env.dict('HOST_LIMITS', subcast_values=int, default=self.host_limits)
+            self.block = env.bool('BLOCK', self.block)
+
+    def client(self, url: str) -> httpx.AsyncClient:
+        """Return the shared client for the host of the given URL, creating it
+        if necessary. Must be called from a running event loop."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # the clients of another (most likely closed) event loop cannot be reused
+            self._clients = {}
+            self._loop = loop
+        host = urlsplit(url).netloc
+        counters = self._counters.setdefault(host, {'requests': 0, 'clients_created': 0})
+        client = self._clients.get(host)
+        if client is None:
+            client = self._clients[host] = self._create_client(host)
+            counters['clients_created'] += 1
+        counters['requests'] += 1
+        return client
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.client(url).get(url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.client(url).post(url, **kwargs)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """Return a dictionary of per-host request counts, suitable for monitoring."""
+        return {
+            host: {**counters, 'max_connections': self.host_limits.get(host, self.pool_size)}
+            for host, counters in self._counters.items()
+        }
+
+    async def aclose(self):
+        """Close all open clients and their pooled connections."""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+    def _create_client(self, host: str) -> httpx.AsyncClient:
+        limit = self.host_limits.get(host, self.pool_size)
+        limits = httpx.Limits(
+            max_keepalive_connections=limit,
+            max_connections=limit if self.block else None,
+            keepalive_expiry=self.max_idle,
+        )
+        # like the requests sessions, wait on the upstream server indefinitely
+        return httpx.AsyncClient(limits=limits, timeout=None, transport=self.transport)
+
+
+# process-wide client pool shared by the async search backends
+async_client_pool = AsyncClientPool()
+
+
+class AsyncSearch(Search):
+    """Base class for search backends whose `search()` is a coroutine. Subclasses
+    are combined with a sync backend class, and reuse its `build_request()` and
+    `parse_response()`; only sending the upstream request is different."""
+
+    async def search(self) -> SearchResponse:  # type: ignore[override]
+        request = self.build_request()
+        try:
+            response = await self.send(request)
+        except httpx.TimeoutException as e:
+            logger.error(f'Search timed out at url {request.url}, params={request.params}\n{e}')
+            raise SearchTimeout('Search timed out', endpoint=self.endpoint)
+        except httpx.TransportError as e:
+            logger.error(f'Search error at url {request.url}, params={request.params}\n{e}')
+            raise SearchError('Search error', endpoint=self.endpoint, cause='connection')
+
+        with self.timings.phase('parse'):
+            return self.parse_response(request, response)
+
+    async def send(self, request: UpstreamRequest) -> httpx.Response:
+        with self.timings.phase('upstream'):
+            return await async_client_pool.get(
+                request.url,
+                params=request.params,
+                headers=request.headers,
+                timeout=self.httpx_timeout(),
+            )
+
+    def httpx_timeout(self) -> httpx.Timeout:
+        """The `timeout()` for the next upstream request, as an `httpx.Timeout`."""
+        timeout = self.timeout()
+        if timeout is None:
+            return httpx.Timeout(None)
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+
+
+class AsyncAlmaSearch(AsyncSearch, AlmaSearch):  # type: ignore[misc]
+    pass
+
+
+class AsyncPrimoSearch(AsyncSearch, PrimoSearch):  # type: ignore[misc]
+    pass
+
+
+class AsyncWorldcatSearch(AsyncSearch, WorldcatSearch):
+
+    async def search(self) -> SearchResponse:  # type: ignore[override]
+        request = self.build_request()
+        token_manager = self.config.token_manager
+
+        try:
+            with self.timings.phase('auth'):
+                token = await token_manager.get_token_async(self.deadline)
+            response = await self.send(request._replace(headers=self.auth_headers(token)))
+            if response.status_code == HTTPStatus.UNAUTHORIZED:
+                # the cached token may have been revoked upstream; get a new one and try once more
+                logger.info('Search request was unauthorized; refreshing auth token and retrying')
+                token_manager.invalidate(token)
+                with self.timings.phase('auth'):
+                    token = await token_manager.get_token_async(self.deadline)
+                response = await self.send(request._replace(headers=self.auth_headers(token)))
+        except httpx.TimeoutException as e:
+            logger.error(f'Search timed out at url {request.url}, params={request.params}\n{e}')
+            raise SearchTimeout('Search timed out', endpoint=self.endpoint)
+        except httpx.TransportError as e:
+            logger.error(f'Search error at url {request.url}, params={request.params}\n{e}')
+            raise SearchError('Search error', endpoint=self.endpoint, cause='connection')
+
+        with self.timings.phase('parse'):
+            return self.parse_response(request, response)
+
+
+def get_async_search_class(backend: str) -> type[AsyncSearch]:
+    match backend:
+        case 'worldcat':
+            return AsyncWorldcatSearch
+        case 'alma':
+            return AsyncAlmaSearch
+        case 'primo':
+            return AsyncPrimoSearch
+        case _:
+            raise ValueError(f'unknown backend "{backend}"')
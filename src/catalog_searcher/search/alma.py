@@ -1,40 +1,63 @@
 import logging
-from collections import defaultdict
+from dataclasses import dataclass
 from io import BytesIO
-from typing import Sequence
+from typing import Any
 
-import requests
 from environs import Env
 from furl import furl
-from lxml import etree
-from pymods import Genre, MODSReader, MODSRecord
+from pymods import MODSRecord
+from requests import ConnectionError, Timeout
 from uritemplate import URITemplate
 
-from catalog_searcher.search import Search, SearchError, SearchResponse, SearchResult
+from catalog_searcher.search import (
+    Search,
+    SearchError,
+    SearchResponse,
+    SearchResult,
+    SearchTimeout,
+    UpstreamRequest,
+    identifiers,
+)
 from catalog_searcher.search.cql import cql
+from catalog_searcher.search.formats import FormatClassifier, FormatMatch, FormatRule
+from catalog_searcher.search.pool import session_pool
+from catalog_searcher.search.sru import SRUReader
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class AlmaConfig:
+    sru_url_template: URITemplate
+    institution_code: str
+    search_url_template: URITemplate
+    item_url_template: URITemplate
+    vid: str
+
+    @classmethod
+    def from_env(cls, env: Env) -> 'AlmaConfig':
+        with env.prefixed('ALMA_'):
+            return cls(
+                sru_url_template=URITemplate(env.str('SRU_URL_TEMPLATE')),
+                institution_code=env.str('INSTITUTION_CODE'),
+                search_url_template=URITemplate(env.str('SEARCH_URL_TEMPLATE')),
+                item_url_template=URITemplate(env.str('ITEM_URL_TEMPLATE')),
+                vid=env.str('VID'),
+            )
+
+
 class AlmaSearch(Search):
     xmlns = {
         'mods': 'http://www.loc.gov/mods/v3',
         'srw': 'http://www.loc.gov/zing/srw/',
     }
+    config: AlmaConfig
 
-    def __init__(self, env: Env, endpoint: str, query: str, page: int, per_page: int):
-        self.endpoint = endpoint
-        self.query = query
-        self.page = page
-        self.per_page = per_page
-        with env.prefixed('ALMA_'):
-            self.sru_url_template = URITemplate(env.str('SRU_URL_TEMPLATE'))
-            self.institution_code = env.str('INSTITUTION_CODE')
-            self.search_url_template = URITemplate(env.str('SEARCH_URL_TEMPLATE'))
-            self.item_url_template = URITemplate(env.str('ITEM_URL_TEMPLATE'))
-            self.vid = env.str('VID')
+    @classmethod
+    def configure(cls, env: Env) -> AlmaConfig:
+        return AlmaConfig.from_env(env)
 
-    def search(self) -> SearchResponse:
+    def build_request(self) -> UpstreamRequest:
         # The bento search starts page numbering at 0 (this is a carryover from the
         # original searchumd behavior), so we need to use "page * page_size" instead
         # of the more usual "(page - 1) * page_size" to calculate the record offset
@@ -46,57 +69,76 @@ class AlmaSearch(Search):
         if self.endpoint == 'articles':
             cql_query = cql('alma.genre_form', '=', 'article') & cql_query
 
-        sru_request_url = self.sru_url_template.expand(
-            institutionCode=self.institution_code,
+        sru_request_url = self.config.sru_url_template.expand(
+            institutionCode=self.config.institution_code,
             recordSchema='mods',
             query=str(cql_query),
             maximumRecords=self.per_page,
             startRecord=start_record,
         )
+        return UpstreamRequest(url=sru_request_url)
+
+    def search(self) -> SearchResponse:
+        request = self.build_request()
         try:
-            response = requests.get(sru_request_url)
+            with self.timings.phase('upstream'):
+                response = session_pool.get(request.url, timeout=self.timeout())
+        except Timeout as e:
+            logger.error(f'Search timed out at url {request.url}\n{e}')
+            raise SearchTimeout('Search timed out', endpoint=self.endpoint)
         except ConnectionError as e:
-            logger.error(f'Search error at url {sru_request_url}\n{e}')
-            raise SearchError('Search error', endpoint=self.endpoint)
+            logger.error(f'Search error at url {request.url}\n{e}')
+            raise SearchError('Search error', endpoint=self.endpoint, cause='connection')
 
-        if not response.ok:
-            logger.error(f'Received {response.status_code} with q={self.query}')
-            raise SearchError(f'Received {response.status_code} for q={self.query}', endpoint=self.endpoint)
+        with self.timings.phase('parse'):
+            return self.parse_response(request, response)
 
-        doc = etree.fromstring(response.content)
-        total = int(doc.xpath('//srw:numberOfRecords/text()', namespaces=self.xmlns, smart_strings=False)[0])  # type: ignore
+    def parse_response(self, request: UpstreamRequest, response: Any) -> SearchResponse:
+        self.check_response(response)
+
+        # read the total and the records in a single pass over the response
+        reader = SRUReader(BytesIO(response.content))
+        results = [self.parse_result(record) for record in reader]
+
+        raw = {
+            'request_url': request.url,
+            'request_params': dict(furl(request.url).args),
+        }
+        if self.include_raw:
+            raw['xml_response'] = response.text
 
         return SearchResponse(
-            results=[self.parse_result(record) for record in MODSReader(BytesIO(response.content))],
-            total=total,
+            results=results,
+            total=reader.total,
             module_link=self.module_link,
-            raw={
-                'request_url': sru_request_url,
-                'request_params': dict(furl(sru_request_url).args),
-                'xml_response': response.text,
-            },
+            raw=raw,
         )
 
     def parse_result(self, item: MODSRecord) -> SearchResult:
-        logger.debug(f'  form: {item.form}')
-        logger.debug(f'  issuance: {item.issuance}')
-        logger.debug(f'  genres: {[(g.authority, g.text) for g in item.genre]}')
+        # this runs for every record, and the MODS lookups are not free, so skip them unless they are logged
+        log_debug = logger.isEnabledFor(logging.DEBUG)
+        if log_debug:
+            logger.debug('  form: %s', item.form)
+            logger.debug('  issuance: %s', item.issuance)
+            logger.debug('  genres: %s', [(g.authority, g.text) for g in item.genre])
 
-        item_format = get_item_format(item)
-        logger.debug(item_format)
+        match = classify_item(item)
+        if log_debug:
+            logger.debug('%s (rule: %s)', match.item_format, match.rule.name if match.rule else 'default')
 
         return SearchResult(
             title=item.titles[0],
             author='; '.join(name.text for name in item.names),
             date='; '.join(date.text for date in item.dates or []),
             description='; '.join(note.text for note in item.note),
-            item_format=item_format,
+            item_format=match.item_format,
             link=self.get_preferred_link(item),
+            identifiers=self.get_identifiers(item),
         )
 
     @property
     def module_link(self) -> str:
-        return self.search_url_template.expand(query=self.query, vid=self.vid)
+        return self.config.search_url_template.expand(query=self.query, vid=self.config.vid)
 
     def get_preferred_link(self, item: MODSRecord) -> str:
         record_identifier = item.find('mods:recordInfo/mods:recordIdentifier', namespaces=self.xmlns)
@@ -104,45 +146,58 @@ class AlmaSearch(Search):
             docid = 'alma' + record_identifier.text
         else:
             docid = ''
-        return self.item_url_template.expand(docid=docid, query=self.query, vid=self.vid)
+        return self.config.item_url_template.expand(docid=docid, query=self.query, vid=self.config.vid)
+
+    def get_identifiers(self, item: MODSRecord) -> dict[str, str]:
+        record_identifier = item.find('mods:recordInfo/mods:recordIdentifier', namespaces=self.xmlns)
+        # OCLC numbers are usually recorded as "local" identifiers with an "(OCoLC)" prefix
+        oclc_identifiers = (
+            i.text for i in item.identifiers or []
+            if i.type == 'oclc' or (i.text or '').lower().startswith('(ocolc)')
+        )
+        oclc = next(oclc_identifiers, None)
+        return identifiers(
+            oclc=oclc,
+            mms=record_identifier.text if record_identifier is not None else None,
+            doi=item.doi,
+        )
+
+
+# Rules for the format of an item, based on its MODS issuance, physical
+# description forms, and genres. The rules are checked in order, and the
+# first one that matches determines the format.
+ALMA_FORMAT_RULES = (
+    FormatRule(
+        'monographic-videorecording', 'video_recording', 'monographic',
+        forms=('videorecording',),
+        genres=(('marcgt', 'videorecording'),),
+    ),
+    FormatRule('monographic-sound-recording', 'sound recording', 'monographic', forms=('sound recording',)),
+    FormatRule('monographic-map', 'map', 'monographic', forms=('map',), genres=(('marcgt', 'map'),)),
+    FormatRule(
+        'monographic-electronic', 'e_book', 'monographic',
+        forms=('computer', 'online resource', 'electronic resource'),
+    ),
+    FormatRule('monographic-print', 'book', 'monographic', forms=('print',)),
+    FormatRule('serial-newspaper', 'newspaper', 'serial', genres=(('marcgt', 'newspaper'),)),
+    FormatRule(
+        'serial-journal', 'journal', 'serial',
+        genres=(('marcgt', 'periodical'), ('fast', 'Periodicals.'), ('marcgt', 'series')),
+    ),
+    FormatRule('integrating-database', 'database', 'integrating resource', genres=(('marcgt', 'database'),)),
+)
+
+format_classifier = FormatClassifier(ALMA_FORMAT_RULES)
+
+
+def classify_item(item: MODSRecord) -> FormatMatch:
+    """Return the format of the item, along with the rule that determined it."""
+    return format_classifier.classify(
+        issuance=item.issuance,
+        forms=item.form,
+        genres=((genre.authority, genre.text) for genre in item.genre if genre.authority is not None),
+    )
 
 
 def get_item_format(item: MODSRecord) -> str:
-    genres = GenreLookup().parse(item.genre)
-
-    if 'monographic' in item.issuance:
-        if 'videorecording' in item.form or 'videorecording' in genres.marcgt:
-            return 'video_recording'
-        if 'sound recording' in item.form:
-            return 'sound recording'
-        if 'map' in item.form or 'map' in genres.marcgt:
-            return 'map'
-        if 'computer' in item.form or 'online resource' in item.form or 'electronic resource' in item.form:
-            return 'e_book'
-        if 'print' in item.form:
-            return 'book'
-
-    if 'serial' in item.issuance:
-        if 'newspaper' in genres.marcgt:
-            return 'newspaper'
-        if 'periodical' in genres.marcgt or 'Periodicals.' in genres.fast or 'series' in genres.marcgt:
-            return 'journal'
-
-    if 'integrating resource' in item.issuance:
-        if 'database' in genres.marcgt:
-            return 'database'
-
-    return 'other'
-
-
-class GenreLookup:
-    def __init__(self):
-        self.genres = defaultdict(list)
-
-    def parse(self, genres: Sequence[Genre]):
-        for genre in filter(lambda g: g.authority is not None, genres):
-            self.genres[genre.authority].append(genre.text)
-        return self
-
-    def __getattr__(self, __name: str) -> list[str]:
-        return self.genres.get(__name, [])
+    return classify_item(item).item_format
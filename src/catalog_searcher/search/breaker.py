@@ -0,0 +1,256 @@
+import logging
+import time
+from collections import deque
+from enum import Enum
+from http import HTTPStatus
+from threading import Lock
+from typing import Any, Awaitable, Callable, NamedTuple, TypeVar
+
+from environs import Env
+
+from catalog_searcher.search import SearchError, SearchTimeout
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class CircuitOpen(SearchError):
+    """Raised instead of calling a backend whose circuit breaker is open."""
+    cause = 'circuit_open'
+
+
+class State(str, Enum):
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+
+class Outcome(NamedTuple):
+    failed: bool
+    slow: bool
+    duration: float
+
+
+class CircuitBreaker:
+    """Stops calling a backend that is failing, or responding too slowly, so that
+    searches fail fast instead of waiting on it.
+
+    The breaker starts out closed, and records the outcome of the last
+    `window_size` calls. Once there are at least `minimum_calls` of them, it opens
+    if the proportion of failed calls reaches `failure_rate`, or the proportion
+    of calls that took longer than `slow_call_duration` seconds reaches
+    `slow_call_rate`. While it is open, calls raise `CircuitOpen` immediately.
+
+    After `cooldown` seconds, the breaker is half-open, and lets up to
+    `half_open_calls` trial calls through at a time. It closes again if a trial
+    call succeeds quickly, and reopens if one fails or is slow.
+
+    Only errors that `is_failure()` accepts count as failed calls, so that
+    searches that the backend rejects, such as malformed queries, or that time
+    out because the client allowed them less time than the backend gets,
+    can't open the breaker for everyone.
+    """
+    def __init__(
+            self,
+            name: str,
+            failure_rate: float = 0.5,
+            slow_call_rate: float = 0.8,
+            slow_call_duration: float = 10.0,
+            minimum_calls: int = 10,
+            window_size: int = 20,
+            cooldown: float = 30.0,
+            half_open_calls: int = 1,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_rate = slow_call_rate
+        self.slow_call_duration = slow_call_duration
+        self.minimum_calls = minimum_calls
+        self.cooldown = cooldown
+        self.half_open_calls = half_open_calls
+        self._lock = Lock()
+        self._state = State.CLOSED
+        self._outcomes: deque[Outcome] = deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._trial_calls = 0
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> State:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def allow(self):
+        """Raise `CircuitOpen` if a call may not be made now. Every call that is
+        allowed must be followed by a call to `record()`."""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == State.HALF_OPEN and self._trial_calls < self.half_open_calls:
+                self._state = State.HALF_OPEN
+                self._trial_calls += 1
+                return
+            if state != State.CLOSED:
+                self.rejected += 1
+                raise CircuitOpen(f'Backend {self.name} is unavailable')
+
+    def record(self, failed: bool, duration: float):
+        outcome = Outcome(failed=failed, slow=duration > self.slow_call_duration, duration=duration)
+        with self._lock:
+            if self._state == State.HALF_OPEN:
+                self._trial_calls = max(self._trial_calls - 1, 0)
+                if outcome.failed or outcome.slow:
+                    self._open(f'trial call {"failed" if outcome.failed else "was slow"}')
+                else:
+                    logger.info(f'Closing circuit breaker for {self.name}')
+                    self._state = State.CLOSED
+                    self._outcomes.clear()
+                return
+            if self._state == State.OPEN:
+                # a call that started before the breaker opened
+                return
+            self._outcomes.append(outcome)
+            if len(self._outcomes) < self.minimum_calls:
+                return
+            failure_rate, slow_call_rate = self._rates()
+            if failure_rate >= self.failure_rate:
+                self._open(f'failure rate {failure_rate:.0%}')
+            elif slow_call_rate >= self.slow_call_rate:
+                self._open(f'slow call rate {slow_call_rate:.0%}')
+
+    def call(self, fn: Callable[[], T], client_limited: bool = False) -> T:
+        """Call `fn`, if the breaker allows it, and record its outcome. If
+        `client_limited` is true, the call's deadline was shortened by the
+        client, so a timeout does not count as a failure."""
+        self.allow()
+        start = time.monotonic()
+        try:
+            result = fn()
+        except Exception as e:
+            self.record(failed=is_failure(e, client_limited), duration=time.monotonic() - start)
+            raise
+        self.record(failed=False, duration=time.monotonic() - start)
+        return result
+
+    async def call_async(self, fn: Callable[[], Awaitable[T]], client_limited: bool = False) -> T:
+        self.allow()
+        start = time.monotonic()
+        try:
+            result = await fn()
+        except Exception as e:
+            self.record(failed=is_failure(e, client_limited), duration=time.monotonic() - start)
+            raise
+        self.record(failed=False, duration=time.monotonic() - start)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._state = State.CLOSED
+            self._outcomes.clear()
+            self._trial_calls = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            failure_rate, slow_call_rate = self._rates()
+            stats: dict[str, Any] = {
+                'state': state.value,
+                'calls': len(self._outcomes),
+                'failure_rate': round(failure_rate, 4),
+                'slow_call_rate': round(slow_call_rate, 4),
+                'mean_duration': round(self._mean_duration(), 4),
+                'times_opened': self.times_opened,
+                'rejected': self.rejected,
+            }
+            if state == State.OPEN:
+                stats['retry_in'] = round(self._opened_at + self.cooldown - now, 3)
+            return stats
+
+    def _current_state(self, now: float) -> State:
+        if self._state == State.OPEN and now - self._opened_at >= self.cooldown:
+            return State.HALF_OPEN
+        return self._state
+
+    def _rates(self) -> tuple[float, float]:
+        if not self._outcomes:
+            return 0.0, 0.0
+        count = len(self._outcomes)
+        return (
+            sum(outcome.failed for outcome in self._outcomes) / count,
+            sum(outcome.slow for outcome in self._outcomes) / count,
+        )
+
+    def _mean_duration(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(outcome.duration for outcome in self._outcomes) / len(self._outcomes)
+
+    def _open(self, reason: str):
+        logger.warning(f'Opening circuit breaker for {self.name} for {self.cooldown}s: {reason}')
+        self._state = State.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self._trial_calls = 0
+        self.times_opened += 1
+
+
+def is_failure(error: Exception, client_limited: bool = False) -> bool:
+    """Return true if an error from a backend call counts against the backend:
+    a connection error, a timeout (unless `client_limited` is true, because the
+    client shortened the deadline), a server error or 429 status from the
+    upstream API, or an unexpected exception. Other client error statuses are
+    caused by the search itself, not by the state of the backend."""
+    if isinstance(error, SearchTimeout):
+        return not client_limited
+    if isinstance(error, SearchError) and error.status is not None:
+        return error.status >= HTTPStatus.INTERNAL_SERVER_ERROR or error.status == HTTPStatus.TOO_MANY_REQUESTS
+    return True
+
+
+class CircuitBreakers:
+    """Registry of the circuit breakers for each backend, which all share the
+    settings from the `CIRCUIT_BREAKER_*` environment variables."""
+    def __init__(self, **settings: Any):
+        self.settings = settings
+        self._lock = Lock()
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def configure(self, env: Env):
+        """Apply the settings from the `CIRCUIT_BREAKER_*` environment variables.
+        Any existing breakers are discarded."""
+        with env.prefixed('CIRCUIT_BREAKER_'):
+            settings = {
+                'failure_rate': env.float('FAILURE_RATE', 0.5),
+                'slow_call_rate': env.float('SLOW_CALL_RATE', 0.8),
+                'slow_call_duration': env.float('SLOW_CALL_DURATION', 10.0),
+                'minimum_calls': env.int('MINIMUM_CALLS', 10),
+                'window_size': env.int('WINDOW_SIZE', 20),
+                'cooldown': env.float('COOLDOWN', 30.0),
+                'half_open_calls': env.int('HALF_OPEN_CALLS', 1),
+            }
+        with self._lock:
+            self.settings = settings
+            self._breakers.clear()
+
+    def get(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = CircuitBreaker(name, **self.settings)
+            return breaker
+
+    def reset(self):
+        with self._lock:
+            for breaker in self._breakers.values():
+                breaker.reset()
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {name: breaker.stats() for name, breaker in breakers.items()}
+
+
+# process-wide circuit breakers, one per backend
+circuit_breakers = CircuitBreakers()
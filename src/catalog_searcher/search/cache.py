@@ -0,0 +1,209 @@
+import logging
+import sys
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import fields, is_dataclass
+from threading import Lock
+from typing import Any, Hashable, Mapping, NamedTuple
+
+from environs import Env
+
+from catalog_searcher.search import SearchResponse
+
+logger = logging.getLogger(__name__)
+
+
+class CacheKey(NamedTuple):
+    backend: str
+    endpoint: str
+    query: str
+    page: int
+    per_page: int
+
+
+def normalize_query(query: str) -> str:
+    """Normalize the query text, by applying Unicode NFC normalization and
+    collapsing runs of whitespace. Case is preserved, since the backends embed
+    the query text in the module and item links they return.
+
+    A query must be normalized before it is searched, as well as in its cache
+    key, so that a cached response only has links for the query it is served for."""
+    return ' '.join(unicodedata.normalize('NFC', query).split())
+
+
+def cache_key(backend: str, endpoint: str, query: str, page: int, per_page: int) -> CacheKey:
+    return CacheKey(backend, endpoint, normalize_query(query), page, per_page)
+
+
+def approximate_size(obj: Any) -> int:
+    """Approximate the memory used by a search response, in bytes. Only strings,
+    bytes, containers, and dataclasses are followed; this is intended for cache
+    accounting, not as an exact measurement."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, Mapping):
+        return size + sum(approximate_size(k) + approximate_size(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return size + sum(approximate_size(item) for item in obj)
+    if is_dataclass(obj):
+        return size + sum(approximate_size(getattr(obj, f.name)) for f in fields(obj))
+    return size
+
+
+class CacheEntry(NamedTuple):
+    response: SearchResponse
+    expires_at: float
+    # approximate size of the response and its attachments
+    size: int
+    # data derived from the response, such as compressed serializations of it, by name
+    attachments: dict[Hashable, bytes]
+
+
+class SearchCache:
+    """Bounded, thread-safe cache of parsed search responses, so that repeated
+    searches skip both the upstream request and the parsing of its results.
+
+    Entries expire after the TTL for their backend (`ttls`, falling back to
+    `default_ttl`); a TTL of 0 disables caching for that backend. When the cache
+    holds more than `max_entries` entries or more than approximately `max_bytes`
+    bytes, the least recently used entries are evicted.
+
+    Up to `max_attachments` pieces of data derived from a cached response can be
+    attached to its entry, so that they are only computed once while the entry
+    lives. Attachments count toward `max_bytes`, and are dropped with the entry.
+    """
+    def __init__(
+            self,
+            max_entries: int = 1024,
+            max_bytes: int = 64 * 1024 * 1024,
+            default_ttl: float = 300.0,
+            ttls: dict[str, float] | None = None,
+            max_attachments: int = 4,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.ttls = ttls or {}
+        self.max_attachments = max_attachments
+        self._lock = Lock()
+        self._entries: OrderedDict[CacheKey, CacheEntry] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def configure(self, env: Env):
+        """Apply the cache settings from the `SEARCH_CACHE_*` environment variables.
+        Any cached entries are discarded."""
+        with env.prefixed('SEARCH_CACHE_'):
+            max_entries = env.int('MAX_ENTRIES', self.max_entries)
+            max_bytes = env.int('MAX_BYTES', self.max_bytes)
+            default_ttl = env.float('TTL', self.default_ttl)
+            ttls = env.dict('TTLS', subcast_values=float, default=self.ttls)
+            max_attachments = env.int('MAX_ATTACHMENTS', self.max_attachments)
+        with self._lock:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self.default_ttl = default_ttl
+            self.ttls = ttls
+            self.max_attachments = max_attachments
+            self._clear()
+
+    def ttl(self, backend: str) -> float:
+        return self.ttls.get(backend, self.default_ttl)
+
+    def get(self, key: CacheKey) -> SearchResponse | None:
+        """Return the cached response for the key, or `None` if there is no
+        unexpired entry for it."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.response
+
+    def put(self, key: CacheKey, response: SearchResponse):
+        ttl = self.ttl(key.backend)
+        if ttl <= 0:
+            return
+        size = approximate_size(response)
+        if size > self.max_bytes:
+            logger.debug('Not caching response of approximately %s bytes for %s', size, key)
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = CacheEntry(response, time.monotonic() + ttl, size, {})
+            self._bytes += size
+            self._evict()
+
+    def get_attachment(self, key: CacheKey, name: Hashable) -> bytes | None:
+        """Return the data attached to the unexpired entry for the key under the
+        given name, or `None` if there is none. Does not count as a cache lookup."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.monotonic():
+                return None
+            return entry.attachments.get(name)
+
+    def attach(self, key: CacheKey, name: Hashable, data: bytes):
+        """Attach data derived from the response to the entry for the key, under
+        the given name. Does nothing if there is no entry for the key. If the entry
+        already has `max_attachments` attachments, the oldest is dropped."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or name in entry.attachments or self.max_attachments <= 0:
+                return
+            change = approximate_size(data)
+            while len(entry.attachments) >= self.max_attachments:
+                oldest = next(iter(entry.attachments))
+                change -= approximate_size(entry.attachments.pop(oldest))
+            entry.attachments[name] = data
+            # assigning to an existing key keeps its position in the LRU order
+            self._entries[key] = entry._replace(size=entry.size + change)
+            self._bytes += change
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: CacheKey):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+
+# process-wide cache of search responses
+search_cache = SearchCache()
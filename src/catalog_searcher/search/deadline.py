@@ -0,0 +1,78 @@
+import time
+
+from environs import Env
+
+from catalog_searcher.search import SearchTimeout
+
+
+class Deadline:
+    """A point in time by which a search must be complete, `seconds` from when the
+    deadline is created. Each upstream request made for the search gets whatever
+    time is left as its read timeout, and at most `connect_timeout` seconds of that
+    to establish a connection. A deadline is `client_limited` if the client asked
+    for less time than the backend is allowed."""
+    def __init__(self, seconds: float, connect_timeout: float | None = None, client_limited: bool = False):
+        self.seconds = seconds
+        self.connect_timeout = connect_timeout
+        self.client_limited = client_limited
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self, endpoint: str = ''):
+        """Raise a `SearchTimeout` if the deadline has passed."""
+        if self.expired:
+            raise self.error(endpoint)
+
+    def error(self, endpoint: str = '') -> SearchTimeout:
+        return SearchTimeout(f'Search did not complete within {self.seconds:g} seconds', endpoint=endpoint)
+
+    def timeout(self, endpoint: str = '') -> tuple[float, float]:
+        """Return the (connect, read) timeout for an upstream request. Raises a
+        `SearchTimeout` if the deadline has passed."""
+        self.check(endpoint)
+        remaining = self.remaining()
+        if self.connect_timeout is None:
+            return remaining, remaining
+        return min(self.connect_timeout, remaining), remaining
+
+
+class DeadlinePolicy:
+    """Determines the deadline for each search. The time allowed is the backend's
+    value in `timeouts`, falling back to `default_timeout`; a client may ask for
+    a shorter, but not a longer, deadline."""
+    def __init__(
+            self,
+            default_timeout: float = 30.0,
+            connect_timeout: float = 5.0,
+            timeouts: dict[str, float] | None = None,
+    ):
+        self.default_timeout = default_timeout
+        self.connect_timeout = connect_timeout
+        self.timeouts = timeouts or {}
+
+    def configure(self, env: Env):
+        """Apply the settings from the `SEARCH_TIMEOUT*` and `SEARCH_CONNECT_TIMEOUT`
+        environment variables."""
+        with env.prefixed('SEARCH_'):
+            self.default_timeout = env.float('TIMEOUT', self.default_timeout)
+            self.connect_timeout = env.float('CONNECT_TIMEOUT', self.connect_timeout)
+            self.timeouts = env.dict('TIMEOUTS', subcast_values=float, default=self.timeouts)
+
+    def timeout(self, backend: str) -> float:
+        return self.timeouts.get(backend, self.default_timeout)
+
+    def deadline(self, backend: str, requested: float | None = None) -> Deadline:
+        seconds = self.timeout(backend)
+        if requested is not None and requested < seconds:
+            return Deadline(requested, connect_timeout=self.connect_timeout, client_limited=True)
+        return Deadline(seconds, connect_timeout=self.connect_timeout)
+
+
+# process-wide search deadline settings
+deadline_policy = DeadlinePolicy()
@@ -0,0 +1,36 @@
+from itertools import zip_longest
+from typing import Any, Iterable, Mapping, Sequence
+
+from catalog_searcher.search import SearchResult
+
+
+def get_identifiers(result: SearchResult | Mapping[str, Any]) -> dict[str, str]:
+    """Get the identifiers of a result, which may be either a `SearchResult` or
+    a dictionary representation of one."""
+    if isinstance(result, Mapping):
+        return result.get('identifiers', {})
+    return result.identifiers
+
+
+def merge_results(result_lists: Sequence[Iterable[SearchResult | Mapping[str, Any]]]) -> list:
+    """Merge the ranked result lists from several backends into a single list, by
+    taking the first result from each list in turn, then the second, and so on.
+
+    A result is dropped if it shares an OCLC number, MMS id, or DOI with a result
+    that is already in the merged list, so the first backend to return an item
+    (or, for results of the same rank, the earlier backend in `result_lists`)
+    provides its entry. The identifiers seen so far are kept in a set, so each
+    result is checked in constant time.
+    """
+    seen: set[tuple[str, str]] = set()
+    merged = []
+    for ranked_results in zip_longest(*result_lists):
+        for result in ranked_results:
+            if result is None:
+                continue
+            keys = get_identifiers(result).items()
+            if any(key in seen for key in keys):
+                continue
+            seen.update(keys)
+            merged.append(result)
+    return merged
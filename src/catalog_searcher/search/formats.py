@@ -0,0 +1,60 @@
+from typing import Iterable, NamedTuple, Sequence
+
+
+class FormatRule(NamedTuple):
+    """Assigns `item_format` to records with the given `issuance` that have any of
+    the given physical description `forms`, or any of the given `genres`, which
+    are (authority, term) pairs."""
+    name: str
+    item_format: str
+    issuance: str
+    forms: tuple[str, ...] = ()
+    genres: tuple[tuple[str, str], ...] = ()
+
+
+class FormatMatch(NamedTuple):
+    item_format: str
+    # the rule that matched, or None if the default format was used
+    rule: FormatRule | None
+
+
+class FormatClassifier:
+    """Classifies records using an ordered table of `FormatRule`s; the first rule
+    that matches a record determines its format, and records that match no rule
+    get the `default` format.
+
+    The table is compiled once into dictionaries keyed by (issuance, form) and
+    (issuance, authority, term), whose values are the position of the first rule
+    with that condition. A record is classified with one lookup for each of its
+    forms and genres, however many rules there are.
+    """
+    def __init__(self, rules: Sequence[FormatRule], default: str = 'other'):
+        self.rules = tuple(rules)
+        self.default = default
+        self._forms: dict[tuple[str, str], int] = {}
+        self._genres: dict[tuple[str, str, str], int] = {}
+        for index, rule in enumerate(self.rules):
+            for form in rule.forms:
+                self._forms.setdefault((rule.issuance, form), index)
+            for authority, term in rule.genres:
+                self._genres.setdefault((rule.issuance, authority, term), index)
+
+    def classify(
+            self,
+            issuance: Iterable[str],
+            forms: Iterable[str],
+            genres: Iterable[tuple[str | None, str | None]],
+    ) -> FormatMatch:
+        forms = tuple(forms)
+        genres = tuple(genres)
+        no_match = len(self.rules)
+        first = no_match
+        for value in set(issuance):
+            for form in forms:
+                first = min(first, self._forms.get((value, form), no_match))
+            for authority, term in genres:
+                first = min(first, self._genres.get((value, authority, term), no_match))  # type: ignore[arg-type]
+        if first == no_match:
+            return FormatMatch(self.default, None)
+        rule = self.rules[first]
+        return FormatMatch(rule.item_format, rule)
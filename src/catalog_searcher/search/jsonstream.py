@@ -0,0 +1,110 @@
+import json
+from importlib.util import find_spec
+from typing import IO, Any, Mapping, Union
+
+from environs import Env
+
+# selector for a value that is kept in full
+KEEP = True
+
+# A selector is either KEEP, or a mapping from the keys of an object to the
+# selectors for their values; keys that are not in the mapping are skipped.
+# Arrays are transparent to selectors: the selector for an array is applied to
+# each of its items.
+Selector = Union[bool, Mapping[str, 'Selector']]
+
+
+def select(source: IO[bytes] | bytes, selector: Selector) -> Any:
+    """Decode the parts of a JSON document picked out by the `selector`,
+    reading the document incrementally. Skipped values are never built as
+    Python objects, so decoding a document of which only a small part is
+    needed takes much less memory than `json.loads()`:
+
+        ```pycon
+        >>> select(b'{"info": {"total": 2, "facets": []}, "docs": [{"id": 1, "x": 2}]}',
+        ...        {'info': {'total': KEEP}, 'docs': {'id': KEEP}})
+        {'info': {'total': 2}, 'docs': [{'id': 1}]}
+        ```
+
+    Numbers with a fractional part are decoded as floats, as `json.loads()`
+    does. Requires the [ijson] package (in the optional "json-select"
+    dependencies).
+
+    [ijson]: https://github.com/ICRAR/ijson
+    """
+    import ijson
+
+    root: list[Any] = []
+    # the containers being built, and the selectors for their values
+    stack: list[tuple[Any, Selector]] = [(root, selector)]
+    key = None
+    child: Selector | None = selector
+    # depth of the value being skipped, if any
+    skip = 0
+    for event, value in ijson.basic_parse(source, use_float=True):
+        if skip:
+            if event == 'start_map' or event == 'start_array':
+                skip += 1
+            elif event == 'end_map' or event == 'end_array':
+                skip -= 1
+            continue
+        if event == 'map_key':
+            parent_selector = stack[-1][1]
+            key = value
+            child = KEEP if parent_selector is KEEP else parent_selector.get(value)  # type: ignore[union-attr]
+            continue
+        if event == 'end_map' or event == 'end_array':
+            stack.pop()
+            # if the parent is an array, its next item has the same selector
+            child = stack[-1][1]
+            continue
+        if child is None:
+            if event == 'start_map' or event == 'start_array':
+                skip = 1
+            continue
+
+        is_container = True
+        if event == 'start_map':
+            value = {}
+        elif event == 'start_array':
+            value = []
+        else:
+            is_container = False
+        container = stack[-1][0]
+        if type(container) is list:
+            container.append(value)
+        else:
+            container[key] = value
+        if is_container:
+            stack.append((value, child))
+
+    return root[0] if root else None
+
+
+class ResponseDecoder:
+    """Decodes upstream JSON response bodies, in full with `json.loads()`, or,
+    for bodies of at least `select_min_bytes`, only the parts picked out by a
+    selector with `select()`.
+
+    Selective decoding takes about three times the CPU time of `json.loads()`,
+    even with ijson's C backend, and only lowers the peak memory noticeably for
+    bodies of hundreds of kilobytes or more, so it is disabled when
+    `select_min_bytes` is 0, as it is by default."""
+    def __init__(self, select_min_bytes: int = 0):
+        self.select_min_bytes = select_min_bytes
+
+    def configure(self, env: Env):
+        """Apply the settings from the `JSON_*` environment variables."""
+        with env.prefixed('JSON_'):
+            self.select_min_bytes = env.int('SELECT_MIN_BYTES', self.select_min_bytes)
+        if self.select_min_bytes > 0 and find_spec('ijson') is None:
+            raise ValueError('JSON_SELECT_MIN_BYTES requires the ijson package, from the "json-select" dependencies')
+
+    def decode(self, content: bytes, selector: Selector) -> Any:
+        if 0 < self.select_min_bytes <= len(content):
+            return select(content, selector)
+        return json.loads(content)
+
+
+# process-wide settings for decoding upstream JSON responses
+response_decoder = ResponseDecoder()
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import time
+from threading import Lock
+
+from requests import ConnectionError, Timeout
+from requests.auth import HTTPBasicAuth
+
+from catalog_searcher.search import SearchError, SearchTimeout
+from catalog_searcher.search.deadline import Deadline
+from catalog_searcher.search.pool import session_pool
+
+logger = logging.getLogger(__name__)
+
+
+class TokenManager:
+    """Caches an OAuth client credentials access token until shortly before it
+    expires, so that it can be reused across searches and threads.
+
+    Only one thread at a time fetches a new token. While a refresh is in progress,
+    other threads keep using the current token if it has not actually expired yet,
+    and otherwise wait for the refresh to finish.
+
+    Tokens are considered stale `refresh_margin` seconds before the `expires_in`
+    reported by the token endpoint. If the response does not include `expires_in`,
+    the token is not cached.
+    """
+    def __init__(self, token_url: str, client_id: str, client_secret: str, scope: str, refresh_margin: float = 60.0):
+        self.token_url = token_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.scope = scope
+        self.refresh_margin = refresh_margin
+        self._refresh_lock = Lock()
+        # (token, expires_at, refresh_at), replaced as a whole so that readers
+        # never see a token paired with another token's expiry times
+        self._state: tuple[str | None, float, float] = (None, 0.0, 0.0)
+
+    def get_token(self, deadline: Deadline | None = None) -> str:
+        """Return a valid access token, fetching a new one if necessary. Raises a
+        `SearchError` if the token cannot be retrieved, or a `SearchTimeout` if the
+        `deadline` passes before it is."""
+        token, _, refresh_at = self._state
+        if token is not None and time.monotonic() < refresh_at:
+            return token
+
+        if not self._refresh_lock.acquire(blocking=False):
+            # another thread is already refreshing; keep using the current
+            # token while it is still valid, otherwise wait for the new one
+            token, expires_at, _ = self._state
+            if token is not None and time.monotonic() < expires_at:
+                return token
+            if deadline is None:
+                self._refresh_lock.acquire()
+            elif not self._refresh_lock.acquire(timeout=deadline.remaining()):
+                raise deadline.error()
+
+        try:
+            # the token may have been refreshed while we were waiting for the lock
+            token, _, refresh_at = self._state
+            if token is not None and time.monotonic() < refresh_at:
+                return token
+            return self._refresh(deadline)
+        finally:
+            self._refresh_lock.release()
+
+    async def get_token_async(self, deadline: Deadline | None = None) -> str:
+        """Coroutine version of `get_token()`. A cached token is returned without
+        blocking; fetching a new one runs in a worker thread, so that the event
+        loop is not blocked while waiting on the token endpoint."""
+        token, _, refresh_at = self._state
+        if token is not None and time.monotonic() < refresh_at:
+            return token
+        return await asyncio.to_thread(self.get_token, deadline)
+
+    def invalidate(self, token: str | None = None):
+        """Discard the cached token. If `token` is given, only discard the cached
+        token if it is the same one, so that a token that another thread has just
+        refreshed is not thrown away."""
+        if token is None or token == self._state[0]:
+            self._state = (None, 0.0, 0.0)
+
+    def _refresh(self, deadline: Deadline | None = None) -> str:
+        logger.debug('Requesting new auth token from %s', self.token_url)
+        try:
+            response = session_pool.post(
+                url=self.token_url,
+                params={
+                    'scope': self.scope,
+                    'grant_type': 'client_credentials'
+                },
+                auth=HTTPBasicAuth(self.client_id, self.client_secret),
+                timeout=None if deadline is None else deadline.timeout(),
+            )
+        except Timeout as e:
+            logger.error(f'Auth token request timed out: {e}')
+            raise SearchTimeout('Auth token request timed out') from e
+        except ConnectionError as e:
+            logger.error(f'Auth error {e}')
+            raise SearchError('Backend auth error', cause='auth') from e
+
+        if not response.ok:
+            logger.error(f'Auth token error: {response}')
+            raise SearchError('Auth token error', cause='auth')
+
+        data = response.json()
+        token = data.get('access_token', None)
+        if token is None or token == '':
+            raise SearchError('Auth token error', cause='auth')
+
+        now = time.monotonic()
+        expires_in = float(data.get('expires_in', 0))
+        self._state = (str(token), now + expires_in, now + max(expires_in - self.refresh_margin, 0))
+        return str(token)
+
+
+_token_managers: dict[tuple[str, str, str], TokenManager] = {}
+_token_managers_lock = Lock()
+
+
+def get_token_manager(
+        token_url: str,
+        client_id: str,
+        client_secret: str,
+        scope: str,
+        refresh_margin: float = 60.0,
+) -> TokenManager:
+    """Return the process-wide token manager for the given token endpoint,
+    client, and scope, creating it if necessary."""
+    key = (token_url, client_id, scope)
+    with _token_managers_lock:
+        manager = _token_managers.get(key)
+        if manager is None or manager.client_secret != client_secret:
+            manager = _token_managers[key] = TokenManager(token_url, client_id, client_secret, scope, refresh_margin)
+        return manager
+
+
+def clear_token_managers():
+    """Discard all cached token managers and their tokens."""
+    with _token_managers_lock:
+        _token_managers.clear()
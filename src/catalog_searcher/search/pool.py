@@ -0,0 +1,140 @@
+import logging
+import time
+from threading import Lock
+from typing import Any
+from urllib.parse import urlsplit
+
+import requests
+from environs import Env
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class SessionPool:
+    """Thread-safe registry of keep-alive `requests.Session` objects, one per
+    upstream host. Each session keeps up to `pool_size` open connections to its
+    host (or the value for that host in `host_limits`), so that repeated searches
+    reuse an existing TCP+TLS connection instead of opening a new one.
+
+    If a host's session has not been used for more than `max_idle` seconds, its
+    connections are dropped and a fresh session is created on the next request,
+    since the upstream server has most likely closed them by then anyway.
+
+    When `block` is true, requests beyond a host's connection limit wait for a
+    free connection instead of opening an extra, unpooled one.
+    """
+    def __init__(
+            self,
+            pool_size: int = 10,
+            max_idle: float = 60.0,
+            host_limits: dict[str, int] | None = None,
+            block: bool = False,
+    ):
+        self.pool_size = pool_size
+        self.max_idle = max_idle
+        self.host_limits = host_limits or {}
+        self.block = block
+        self._lock = Lock()
+        self._sessions: dict[str, requests.Session] = {}
+        self._last_used: dict[str, float] = {}
+        self._counters: dict[str, dict[str, int]] = {}
+
+    def configure(self, env: Env):
+        """Apply the pool settings from the `HTTP_POOL_*` environment variables.
+        Any open sessions are closed, so the new settings take effect on the
+        next request."""
+        with env.prefixed('HTTP_POOL_'):
+            pool_size = env.int('SIZE', self.pool_size)
+            max_idle = env.float('MAX_IDLE', self.max_idle)
+            host_limits = env.dict('HOST_LIMITS', subcast_values=int, default=self.host_limits)
+            block = env.bool('BLOCK', self.block)
+        with self._lock:
+            self.pool_size = pool_size
+            self.max_idle = max_idle
+            self.host_limits = host_limits
+            self.block = block
+            self._close_all()
+
+    def session(self, url: str) -> requests.Session:
+        """Return the shared session for the host of the given URL, creating it
+        if necessary."""
+        host = urlsplit(url).netloc
+        now = time.monotonic()
+        with self._lock:
+            counters = self._counters.setdefault(host, {'requests': 0, 'sessions_created': 0, 'idle_resets': 0})
+            session = self._sessions.get(host)
+            if session is not None and now - self._last_used[host] > self.max_idle:
+                logger.debug('Session for %s idle for more than %ss; resetting', host, self.max_idle)
+                session.close()
+                session = None
+                counters['idle_resets'] += 1
+            if session is None:
+                session = self._sessions[host] = self._create_session(host)
+                counters['sessions_created'] += 1
+            self._last_used[host] = now
+            counters['requests'] += 1
+        return session
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.session(url).get(url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.session(url).post(url, **kwargs)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """Return a dictionary of per-host request and connection counts, suitable
+        for monitoring."""
+        now = time.monotonic()
+        with self._lock:
+            stats = {}
+            for host, counters in self._counters.items():
+                host_stats: dict[str, Any] = {
+                    **counters,
+                    'max_connections': self.host_limits.get(host, self.pool_size),
+                    'connections_created': 0,
+                    'idle_connections': 0,
+                }
+                session = self._sessions.get(host)
+                if session is not None:
+                    host_stats['idle_seconds'] = round(now - self._last_used[host], 3)
+                    # the same adapter is mounted for both http and https
+                    for adapter in set(session.adapters.values()):
+                        if not isinstance(adapter, HTTPAdapter):
+                            continue
+                        pools = adapter.poolmanager.pools
+                        for key in pools.keys():
+                            pool = pools.get(key)
+                            if pool is None or pool.pool is None:
+                                continue
+                            idle = sum(1 for conn in list(pool.pool.queue) if conn is not None)
+                            host_stats['connections_created'] += pool.num_connections
+                            host_stats['idle_connections'] += idle
+                stats[host] = host_stats
+            return stats
+
+    def close(self):
+        """Close all open sessions and their pooled connections."""
+        with self._lock:
+            self._close_all()
+
+    def _close_all(self):
+        for session in self._sessions.values():
+            session.close()
+        self._sessions.clear()
+        self._last_used.clear()
+
+    def _create_session(self, host: str) -> requests.Session:
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.host_limits.get(host, self.pool_size),
+            pool_block=self.block,
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+
+# process-wide session pool shared by all search backends
+session_pool = SessionPool()
@@ -0,0 +1,121 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Hashable
+
+from environs import Env
+
+from catalog_searcher.search.breaker import State, circuit_breakers
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """Runs speculative searches, such as for the page after the one a user has
+    just been served, in a small pool of background threads, so that their
+    responses are already cached when they are requested.
+
+    Prefetching is best effort: a search is only scheduled if the prefetcher is
+    `enabled`, the same search is not already scheduled, fewer than
+    `queue_size` prefetches are waiting or running overall, fewer than `budget`
+    of them are for the same backend, and the backend is healthy. A backend is
+    healthy if its circuit breaker is closed, and its recent calls have a
+    failure rate of at most `max_failure_rate` and a mean duration of at most
+    `max_latency` seconds. Otherwise, the search is skipped.
+    """
+    def __init__(
+            self,
+            enabled: bool = False,
+            workers: int = 2,
+            queue_size: int = 16,
+            budget: int = 4,
+            max_failure_rate: float = 0.1,
+            max_latency: float = 2.0,
+    ):
+        self.enabled = enabled
+        self.workers = workers
+        self.queue_size = queue_size
+        self.budget = budget
+        self.max_failure_rate = max_failure_rate
+        self.max_latency = max_latency
+        self._lock = Lock()
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending: set[Hashable] = set()
+        self._pending_by_backend: dict[str, int] = {}
+        self._counters = {'scheduled': 0, 'completed': 0, 'failed': 0, 'dropped': 0, 'unhealthy': 0}
+
+    def configure(self, env: Env):
+        """Apply the settings from the `PREFETCH_*` environment variables."""
+        with env.prefixed('PREFETCH_'):
+            self.enabled = env.bool('ENABLED', self.enabled)
+            self.workers = env.int('WORKERS', self.workers)
+            self.queue_size = env.int('QUEUE_SIZE', self.queue_size)
+            self.budget = env.int('BUDGET', self.budget)
+            self.max_failure_rate = env.float('MAX_FAILURE_RATE', self.max_failure_rate)
+            self.max_latency = env.float('MAX_LATENCY', self.max_latency)
+
+    def healthy(self, backend: str) -> bool:
+        stats = circuit_breakers.get(backend).stats()
+        return (
+            stats['state'] == State.CLOSED
+            and stats['failure_rate'] <= self.max_failure_rate
+            and stats['mean_duration'] <= self.max_latency
+        )
+
+    def submit(self, backend: str, key: Hashable, fn: Callable[[], Any]) -> bool:
+        """Schedule `fn`, which runs the search identified by `key` on `backend`,
+        to run in the background. Returns true if it was scheduled, and false if
+        it was skipped."""
+        if not self.enabled:
+            return False
+        if not self.healthy(backend):
+            with self._lock:
+                self._counters['unhealthy'] += 1
+            return False
+        with self._lock:
+            if key in self._pending:
+                return False
+            backend_pending = self._pending_by_backend.get(backend, 0)
+            if len(self._pending) >= self.queue_size or backend_pending >= self.budget:
+                self._counters['dropped'] += 1
+                return False
+            self._pending.add(key)
+            self._pending_by_backend[backend] = backend_pending + 1
+            self._counters['scheduled'] += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='prefetch')
+            self._executor.submit(self._run, backend, key, fn)
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'pending': len(self._pending),
+                **self._counters,
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Stop the background threads, after any scheduled prefetches have run
+        if `wait` is true."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _run(self, backend: str, key: Hashable, fn: Callable[[], Any]):
+        try:
+            fn()
+        except Exception as e:
+            logger.info(f'Prefetch of {key} failed: {e}')
+            outcome = 'failed'
+        else:
+            outcome = 'completed'
+        with self._lock:
+            self._pending.discard(key)
+            self._pending_by_backend[backend] -= 1
+            self._counters[outcome] += 1
+
+
+# process-wide prefetcher for the search results pages
+prefetcher = Prefetcher()
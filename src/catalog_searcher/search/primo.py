@@ -1,176 +1,199 @@
 import logging
 import re
-from typing import Any, Iterable, Mapping, TypeVar
+from dataclasses import dataclass
+from typing import Any, Iterable, Mapping, NamedTuple, TypeVar
 
-import requests
 from environs import Env
+from requests import ConnectionError, Timeout
 from uritemplate import URITemplate
 
-from catalog_searcher.search import Search, SearchError, SearchResponse, SearchResult
+from catalog_searcher.search import (
+    Search,
+    SearchError,
+    SearchResponse,
+    SearchResult,
+    SearchTimeout,
+    UpstreamRequest,
+    identifiers,
+)
+from catalog_searcher.search.jsonstream import KEEP, Selector, response_decoder
+from catalog_searcher.search.pool import session_pool
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class PrimoConfig:
+    api_key: str
+    link_resolver_template: URITemplate
+    vid: str
+    general_search_api_url_template: URITemplate
+    book_search_api_url_template: URITemplate
+    article_search_api_url_template: URITemplate
+    journal_search_api_url_template: URITemplate
+    item_url_template: URITemplate
+    general_search_url_template: URITemplate
+    book_search_url_template: URITemplate
+    article_search_url_template: URITemplate
+    journal_search_url_template: URITemplate
+
+    @classmethod
+    def from_env(cls, env: Env) -> 'PrimoConfig':
+        api_key = env.str('ALMA_API_KEY')
+        link_resolver_template = URITemplate(env.str('LINK_RESOLVER_TEMPLATE'))
+        with env.prefixed('PRIMO_'):
+            return cls(
+                api_key=api_key,
+                link_resolver_template=link_resolver_template,
+                vid=env.str('VID'),
+                general_search_api_url_template=URITemplate(env.str('GENERAL_SEARCH_API_URL_TEMPLATE')),
+                book_search_api_url_template=URITemplate(env.str('BOOK_SEARCH_API_URL_TEMPLATE')),
+                article_search_api_url_template=URITemplate(env.str('ARTICLE_SEARCH_API_URL_TEMPLATE')),
+                journal_search_api_url_template=URITemplate(env.str('JOURNAL_SEARCH_API_URL_TEMPLATE')),
+                item_url_template=URITemplate(env.str('ITEM_URL_TEMPLATE')),
+                general_search_url_template=URITemplate(env.str('GENERAL_SEARCH_URL_TEMPLATE')),
+                book_search_url_template=URITemplate(env.str('BOOK_SEARCH_URL_TEMPLATE')),
+                article_search_url_template=URITemplate(env.str('ARTICLE_SEARCH_URL_TEMPLATE')),
+                journal_search_url_template=URITemplate(env.str('JOURNAL_SEARCH_URL_TEMPLATE')),
+            )
+
+
 class PrimoSearch(Search):
 
     general_formats_map = {
         'null': 'other'
     }
+    config: PrimoConfig
 
-    def __init__(self, env: Env, endpoint: str, query: str, page: int, per_page: int):
-        self.endpoint = endpoint
-        self.query = query
-        self.page = page
-        self.per_page = per_page
-        self.api_key = env.str('ALMA_API_KEY')
-        self.link_resolver_template = URITemplate(env.str('LINK_RESOLVER_TEMPLATE'))
-        with env.prefixed('PRIMO_'):
-            self.vid = env.str('VID')
-            self.general_search_api_url_template = URITemplate(env.str('GENERAL_SEARCH_API_URL_TEMPLATE'))
-            self.book_search_api_url_template = URITemplate(env.str('BOOK_SEARCH_API_URL_TEMPLATE'))
-            self.article_search_api_url_template = URITemplate(env.str('ARTICLE_SEARCH_API_URL_TEMPLATE'))
-            self.journal_search_api_url_template = URITemplate(env.str('JOURNAL_SEARCH_API_URL_TEMPLATE'))
-            self.item_url_template = URITemplate(env.str('ITEM_URL_TEMPLATE'))
-            self.general_search_url_template = URITemplate(env.str('GENERAL_SEARCH_URL_TEMPLATE'))
-            self.book_search_url_template = URITemplate(env.str('BOOK_SEARCH_URL_TEMPLATE'))
-            self.article_search_url_template = URITemplate(env.str('ARTICLE_SEARCH_URL_TEMPLATE'))
-            self.journal_search_url_template = URITemplate(env.str('JOURNAL_SEARCH_URL_TEMPLATE'))
+    @classmethod
+    def configure(cls, env: Env) -> PrimoConfig:
+        return PrimoConfig.from_env(env)
 
-    def search(self) -> SearchResponse:
+    def build_request(self) -> UpstreamRequest:
         # The bento search starts page numbering at 0 (this is a carryover from the
         # original searchumd behavior), so we need to use "page * page_size" instead
         # of the more usual "(page - 1) * page_size" to calculate the record offset
         # for the first page.
         offset = self.page * self.per_page
 
-        if self.endpoint == 'articles':
-            api_url_template = self.article_search_api_url_template
-            search_url_template = self.article_search_url_template
-        elif self.endpoint == 'journals':
-            api_url_template = self.journal_search_api_url_template
-            search_url_template = self.journal_search_url_template
-        elif self.endpoint == 'books':
-            api_url_template = self.book_search_api_url_template
-            search_url_template = self.book_search_url_template
-        else:
-            api_url_template = self.general_search_api_url_template
-            search_url_template = self.general_search_url_template
-
+        api_url_template, _ = self.get_url_templates()
         api_search_url = api_url_template.expand(
-            vid=self.vid,
+            vid=self.config.vid,
             q=self.q,
             jq=self.jq,
             offset=offset,
             limit=self.per_page,
         )
         headers = {
-            'Authorization': f'apikey {self.api_key}'
+            'Authorization': f'apikey {self.config.api_key}'
         }
+        return UpstreamRequest(url=api_search_url, headers=headers)
+
+    def search(self) -> SearchResponse:
+        request = self.build_request()
         try:
-            response = requests.get(api_search_url, headers=headers)
+            with self.timings.phase('upstream'):
+                response = session_pool.get(request.url, headers=request.headers, timeout=self.timeout())
+        except Timeout as e:
+            logger.error(f'Search timed out at url {request.url}\n{e}')
+            raise SearchTimeout('Search timed out', endpoint=self.endpoint)
         except ConnectionError as e:
-            logger.error(f'Search error at url {api_search_url}\n{e}')
-            raise SearchError('Search error', endpoint=self.endpoint)
+            logger.error(f'Search error at url {request.url}\n{e}')
+            raise SearchError('Search error', endpoint=self.endpoint, cause='connection')
 
-        if not response.ok:
-            logger.error(f'Received {response.status_code} with q={self.query}')
-            raise SearchError(f'Received {response.status_code} for q={self.query}', endpoint=self.endpoint)
+        with self.timings.phase('parse'):
+            return self.parse_response(request, response)
 
-        data = response.json()
+    def parse_response(self, request: UpstreamRequest, response: Any) -> SearchResponse:
+        self.check_response(response)
+        if self.include_raw:
+            data = response.json()
+        else:
+            # a large response may be decoded selectively, to only the parts that parse_result() uses
+            data = response_decoder.decode(response.content, PRIMO_RESPONSE_SELECTOR)
 
+        _, search_url_template = self.get_url_templates()
+        raw = {'request_url': request.url}
+        if self.include_raw:
+            raw['data'] = data
         return SearchResponse(
             results=[self.parse_result(doc) for doc in data['docs']],
             total=data['info']['total'],
-            module_link=search_url_template.expand(vid=self.vid, query=self.q, journalsquery=self.jq),
-            raw={'request_url': api_search_url, 'data': data},
+            module_link=search_url_template.expand(vid=self.config.vid, query=self.q, journalsquery=self.jq),
+            raw=raw,
         )
 
+    def get_url_templates(self) -> tuple[URITemplate, URITemplate]:
+        """Return the API URL template and the search UI URL template for this
+        search's endpoint."""
+        if self.endpoint == 'articles':
+            return self.config.article_search_api_url_template, self.config.article_search_url_template
+        elif self.endpoint == 'journals':
+            return self.config.journal_search_api_url_template, self.config.journal_search_url_template
+        elif self.endpoint == 'books':
+            return self.config.book_search_api_url_template, self.config.book_search_url_template
+        else:
+            return self.config.general_search_api_url_template, self.config.general_search_url_template
+
     def parse_result(self, item: Mapping[str, Any]) -> SearchResult:
-        getit = None
-        delivery_cat = None
-        alma_avail = None
-        bestlocation = None
-        open_url = None
-        if 'delivery' in item:
-            open_url = item['delivery'].get('almaOpenurl', '')
-            bestlocation = item['delivery'].get('bestlocation', {})
-            getit = first(item['delivery'].get('GetIt1', {}))
-            alma_avail = first(item['delivery'].get('availability'))
-            delivery_cat = item['delivery'].get('deliveryCategory')
-        display = item['pnx'].get('display', {})
-        links = item['pnx'].get('links', {})
-        control = item['pnx'].get('control', {})
-        addata = item['pnx'].get('addata', {})
-        doi = first(get_values(addata, 'doi'))
-        mms = first(get_values(display, 'mms'))
-        record_id = first(get_values(control, 'recordid'))
+        pnx = pnx_extractor.extract(item['pnx'])
+        delivery = item.get('delivery')
 
-        availability = []
-        # See if online or not
         is_online = False
-        if alma_avail is not None:
-            match alma_avail:
-                case 'fulltext':
-                    is_online = True
-                case 'fulltext_multiple':
-                    is_online = True
-
-        if delivery_cat is not None:
-            if 'Alma-E' in delivery_cat:
+        open_url = None
+        availability = []
+        if delivery is not None:
+            open_url = delivery.get('almaOpenurl', '')
+            # See if online or not
+            if first(delivery.get('availability')) in ('fulltext', 'fulltext_multiple'):
                 is_online = True
-
-        get_category = None
-        if getit is not None:
-            if 'category' in getit:
-                get_category = get_values(getit, 'category')
-                if get_category == "Alma-E":
-                    is_online = True
-
-        # Try to get call number and location
-        if bestlocation is not None:
-            if 'mainLocation' in bestlocation:
-                location = get_values(bestlocation, 'mainLocation')
-                availability.append(location)
-            if 'callNumber' in bestlocation:
-                callnum = get_values(bestlocation, 'callNumber')
-                availability.append(callnum)
-
+            delivery_cat = delivery.get('deliveryCategory')
+            if delivery_cat is not None and 'Alma-E' in delivery_cat:
+                is_online = True
+            getit = first(delivery.get('GetIt1', {}))
+            if getit is not None and getit.get('category') == 'Alma-E':
+                is_online = True
+            # Try to get call number and location
+            bestlocation = delivery.get('bestlocation', {})
+            if bestlocation is not None:
+                if 'mainLocation' in bestlocation:
+                    availability.append(bestlocation['mainLocation'])
+                if 'callNumber' in bestlocation:
+                    availability.append(bestlocation['callNumber'])
+
+        record_id = pnx['recordid']
+        mms = pnx['mms']
+        doi = pnx['doi']
         if record_id is not None and len(record_id) > 5:
-            link = self.item_url_template.expand(
+            link = self.config.item_url_template.expand(
                 docid=f'{record_id}',
-                vid=self.vid,
+                vid=self.config.vid,
                 query=self.q,
             )
         elif mms is not None and len(mms) > 5:
-            link = self.item_url_template.expand(
+            link = self.config.item_url_template.expand(
                 docid=f'alma{mms}',
-                vid=self.vid,
+                vid=self.config.vid,
                 query=self.q,
             )
         elif open_url is not None and len(open_url) > 5 and is_online:
             logger.debug(open_url)
             link = open_url
-        elif 'linktohtml' in links:
-            link = parse_field(links['linktohtml'][0]).get('U', '')
+        elif pnx['linktohtml'] is not None:
+            link = get_subfield(pnx['linktohtml'], 'U') or ''
         elif doi is not None and len(doi) > 2:
-            atitle = first(get_values(addata, 'atitle'))
-            jtitle = first(get_values(addata, 'jtitle'))
-            rft_volume = first(get_values(addata, 'volume'))
-            link = self.link_resolver_template.expand(
+            link = self.config.link_resolver_template.expand(
                 rft_id=f'{doi}',
-                atitle=f'{atitle}',
-                jtitle=f'{jtitle}',
-                rft_volume=f'{rft_volume}',
+                atitle=f'{pnx["atitle"]}',
+                jtitle=f'{pnx["jtitle"]}',
+                rft_volume=f'{pnx["volume"]}',
             )
         else:
             link = ''
 
-        creator_data = get_values(display, 'creator', 'contributor')
-        creator_fields = [parse_field(v) for v in creator_data]
-        creators = [f.get('Q', f.get('', '')) for f in creator_fields]
+        creators = [creator_name(v) for v in pnx['creators']]
 
-        available = ''
-        if availability is not None and len(availability) > 0:
+        if availability:
             available = ' - '.join(availability)
             if is_online:
                 available = 'Online / ' + available
@@ -180,13 +203,14 @@ class PrimoSearch(Search):
             available = 'Click for availability'
 
         return SearchResult(
-            title=first(get_values(display, 'vertitle')) or first(get_values(display, 'title')) or '',
-            date=first(get_values(display, 'date', 'creationdate')) or '',
+            title=pnx['vertitle'] or pnx['title'] or '',
+            date=pnx['date'] or '',
             author='; '.join(creators),
-            description=first(get_values(display, 'description', 'contents')) or '',
-            item_format=get_item_format(self, first(get_values(display, 'type'))) or 'other',
+            description=pnx['description'] or '',
+            item_format=get_item_format(self, pnx['type']) or 'other',
             availability=available,
             link=link,
+            identifiers=identifiers(oclc=pnx['oclcid'], mms=mms, doi=doi),
         )
 
     @property
@@ -204,16 +228,83 @@ def get_item_format(self, raw_type: str) -> str:
     return raw_type
 
 
-def get_values(metadata: Mapping[str, list[str]], *keys) -> list[str]:
-    """Return the value in metadata for the first key in keys
-    that exists. If none of the keys are found, returns an empty
-    list."""
-    for key in keys:
-        try:
-            return metadata[key]
-        except KeyError:
-            pass
-    return []
+class PNXField(NamedTuple):
+    """A value to extract from a PNX record: the values of the first of `keys`
+    that is present in the `section`, or only the first of those values if
+    `multiple` is false."""
+    name: str
+    section: str
+    keys: tuple[str, ...]
+    multiple: bool = False
+
+
+PNX_FIELDS = (
+    PNXField('title', 'display', ('title',)),
+    PNXField('vertitle', 'display', ('vertitle',)),
+    PNXField('date', 'display', ('date', 'creationdate')),
+    PNXField('description', 'display', ('description', 'contents')),
+    PNXField('type', 'display', ('type',)),
+    PNXField('mms', 'display', ('mms',)),
+    PNXField('creators', 'display', ('creator', 'contributor'), multiple=True),
+    PNXField('recordid', 'control', ('recordid',)),
+    PNXField('doi', 'addata', ('doi',)),
+    PNXField('oclcid', 'addata', ('oclcid',)),
+    PNXField('atitle', 'addata', ('atitle',)),
+    PNXField('jtitle', 'addata', ('jtitle',)),
+    PNXField('volume', 'addata', ('volume',)),
+    PNXField('linktohtml', 'links', ('linktohtml',)),
+)
+
+
+class PNXExtractor:
+    """Extracts a fixed set of fields from PNX records. The fields are grouped
+    by section when the extractor is created, so each record's sections are
+    looked up once, and each field's keys are checked in a single pass."""
+    def __init__(self, fields: Iterable[PNXField]):
+        sections: dict[str, list[tuple[str, tuple[str, ...], bool]]] = {}
+        self._empty: dict[str, Any] = {}
+        for field in fields:
+            sections.setdefault(field.section, []).append((field.name, field.keys, field.multiple))
+            self._empty[field.name] = [] if field.multiple else None
+        self._sections = tuple((section, tuple(fields)) for section, fields in sections.items())
+
+    def extract(self, pnx: Mapping[str, Mapping[str, list[str]]]) -> dict[str, Any]:
+        """Return a dictionary with the value of each field in the PNX record, or
+        `None` (an empty list for `multiple` fields) if it is not present."""
+        values = dict(self._empty)
+        for section_name, fields in self._sections:
+            section = pnx.get(section_name)
+            if not section:
+                continue
+            for name, keys, multiple in fields:
+                for key in keys:
+                    if key in section:
+                        found = section[key]
+                        values[name] = found if multiple else (found[0] if found else None)
+                        break
+        return values
+
+    def selector(self) -> dict[str, dict[str, bool]]:
+        """Return a `jsonstream` selector for the PNX sections and keys that
+        this extractor reads."""
+        return {
+            section: {key: KEEP for _, keys, _ in fields for key in keys}
+            for section, fields in self._sections
+        }
+
+
+pnx_extractor = PNXExtractor(PNX_FIELDS)
+
+# the parts of a Primo search response that parse_response() uses
+PRIMO_RESPONSE_SELECTOR: Selector = {
+    'info': {'total': KEEP},
+    'docs': {
+        'pnx': pnx_extractor.selector(),
+        'delivery': {
+            key: KEEP for key in ('almaOpenurl', 'availability', 'bestlocation', 'deliveryCategory', 'GetIt1')
+        },
+    },
+}
 
 
 field_match = re.compile(r'\$\$(.)([^$]*)')
@@ -255,6 +346,41 @@ def parse_field(field: str) -> dict[str, str]:
     return data
 
 
+def get_subfield(field: str, code: str) -> str | None:
+    """Return the value of the `$$X` tagged subfield of a field, where X is the
+    given `code`, or `None` if there is no such subfield. This returns the same
+    value as `parse_field(field).get(code)`, without parsing the other subfields:
+
+        ```pycon
+        >>> get_subfield('$$ADoe, John$$BJohn Doe, author.', 'B')
+        'John Doe, author.'
+        ```
+    """
+    value = None
+    start = field.find('$$')
+    while start != -1:
+        tag = start + 2
+        if tag < len(field) and field[tag] != '\n':
+            end = field.find('$', tag + 1)
+            if end == -1:
+                end = len(field)
+            if field[tag] == code:
+                value = field[tag + 1:end]
+            start = field.find('$$', end)
+        else:
+            start = field.find('$$', start + 1)
+    return value
+
+
+def creator_name(field: str) -> str:
+    """Return the `$$Q` subfield of a creator or contributor field, falling back
+    to any text before the first tag."""
+    name = get_subfield(field, 'Q')
+    if name is None:
+        name = field.partition('$')[0]
+    return name
+
+
 T = TypeVar('T')
 
 
@@ -0,0 +1,118 @@
+import asyncio
+from threading import Event, Lock
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+T = TypeVar('T')
+
+
+class Call(Generic[T]):
+    """A function call in progress, that other threads can wait on."""
+    def __init__(self):
+        self.done = Event()
+        self.result: T | None = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that have the same key. The first caller for a
+    key runs the function; any callers that arrive with the same key while it is
+    still running wait for it to finish, and get the same return value, or have
+    the same exception raised.
+
+    `collapsed` counts the calls that were served by another caller's call.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self._calls: dict[Hashable, Call] = {}
+        self.calls = 0
+        self.collapsed = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T], timeout: float | None = None) -> T:
+        """Call `fn`, or wait for the call already in progress for `key`. A caller
+        that waits for another caller's call raises a `TimeoutError` if it is not
+        done within `timeout` seconds; the call itself is not interrupted."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = Call()
+                self.calls += 1
+                leader = True
+            else:
+                self.collapsed += 1
+                leader = False
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f'Call for {key} did not complete within {timeout} seconds')
+            if call.error is not None:
+                raise call.error
+            return call.result  # type: ignore
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'calls': self.calls,
+                'collapsed': self.collapsed,
+            }
+
+
+class AsyncSingleFlight:
+    """Asyncio version of `SingleFlight`, for coroutines running in a single
+    event loop. If the first caller for a key is cancelled, the callers waiting
+    on it are cancelled as well."""
+    def __init__(self):
+        self._futures: dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.collapsed = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]], timeout: float | None = None) -> T:
+        future = self._futures.get(key)
+        if future is not None:
+            self.collapsed += 1
+            # shielded, so that a waiting caller that is cancelled or times out does not cancel the shared call
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f'Call for {key} did not complete within {timeout} seconds')
+
+        future = self._futures[key] = asyncio.get_running_loop().create_future()
+        self.calls += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # mark the exception as retrieved, in case no other caller was waiting for it
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._futures[key]
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'in_flight': len(self._futures),
+            'calls': self.calls,
+            'collapsed': self.collapsed,
+        }
+
+
+# process-wide coalescing of identical concurrent searches
+search_flights = SingleFlight()
+async_search_flights = AsyncSingleFlight()
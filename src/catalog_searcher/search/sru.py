@@ -0,0 +1,52 @@
+from typing import IO, Iterator
+
+from lxml import etree
+from pymods import MODSRecord
+
+SRW_NS = 'http://www.loc.gov/zing/srw/'
+MODS_NS = 'http://www.loc.gov/mods/v3'
+
+NUMBER_OF_RECORDS = f'{{{SRW_NS}}}numberOfRecords'
+RECORD = f'{{{SRW_NS}}}record'
+MODS = f'{{{MODS_NS}}}mods'
+
+
+class SRUReader:
+    """Single-pass, streaming reader for SRU searchRetrieve responses with MODS
+    records. The total number of records is read when the reader is created, and
+    iterating over the reader then yields each record as a `MODSRecord`, as it is
+    parsed. Once the next record has been requested, the previous one is cleared
+    from the document tree, so memory use does not grow with the number of records.
+
+    Records are only valid until the next record is requested, so any values
+    needed from them must be extracted before then.
+    """
+    def __init__(self, source: IO[bytes]):
+        self._events = etree.iterparse(source, events=('end',), tag=(NUMBER_OF_RECORDS, RECORD, MODS))
+        # parse every element as a MODSRecord, as pymods' MODSReader does
+        self._events.set_element_class_lookup(etree.ElementDefaultClassLookup(element=MODSRecord))
+        self._pending: list[MODSRecord] = []
+        self.total = self._read_total()
+
+    def _read_total(self) -> int:
+        """Read up to the numberOfRecords element, which the SRU schema places before
+        the records. If there is none, the total is 0."""
+        for _, element in self._events:
+            if element.tag == NUMBER_OF_RECORDS:
+                return int(element.text or 0)
+            if element.tag == MODS:
+                # not expected; keep the record for the iterator
+                self._pending.append(element)
+        return 0
+
+    def __iter__(self) -> Iterator[MODSRecord]:
+        yield from self._pending
+        self._pending.clear()
+        for _, element in self._events:
+            if element.tag == MODS:
+                yield element
+            elif element.tag == RECORD:
+                # the MODS record inside this SRU record has been consumed
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
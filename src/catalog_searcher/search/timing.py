@@ -0,0 +1,46 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator, Mapping
+
+
+class Timings:
+    """Durations, in seconds, of the named phases of a search or a request, such
+    as "auth", "upstream", and "parse". A phase that runs more than once (e.g.,
+    an upstream request that is retried) accumulates the time of each run.
+
+        ```pycon
+        >>> timings = Timings()
+        >>> with timings.phase('upstream'):
+        ...     response = send(request)
+        >>> timings.server_timing()
+        'upstream;dur=105.2'
+        ```
+    """
+    def __init__(self):
+        self.durations: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Record the time taken by the body of the `with` statement as the phase
+        `name`, even if it raises an exception."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def update(self, durations: Mapping[str, float], prefix: str = ''):
+        """Add the given durations, with their names prefixed by `prefix`."""
+        for name, seconds in durations.items():
+            self.add(prefix + name, seconds)
+
+    def milliseconds(self) -> dict[str, float]:
+        """Return the durations in milliseconds, rounded to tenths."""
+        return {name: round(seconds * 1000, 1) for name, seconds in self.durations.items()}
+
+    def server_timing(self) -> str:
+        """Format the durations as the value of a `Server-Timing` response header."""
+        return ', '.join(f'{name};dur={duration}' for name, duration in self.milliseconds().items())
@@ -1,18 +1,82 @@
-import dataclasses
 import logging
-from typing import Any, Mapping
+from dataclasses import dataclass
+from http import HTTPStatus
+from typing import TYPE_CHECKING, Any, Mapping
 
 import furl
-import requests
 from environs import Env
-from requests import ConnectionError
-from requests.auth import HTTPBasicAuth
+from requests import ConnectionError, Response, Timeout
 
-from catalog_searcher.search import Search, SearchError, SearchResponse, SearchResult, with_key
+from catalog_searcher.search import (
+    Search,
+    SearchError,
+    SearchResponse,
+    SearchResult,
+    SearchTimeout,
+    UpstreamRequest,
+    identifiers,
+    with_key,
+)
+from catalog_searcher.search.jsonstream import KEEP, Selector, response_decoder
+from catalog_searcher.search.oauth import TokenManager, get_token_manager
+from catalog_searcher.search.pool import session_pool
+
+if TYPE_CHECKING:
+    from catalog_searcher.search.deadline import Deadline
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class WorldcatConfig:
+    search_url: str
+    book_item_types: str
+    article_item_types: str
+    article_item_subtypes: str
+    subtypes_url: str
+    no_results_url: str
+    module_url: str
+    token_manager: TokenManager
+
+    @classmethod
+    def from_env(cls, env: Env) -> 'WorldcatConfig':
+        with env.prefixed('WORLDCAT_'):
+            return cls(
+                search_url=furl.furl(env.str('API_BASE')).url,
+                book_item_types=env.str('BOOKS_ITEM_TYPES'),
+                article_item_types=env.str('ARTICLES_ITEM_TYPES'),
+                article_item_subtypes=env.str('ARTICLES_ITEM_SUBTYPES'),
+                subtypes_url=env.str('SUBTYPES_URL'),
+                no_results_url=env.str('NO_RESULTS_URL'),
+                module_url=env.str('MODULE_URL'),
+                token_manager=get_token_manager(
+                    token_url=env.str('TOKEN_URL', 'https://oauth.oclc.org/token'),
+                    client_id=env.str('CLIENT_ID'),
+                    client_secret=env.str('SECRET'),
+                    scope='WorldCatDiscoveryAPI',
+                    refresh_margin=env.float('TOKEN_REFRESH_MARGIN', 60.0),
+                ),
+            )
+
+
+# the parts of a search response that WorldcatSearch.parse_response() uses
+WORLDCAT_RESPONSE_SELECTOR: Selector = {
+    'numberOfRecords': KEEP,
+    'detailedRecords': {
+        key: KEEP for key in (
+            'title',
+            'date',
+            'creator',
+            'summary',
+            'generalFormat',
+            'specificFormat',
+            'oclcNumber',
+            'digitalAccessAndLocations',
+        )
+    },
+}
+
+
 class WorldcatSearch(Search):
     """Search class that uses the OCLC Discovery API. See:
     https://developer.api.oclc.org/worldcat-discovery#/Bibliographic%20Resources/search-bibs-details
@@ -43,31 +107,33 @@ class WorldcatSearch(Search):
         'null': 'other'
     }
 
-    def __init__(self, env: Env, endpoint: str, query: str, page: int, per_page: int):
-        with env.prefixed('WORLDCAT_'):
-            self.search_url = furl.furl(env.str('API_BASE'))
-            self.api_key = env.str('CLIENT_ID')
-            self.api_secret = env.str('SECRET')
-            self.book_item_types = env.str('BOOKS_ITEM_TYPES')
-            self.article_item_types = env.str('ARTICLES_ITEM_TYPES')
-            self.article_item_subtypes = env.str('ARTICLES_ITEM_SUBTYPES')
-            self.subtypes_url = env.str('SUBTYPES_URL')
-            self.no_results_url = env.str('NO_RESULTS_URL')
-            self.module_url = env.str('MODULE_URL')
-        self.endpoint = endpoint
-        self.query = query
-        self.page = page
-        self.per_page = per_page
+    config: WorldcatConfig
+
+    def __init__(
+            self,
+            config: WorldcatConfig,
+            endpoint: str,
+            query: str,
+            page: int,
+            per_page: int,
+            deadline: 'Deadline | None' = None,
+            include_raw: bool = True,
+    ):
+        super().__init__(config, endpoint, query, page, per_page, deadline, include_raw)
         # The bento search starts page numbering at 0 (this is a carryover from the
         # original searchumd behavior), so we need to use "page * page_size" instead
         # of the more usual "(page - 1) * page_size" to calculate the record offset
         # for the first page.
         self.offset = page * self.per_page
 
-    def search(self) -> SearchResponse:
-        """Run the search, and returns a dictionary representing the API response. If there are any
-        errors performing the search, raises a `SearchError`."""
-        logger.debug(f'Pagination debug offset={self.offset} page={self.page} limit={self.per_page}')
+    @classmethod
+    def configure(cls, env: Env) -> WorldcatConfig:
+        return WorldcatConfig.from_env(env)
+
+    def build_request(self) -> UpstreamRequest:
+        """Build the OCLC API search request. The authorization header is added when
+        the request is sent, since the access token may need to be refreshed."""
+        logger.debug('Pagination debug offset=%s page=%s limit=%s', self.offset, self.page, self.per_page)
 
         # Prepare OCLC API search
         params: dict[str, str] = {
@@ -81,38 +147,56 @@ class WorldcatSearch(Search):
 
         match self.endpoint:
             case 'articles':
-                params['itemType'] = self.article_item_types
-                params['itemSubType'] = self.article_item_subtypes
+                params['itemType'] = self.config.article_item_types
+                params['itemSubType'] = self.config.article_item_subtypes
             case _:
                 # Default to books-and-more searcher
-                params['itemType'] = self.book_item_types
+                params['itemType'] = self.config.book_item_types
 
-        headers = {
-            'Authorization': 'Bearer ' + self.get_auth_token()
-        }
+        return UpstreamRequest(url=self.config.search_url, params=params)
+
+    def search(self) -> SearchResponse:
+        """Run the search, and returns a dictionary representing the API response. If there are any
+        errors performing the search, raises a `SearchError`."""
+        request = self.build_request()
 
         # Execute OCLC API search
         try:
-            response = requests.get(self.search_url.url, params=params, headers=headers)
+            token = self.get_auth_token()
+            response = self.send_search_request(request, token)
+            if response.status_code == HTTPStatus.UNAUTHORIZED:
+                # the cached token may have been revoked upstream; get a new one and try once more
+                logger.info('Search request was unauthorized; refreshing auth token and retrying')
+                self.config.token_manager.invalidate(token)
+                response = self.send_search_request(request, self.get_auth_token())
+        except Timeout as e:
+            logger.error(f'Search timed out at url {request.url}, params={request.params}\n{e}')
+            raise SearchTimeout('Search timed out', endpoint=self.endpoint)
         except ConnectionError as e:
-            logger.error(f'Search error at url {self.search_url.url}, params={params}\n{e}')
-            raise SearchError('Search error', endpoint=self.endpoint)
+            logger.error(f'Search error at url {request.url}, params={request.params}\n{e}')
+            raise SearchError('Search error', endpoint=self.endpoint, cause='connection')
+
+        with self.timings.phase('parse'):
+            return self.parse_response(request, response)
 
-        if not response.ok:
-            logger.error(f'Received {response.status_code} with q={self.query}')
-            raise SearchError(f'Received {response.status_code} for q={self.query}', endpoint=self.endpoint)
+    def parse_response(self, request: UpstreamRequest, response: Any) -> SearchResponse:
+        self.check_response(response)
 
-        logger.debug(f'Submitted url={self.search_url.url}, params={params}')
-        logger.debug(f'Received response {response.status_code}')
+        logger.debug('Submitted url=%s, params=%s', request.url, request.params)
+        logger.debug('Received response %s', response.status_code)
 
-        json_response = response.json()
+        if self.include_raw:
+            json_response = response.json()
+        else:
+            # a large response may be decoded selectively, to only the parts that parse_result() uses
+            json_response = response_decoder.decode(response.content, WORLDCAT_RESPONSE_SELECTOR)
         total = int(json_response.get('numberOfRecords', 0))
 
         return SearchResponse(
-            results=[dataclasses.asdict(self.parse_result(item)) for item in json_response.get('detailedRecords', [])],
+            results=[self.parse_result(item) for item in json_response.get('detailedRecords', [])],
             total=total,
             module_link=self.module_link,
-            raw=json_response,
+            raw=json_response if self.include_raw else {},
         )
 
     def parse_result(self, item: Any) -> SearchResult:
@@ -123,6 +207,7 @@ class WorldcatSearch(Search):
             description=item.get('summary', ''),
             item_format=self.get_item_format(item),
             link=self.get_preferred_link(item),
+            identifiers=identifiers(oclc=item.get('oclcNumber'), doi=self.get_doi(item)),
         )
 
     def get_preferred_link(self, item: Mapping[str, Any]) -> str:
@@ -147,6 +232,13 @@ class WorldcatSearch(Search):
 
         return 'https://umaryland.on.worldcat.org/discovery'
 
+    def get_doi(self, item: Mapping[str, Any]) -> str | None:
+        """Get the first DOI URI from the item's locations, or `None`."""
+        for location in filter(with_key('uri'), item.get('digitalAccessAndLocations', [])):
+            if location['uri'].startswith('https://doi.org/'):
+                return location['uri']
+        return None
+
     def get_item_format(self, item: Mapping[str, Any]) -> str:
         """Get the item format for a single item. Looks up the format in the
         `general_formats_map`. If there is no matching format found, returns
@@ -163,33 +255,29 @@ class WorldcatSearch(Search):
             logger.error(f'Missing format {key_error}')
             return 'other'
 
-    def get_auth_token(self) -> str:
-        try:
-            response = requests.post(
-                url='https://oauth.oclc.org/token',
-                params={
-                    'scope': 'WorldCatDiscoveryAPI',
-                    'grant_type': 'client_credentials'
-                },
-                auth=HTTPBasicAuth(self.api_key, self.api_secret),
+    def send_search_request(self, request: UpstreamRequest, token: str) -> Response:
+        with self.timings.phase('upstream'):
+            return session_pool.get(
+                request.url,
+                params=request.params,
+                headers=self.auth_headers(token),
+                timeout=self.timeout(),
             )
-        except ConnectionError as e:
-            logger.error(f'Auth error {e}')
-            raise RuntimeError('Backend auth error') from e
-
-        if not response.ok:
-            logger.error(f'Auth token error: {response}')
-            raise RuntimeError('Auth token error')
 
-        token = response.json().get('access_token', None)
-        if token is None or token == '':
-            raise RuntimeError('Auth token error')
+    def auth_headers(self, token: str) -> dict[str, str]:
+        return {'Authorization': 'Bearer ' + token}
 
-        return str(token)
+    def get_auth_token(self) -> str:
+        """Get an access token for the Discovery API. The token is shared across
+        requests until shortly before it expires. Raises a `SearchError` if a
+        new token cannot be retrieved, or a `SearchTimeout` if the search's deadline
+        passes first."""
+        with self.timings.phase('auth'):
+            return self.config.token_manager.get_token(deadline=self.deadline)
 
     @property
     def module_link(self) -> str:
         if self.endpoint == 'articles':
-            return self.module_url + '?' + self.subtypes_url + '&queryString=' + self.query
+            return self.config.module_url + '?' + self.config.subtypes_url + '&queryString=' + self.query
         else:
-            return self.module_url + '?expandSearch=off&queryString=' + self.query
+            return self.config.module_url + '?expandSearch=off&queryString=' + self.query
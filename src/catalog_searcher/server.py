@@ -1,9 +1,6 @@
 import click
-from paste.translogger import TransLogger
-from waitress import serve
 
 from catalog_searcher import __version__
-from catalog_searcher.app import app
 
 
 @click.command()
@@ -15,10 +12,36 @@ from catalog_searcher.app import app
 )
 @click.option(
     '-t', '--threads',
-    help='Maximum number of threads to use. Defaults to 10.',
+    help='Maximum number of threads to use (waitress only). Defaults to 10.',
     default=10,
 )
+@click.option(
+    '-s', '--server',
+    type=click.Choice(['waitress', 'uvicorn']),
+    help=(
+        'Server to run the app with. "uvicorn" runs the ASGI version of the app, and '
+        'requires the "asgi" extra dependencies. Defaults to "waitress".'
+    ),
+    default='waitress',
+)
 @click.version_option(__version__, '-V', '--version')
-def run(listen, threads):
-    """Run the catalog searcher web app using the waitress WSGI server"""
-    serve(TransLogger(app, setup_console_handler=True), listen=listen, threads=threads)
+def run(listen, threads, server):
+    """Run the catalog searcher web app using the waitress WSGI server, or the
+    uvicorn ASGI server"""
+    if server == 'uvicorn':
+        import uvicorn
+
+        host, _, port = listen.rpartition(':')
+        uvicorn.run('catalog_searcher.asgi:app', host=host or '0.0.0.0', port=int(port))
+    else:
+        from waitress.server import create_server
+
+        from catalog_searcher.app import app, env
+        from catalog_searcher.logs import AccessLogMiddleware
+        from catalog_searcher.metrics import register_waitress_metrics
+
+        access_logged_app = AccessLogMiddleware(app, sample_rate=env.float('ACCESS_LOG_SAMPLE_RATE', 1.0))
+        server = create_server(access_logged_app, listen=listen, threads=threads)
+        register_waitress_metrics(server.task_dispatcher)
+        server.print_listen('Serving on http://{}:{}')
+        server.run()
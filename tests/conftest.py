@@ -4,12 +4,18 @@ from typing import Callable
 
 import httpretty
 import pytest
+from dotenv import load_dotenv
 from environs import Env
+from requests import ConnectionError
 
 from catalog_searcher.search.alma import AlmaSearch
 from catalog_searcher.search.cql import cql
 from catalog_searcher.search.primo import PrimoSearch
 
+# the app builds its backend configurations when it is imported, so the test
+# settings need to be in the environment before any test module imports it
+load_dotenv(Path(__file__).parent / 'data' / 'env')
+
 
 @pytest.fixture
 def env(shared_datadir) -> Env:
@@ -28,13 +34,13 @@ def raise_connection_error() -> Callable:
 
 @pytest.fixture
 def alma_search(env: Env) -> AlmaSearch:
-    return AlmaSearch(env=env, endpoint='books-and-more', query='maryland', page=0, per_page=3)
+    return AlmaSearch(AlmaSearch.configure(env), endpoint='books-and-more', query='maryland', page=0, per_page=3)
 
 
 @pytest.fixture
 def alma_search_url(alma_search: AlmaSearch) -> str:
-    return alma_search.sru_url_template.expand(
-        institutionCode=alma_search.institution_code,
+    return alma_search.config.sru_url_template.expand(
+        institutionCode=alma_search.config.institution_code,
         recordSchema='mods',
         query=cql('alma.all_for_ui', '=', alma_search.query) & ('alma.mms_tagSuppressed', '=', 'false'),
         maximumRecords=alma_search.per_page,
@@ -56,13 +62,13 @@ def alma_search_request_args(shared_datadir: Path, alma_search_url: str) -> dict
 
 @pytest.fixture
 def primo_article_search(env):
-    return PrimoSearch(env=env, endpoint='articles', query='maryland', page=0, per_page=3)
+    return PrimoSearch(PrimoSearch.configure(env), endpoint='articles', query='maryland', page=0, per_page=3)
 
 
 @pytest.fixture
 def primo_article_search_url(primo_article_search):
-    return primo_article_search.article_search_api_url_template.expand(
-        vid=primo_article_search.vid,
+    return primo_article_search.config.article_search_api_url_template.expand(
+        vid=primo_article_search.config.vid,
         q=primo_article_search.query,
         offset=(primo_article_search.page * primo_article_search.per_page),
         limit=primo_article_search.per_page,
@@ -83,13 +89,13 @@ def primo_article_search_request_args(shared_datadir: Path, primo_article_search
 
 @pytest.fixture
 def primo_book_search(env: Env) -> PrimoSearch:
-    return PrimoSearch(env=env, endpoint='books-and-more', query='black metal', page=5, per_page=3)
+    return PrimoSearch(PrimoSearch.configure(env), endpoint='books-and-more', query='black metal', page=5, per_page=3)
 
 
 @pytest.fixture
 def primo_book_search_url(primo_book_search: PrimoSearch) -> str:
-    return primo_book_search.book_search_api_url_template.expand(
-        vid=primo_book_search.vid,
+    return primo_book_search.config.book_search_api_url_template.expand(
+        vid=primo_book_search.config.vid,
         q=primo_book_search.query,
         offset=(primo_book_search.page * primo_book_search.per_page),
         limit=primo_book_search.per_page,
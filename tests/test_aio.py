@@ -0,0 +1,145 @@
+import asyncio
+from http import HTTPStatus
+from pathlib import Path
+from typing import Callable
+
+import httpx
+import pytest
+from environs import Env
+
+from catalog_searcher.search import SearchError
+from catalog_searcher.search.aio import (
+    AsyncAlmaSearch,
+    AsyncClientPool,
+    AsyncPrimoSearch,
+    AsyncWorldcatSearch,
+    async_client_pool,
+    get_async_search_class,
+)
+from catalog_searcher.search.oauth import clear_token_managers
+
+WORLDCAT_RESPONSE = Path(__file__).parent / 'test_worldcat' / 'response.json'
+
+
+@pytest.fixture(autouse=True)
+def clear_tokens():
+    clear_token_managers()
+
+
+@pytest.fixture
+def mock_upstream(monkeypatch: pytest.MonkeyPatch) -> Callable:
+    """Route the requests of the shared async client pool to a handler function."""
+    def _mock_upstream(handler: Callable[[httpx.Request], httpx.Response]):
+        monkeypatch.setattr(async_client_pool, 'transport', httpx.MockTransport(handler))
+        # discard any clients that were created with another transport
+        monkeypatch.setattr(async_client_pool, '_loop', None)
+
+    return _mock_upstream
+
+
+def primo_search(env: Env) -> AsyncPrimoSearch:
+    return AsyncPrimoSearch(AsyncPrimoSearch.configure(env), endpoint='articles', query='maryland', page=0, per_page=3)
+
+
+def test_async_primo_search(shared_datadir: Path, env: Env, mock_upstream: Callable):
+    requests = []
+    response_body = (shared_datadir / 'primo_article_search_response.json').read_bytes()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(HTTPStatus.OK, content=response_body)
+
+    mock_upstream(handler)
+    search = primo_search(env)
+    response = asyncio.run(search.search())
+
+    assert response.total == 377254
+    assert len(response.results) == 3
+    assert response.results[0].title == 'Maryland'
+    assert str(requests[0].url) == search.build_request().url
+    assert requests[0].headers['Authorization'].startswith('apikey ')
+
+
+def test_async_alma_search(shared_datadir: Path, env: Env, mock_upstream: Callable):
+    mock_upstream(lambda request: httpx.Response(
+        HTTPStatus.OK,
+        content=(shared_datadir / 'alma_response.xml').read_bytes(),
+        headers={'Content-Type': 'application/xml'},
+    ))
+    search = AsyncAlmaSearch(AsyncAlmaSearch.configure(env), endpoint='books-and-more', query='maryland', page=0,
+                             per_page=3)
+    response = asyncio.run(search.search())
+
+    assert response.total == 108
+    assert len(response.results) == 3
+
+
+def test_async_search_bad_request(env: Env, mock_upstream: Callable):
+    mock_upstream(lambda request: httpx.Response(HTTPStatus.BAD_REQUEST))
+    search = primo_search(env)
+
+    with pytest.raises(SearchError):
+        asyncio.run(search.search())
+
+
+def test_async_search_connection_error(env: Env, mock_upstream: Callable):
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError('connection refused', request=request)
+
+    mock_upstream(handler)
+    search = primo_search(env)
+
+    with pytest.raises(SearchError):
+        asyncio.run(search.search())
+
+
+def test_async_worldcat_search_retries_unauthorized(env: Env, mock_upstream: Callable):
+    tokens = iter(['REVOKED', 'NEW'])
+    search_tokens = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        search_tokens.append(request.headers['Authorization'])
+        if request.headers['Authorization'] == 'Bearer REVOKED':
+            return httpx.Response(HTTPStatus.UNAUTHORIZED)
+        return httpx.Response(HTTPStatus.OK, content=WORLDCAT_RESPONSE.read_bytes())
+
+    mock_upstream(handler)
+    search = AsyncWorldcatSearch(AsyncWorldcatSearch.configure(env), endpoint='books-and-more', query='maryland',
+                                 page=1, per_page=3)
+    # the token endpoint is called through the sync session pool, in a worker thread
+    search.config.token_manager._refresh = lambda deadline=None: next(tokens)
+    response = asyncio.run(search.search())
+
+    assert search_tokens == ['Bearer REVOKED', 'Bearer NEW']
+    assert response.total > 0
+
+
+def test_client_per_host():
+    pool = AsyncClientPool(pool_size=5)
+
+    async def get_clients():
+        return (
+            pool.client('https://a.example.com/search'),
+            pool.client('https://a.example.com/other'),
+            pool.client('https://b.example.com/search'),
+        )
+
+    client_a, client_a_again, client_b = asyncio.run(get_clients())
+    assert client_a is client_a_again
+    assert client_b is not client_a
+    assert pool.stats()['a.example.com'] == {'requests': 2, 'clients_created': 1, 'max_connections': 5}
+
+
+def test_clients_are_not_shared_between_event_loops():
+    pool = AsyncClientPool()
+
+    async def get_client():
+        return pool.client('https://a.example.com/')
+
+    assert asyncio.run(get_client()) is not asyncio.run(get_client())
+
+
+def test_get_async_search_class():
+    assert get_async_search_class('primo') is AsyncPrimoSearch
+    with pytest.raises(ValueError):
+        get_async_search_class('foo')
@@ -46,7 +46,8 @@ def test_alma_search_connection_error(
     monkeypatch: MonkeyPatch,
     raise_connection_error: Callable,
 ):
-    monkeypatch.setattr(requests, 'get', raise_connection_error)
+    monkeypatch.setattr(requests.Session, 'get', raise_connection_error)
 
-    with pytest.raises(SearchError):
+    with pytest.raises(SearchError) as exc_info:
         alma_search()
+    assert exc_info.value.cause == 'connection'
@@ -1,9 +1,16 @@
+import gzip
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
 from pathlib import Path
+from threading import Event
 
+import brotli
 import httpretty
 import pytest
+import requests
+from environs import EnvError
 from flask import Flask
 from flask.testing import FlaskClient
 from jsonschema import Draft202012Validator
@@ -11,8 +18,22 @@ from jsonschema.protocols import Validator
 
 import catalog_searcher.app
 from catalog_searcher.app import app as catalog_searcher_app
-from catalog_searcher.app import get_pagination_links, get_search_class
-from catalog_searcher.search import Search, SearchError
+from catalog_searcher.app import (
+    BlockWindow,
+    configure_backends,
+    get_block_window,
+    get_pagination_links,
+    get_search_class,
+)
+from catalog_searcher.capture import RawCapture
+from catalog_searcher.httpcache import http_cache_policy
+from catalog_searcher.metrics import Counter
+from catalog_searcher.search import Search, SearchError, SearchResponse, SearchResult
+from catalog_searcher.search.breaker import circuit_breakers
+from catalog_searcher.search.cache import search_cache
+from catalog_searcher.search.deadline import deadline_policy
+from catalog_searcher.search.oauth import clear_token_managers
+from catalog_searcher.search.prefetch import prefetcher
 from catalog_searcher.search.alma import AlmaSearch
 from catalog_searcher.search.primo import PrimoSearch
 from catalog_searcher.search.worldcat import WorldcatSearch
@@ -28,6 +49,12 @@ def client(app) -> FlaskClient:
     return app.test_client()
 
 
+@pytest.fixture(autouse=True)
+def clear_search_cache():
+    search_cache.clear()
+    circuit_breakers.reset()
+
+
 def test_get_root(client: FlaskClient):
     response = client.get('/')
     assert response.json == {'status': 'ok'}
@@ -48,9 +75,13 @@ def test_search_bad_page(client: FlaskClient):
     assert response.status_code == HTTPStatus.BAD_REQUEST
 
 
-def test_search_bad_per_page(client: FlaskClient):
-    response = client.get('/search?q=maryland&per_page=five')
+@pytest.mark.parametrize('per_page', ['five', '0', '-3'])
+def test_search_bad_per_page(monkeypatch, client: FlaskClient, per_page: str):
+    # with block fetching, a page of no results used to fail when it was sliced from its block
+    monkeypatch.setattr(catalog_searcher.app, 'search_block_size', 10)
+    response = client.get(f'/search?q=maryland&per_page={per_page}')
     assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json['error']['msg'] == 'per_page parameter value is invalid; must be a positive integer'
 
 
 def test_search_bad_backend(client: FlaskClient):
@@ -74,6 +105,250 @@ def test_search(client: FlaskClient, alma_search_request_args: dict[str, str]):
     assert 'prev_page' not in api_response
 
 
+@httpretty.activate
+def test_search_cached(client: FlaskClient, alma_search_request_args: dict[str, str]):
+    httpretty.register_uri(**alma_search_request_args)
+    first_response = client.get('/search?q=maryland&backend=alma')
+    second_response = client.get('/search?q=maryland&backend=alma')
+    assert len(httpretty.latest_requests()) == 1
+    assert second_response.json == first_response.json
+
+
+def test_search_normalized_query(monkeypatch, client: FlaskClient):
+    queries = []
+
+    class QuerySearch(Search):
+        def search(self):
+            queries.append(self.query)
+            return SearchResponse(results=[], total=0, module_link=f'http://example.com/?q={self.query}', raw={})
+
+    monkeypatch.setattr(catalog_searcher.app, 'get_search_class', lambda _: QuerySearch)
+    first_response = client.get('/search?q=%20black%20%20metal%20')
+    second_response = client.get('/search?q=black%20metal')
+    # the backend searches for the normalized query, so the cached module link is right for both
+    assert queries == ['black metal']
+    assert first_response.json['module_link'] == second_response.json['module_link']
+    assert second_response.json['query'] == 'black metal'
+
+
+def test_search_blank_query(client: FlaskClient):
+    response = client.get('/search?q=%20%20')
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json['error']['msg'] == 'q parameter is required'
+
+
+@httpretty.activate
+@pytest.mark.parametrize(
+    ('url', 'headers'),
+    [
+        ('/search?q=maryland&backend=alma&cache=false', {}),
+        ('/search?q=maryland&backend=alma', {'Cache-Control': 'no-cache'}),
+    ]
+)
+def test_search_cache_bypass(client: FlaskClient, alma_search_request_args: dict[str, str], url, headers):
+    httpretty.register_uri(**alma_search_request_args)
+    client.get('/search?q=maryland&backend=alma')
+    response = client.get(url, headers=headers)
+    assert response.status_code == HTTPStatus.OK
+    assert len(httpretty.latest_requests()) == 2
+
+
+def server_timing_names(response) -> list[str]:
+    return [metric.split(';')[0] for metric in response.headers['Server-Timing'].split(', ')]
+
+
+@httpretty.activate
+def test_search_server_timing(monkeypatch, client: FlaskClient, alma_search_request_args: dict[str, str]):
+    monkeypatch.setattr('catalog_searcher.app.debug', True)
+    httpretty.register_uri(**alma_search_request_args)
+    response = client.get('/search?q=maryland&backend=alma')
+    assert response.status_code == HTTPStatus.OK
+    assert server_timing_names(response) == ['search', 'upstream', 'parse', 'pagination', 'serialize', 'total']
+    # serialization and the total are still running when the body is built
+    assert set(response.json['raw']['timings']) == {'search', 'upstream', 'parse', 'pagination'}
+
+    # a cached response did not contact the backend
+    response = client.get('/search?q=maryland&backend=alma')
+    assert server_timing_names(response) == ['search', 'pagination', 'serialize', 'total']
+
+
+@pytest.fixture
+def raw_capture(monkeypatch, tmp_path: Path) -> RawCapture:
+    capture = RawCapture(max_inline_bytes=1000, directory=tmp_path)
+    monkeypatch.setattr(catalog_searcher.app, 'raw_capture', capture)
+    monkeypatch.setattr(catalog_searcher.app, 'debug', True)
+    return capture
+
+
+@httpretty.activate
+def test_search_raw_capture(client: FlaskClient, raw_capture: RawCapture, alma_search_request_args: dict[str, str]):
+    httpretty.register_uri(**alma_search_request_args)
+    response = client.get('/search?q=maryland&backend=alma')
+    raw = response.json['raw']
+    # without a capture, the debug response does not include the upstream response
+    assert 'xml_response' not in raw
+    assert 'capture_id' not in raw
+    assert 'timings' in raw
+
+    # a captured search is not served from the cache
+    response = client.get('/search?q=maryland&backend=alma&raw=true')
+    assert len(httpretty.latest_requests()) == 2
+    raw = response.json['raw']
+    assert raw['truncated'] == ['xml_response']
+    assert len(raw['xml_response'].encode()) == 1000
+    assert 'timings' in raw
+
+    response = client.get(f'/debug/raw/{raw["capture_id"]}')
+    assert response.status_code == HTTPStatus.OK
+    assert response.json['xml_response'] == alma_search_request_args['body']
+    assert client.get('/stats').json['raw_capture']['stored'] == 1
+
+
+@httpretty.activate
+def test_search_raw_capture_sampled(
+        client: FlaskClient, raw_capture: RawCapture, alma_search_request_args: dict[str, str],
+):
+    httpretty.register_uri(**alma_search_request_args)
+    raw_capture.sample_rate = 1.0
+    response = client.get('/search?q=maryland&backend=alma')
+    assert 'capture_id' in response.json['raw']
+
+
+@httpretty.activate
+def test_bento_raw_capture(client: FlaskClient, raw_capture: RawCapture, alma_search_request_args: dict[str, str]):
+    httpretty.register_uri(**alma_search_request_args)
+    response = client.get('/bento?q=maryland&backend=alma&endpoints=articles,books-and-more&raw=true')
+    capture_ids = {endpoint['raw']['capture_id'] for endpoint in response.json['endpoints'].values()}
+    assert len(capture_ids) == 2
+
+
+def test_raw_capture_not_found(client: FlaskClient, raw_capture: RawCapture):
+    response = client.get('/debug/raw/20250101T120000.000000-01234567')
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@httpretty.activate
+def test_raw_capture_only_in_debug(
+        monkeypatch, client: FlaskClient, raw_capture: RawCapture, alma_search_request_args: dict[str, str],
+):
+    httpretty.register_uri(**alma_search_request_args)
+    capture_id = client.get('/search?q=maryland&backend=alma&raw=true').json['raw']['capture_id']
+    monkeypatch.setattr(catalog_searcher.app, 'debug', False)
+    assert client.get(f'/debug/raw/{capture_id}').status_code == HTTPStatus.NOT_FOUND
+    assert 'raw' not in client.get('/search?q=maryland&backend=alma&raw=true').json
+
+
+def test_no_server_timing(client: FlaskClient):
+    assert 'Server-Timing' not in client.get('/ping').headers
+
+
+@httpretty.activate
+@pytest.mark.parametrize(
+    ('accept_encoding', 'expected_encoding'),
+    [
+        ('gzip, deflate, br', 'br'),
+        ('gzip', 'gzip'),
+        ('identity', None),
+        ('gzip;q=0', None),
+    ]
+)
+def test_search_compressed(
+        client: FlaskClient, primo_book_search_request_args: dict[str, str], accept_encoding, expected_encoding,
+):
+    httpretty.register_uri(**primo_book_search_request_args)
+    response = client.get('/search?q=maryland&backend=primo', headers={'Accept-Encoding': accept_encoding})
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers.get('Content-Encoding') == expected_encoding
+    assert 'Accept-Encoding' in response.vary
+    data = response.get_data()
+    if expected_encoding == 'gzip':
+        data = gzip.decompress(data)
+    elif expected_encoding == 'br':
+        data = brotli.decompress(data)
+    assert json.loads(data)['total'] == 387
+    assert ('compress' in server_timing_names(response)) == (expected_encoding is not None)
+
+
+@httpretty.activate
+def test_search_compressed_body_reused_from_cache(client: FlaskClient, primo_book_search_request_args: dict[str, str]):
+    httpretty.register_uri(**primo_book_search_request_args)
+    url = '/search?q=maryland&backend=primo'
+    first_response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    reused = client.get('/stats').json['compression']['reused']
+    second_response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert len(httpretty.latest_requests()) == 1
+    assert second_response.get_data() == first_response.get_data()
+    assert client.get('/stats').json['compression']['reused'] == reused + 1
+
+
+@httpretty.activate
+def test_search_compressed_body_reused_with_block_fetching(
+    monkeypatch,
+    client: FlaskClient,
+    primo_book_search_request_args: dict[str, str],
+):
+    httpretty.register_uri(**primo_book_search_request_args)
+    monkeypatch.setattr(catalog_searcher.app, 'search_block_size', 10)
+    url = '/search?q=maryland&backend=primo&per_page=2'
+    first_response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert first_response.headers['Content-Encoding'] == 'gzip'
+    reused = client.get('/stats').json['compression']['reused']
+    second_response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert len(httpretty.latest_requests()) == 1
+    assert second_response.get_data() == first_response.get_data()
+    assert client.get('/stats').json['compression']['reused'] == reused + 1
+
+
+@httpretty.activate
+def test_search_conditional(monkeypatch, client: FlaskClient, primo_book_search_request_args: dict[str, str]):
+    monkeypatch.setattr(http_cache_policy, 'max_age', 60)
+    monkeypatch.setattr(http_cache_policy, 'stale_while_revalidate', 30)
+    httpretty.register_uri(**primo_book_search_request_args)
+    url = '/search?q=maryland&backend=primo'
+    response = client.get(url)
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['Cache-Control'] == 'public, max-age=60, stale-while-revalidate=30'
+    etag = response.headers['ETag']
+    assert etag.startswith('W/')
+
+    # the compressed response has the same ETag, so it is also revalidated
+    response = client.get(url, headers={'If-None-Match': etag, 'Accept-Encoding': 'gzip'})
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.get_data() == b''
+    assert response.headers['ETag'] == etag
+    assert response.headers['Cache-Control'] == 'public, max-age=60, stale-while-revalidate=30'
+    assert 'Accept-Encoding' in response.vary
+    assert 'Content-Encoding' not in response.headers
+
+    # a different page has a different body
+    response = client.get(url + '&page=1', headers={'If-None-Match': etag})
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['ETag'] != etag
+
+
+def test_error_response_not_conditional(client: FlaskClient):
+    response = client.get('/search', headers={'If-None-Match': '*'})
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert 'ETag' not in response.headers
+
+
+def test_error_response_not_compressed(client: FlaskClient):
+    response = client.get('/search', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert 'Content-Encoding' not in response.headers
+
+
+@httpretty.activate
+def test_search_json_without_orjson(
+        monkeypatch, app: Flask, client: FlaskClient, primo_book_search_request_args: dict[str, str],
+):
+    httpretty.register_uri(**primo_book_search_request_args)
+    response = client.get('/search?q=maryland&backend=primo&cache=false')
+    monkeypatch.setattr(app.json, 'use_orjson', False)
+    stdlib_response = client.get('/search?q=maryland&backend=primo&cache=false')
+    assert response.get_data() == stdlib_response.get_data()
+
+
 @pytest.fixture
 def api_response_validator() -> Validator:
     schema_file = Path(__file__).parent.parent / 'docs/api-response-schema.json'
@@ -106,6 +381,24 @@ def test_primo_article_search_response_validates(
     assert api_response_validator.is_valid(response.json)
 
 
+def test_search_backend_not_enabled(monkeypatch, client):
+    monkeypatch.setattr(catalog_searcher.app, 'backend_configs', {})
+    response = client.get('/search?q=maryland&backend=alma')
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_configure_backends():
+    configs = configure_backends(['alma', 'primo'])
+    assert set(configs.keys()) == {'alma', 'primo'}
+    assert configs['alma'].vid == '01USMAI_UMCP:UMCP'
+
+
+def test_configure_backends_missing_setting(monkeypatch):
+    monkeypatch.delenv('ALMA_VID')
+    with pytest.raises(EnvError):
+        configure_backends(['alma'])
+
+
 def test_search_with_error(monkeypatch, client):
     class BadSearch(Search):
         def __init__(self, *_args, **_kwargs):
@@ -119,6 +412,415 @@ def test_search_with_error(monkeypatch, client):
     assert response.status_code == HTTPStatus.INTERNAL_SERVER_ERROR
 
 
+@httpretty.activate
+def test_worldcat_search_auth_error(client: FlaskClient):
+    clear_token_managers()
+    httpretty.register_uri(uri='https://oauth.oclc.org/token', method=httpretty.POST, status=HTTPStatus.UNAUTHORIZED)
+    response = client.get('/search?q=maryland&backend=worldcat')
+    assert response.status_code == HTTPStatus.INTERNAL_SERVER_ERROR
+    assert response.json['error']['msg'] == 'Auth token error'
+
+
+def test_search_connection_error(monkeypatch, client, raise_connection_error):
+    errors = Counter('errors_total', 'Errors', labels=('backend', 'cause'))
+    monkeypatch.setattr('catalog_searcher.metrics.search_errors', errors)
+    monkeypatch.setattr(requests.Session, 'get', raise_connection_error)
+    response = client.get('/search?q=maryland&backend=alma')
+    assert response.status_code == HTTPStatus.INTERNAL_SERVER_ERROR
+    assert response.json['error']['msg'] == 'Search error'
+    assert errors.totals() == {('alma', 'connection'): 1}
+
+
+@httpretty.activate
+def test_federated_search_connection_error(
+    monkeypatch,
+    client: FlaskClient,
+    primo_book_search_request_args: dict[str, str],
+):
+    httpretty.register_uri(**primo_book_search_request_args)
+    session_get = requests.Session.get
+
+    def get(session, url, **kwargs):
+        if 'alma' in url:
+            raise requests.ConnectionError
+        return session_get(session, url, **kwargs)
+
+    monkeypatch.setattr(requests.Session, 'get', get)
+    response = client.get('/search?q=maryland&backend=alma,primo')
+    assert response.status_code == HTTPStatus.OK
+    assert response.json['partial'] is True
+    assert response.json['backends']['alma'] == {'error': {'msg': 'Search error'}}
+    assert response.json['backends']['primo']['total'] > 0
+
+
+@httpretty.activate
+def test_worldcat_search(client: FlaskClient):
+    httpretty.register_uri(
+        uri='https://oauth.oclc.org/token',
+        method=httpretty.POST,
+        adding_headers={'Content-Type': 'application/json'},
+        body=json.dumps({'access_token': 'TOKEN'}),
+    )
+    httpretty.register_uri(
+        uri=catalog_searcher.app.backend_configs['worldcat'].search_url,
+        method=httpretty.GET,
+        adding_headers={'Content-Type': 'application/json'},
+        body=(Path(__file__).parent / 'test_worldcat' / 'response.json').read_text(),
+    )
+    response = client.get('/search?q=maryland&backend=worldcat')
+    assert response.status_code == HTTPStatus.OK
+    assert response.json['backend'] == 'worldcat'
+    assert response.json['total'] == 868034
+    assert len(response.json['results']) == 3
+
+
+def test_search_timeout(monkeypatch, client):
+    class SlowSearch(Search):
+        def search(self):
+            self.deadline.check(endpoint=self.endpoint)
+            time.sleep(0.1)
+            self.deadline.check(endpoint=self.endpoint)
+
+    monkeypatch.setattr(catalog_searcher.app, 'get_search_class', lambda _: SlowSearch)
+    response = client.get('/search?q=maryland&timeout=0.05')
+    assert response.status_code == HTTPStatus.GATEWAY_TIMEOUT
+    assert response.json['error']['msg'] == 'Search did not complete within 0.05 seconds'
+
+
+def test_joined_search_timeout_searches_again(monkeypatch, client):
+    started = Event()
+    deadlines = []
+
+    class SlowSearch(Search):
+        def search(self):
+            deadlines.append(self.deadline.seconds)
+            started.set()
+            time.sleep(0.1)
+            self.deadline.check(endpoint=self.endpoint)
+            return SearchResponse(results=[], total=0, module_link='', raw={})
+
+    monkeypatch.setattr(catalog_searcher.app, 'get_search_class', lambda _: SlowSearch)
+    monkeypatch.setattr(deadline_policy, 'default_timeout', 20.0)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        short = executor.submit(client.get, '/search?q=maryland&timeout=0.05')
+        started.wait()
+        # joins the search with the shorter deadline, which times out
+        response = client.get('/search?q=maryland')
+        assert short.result().status_code == HTTPStatus.GATEWAY_TIMEOUT
+    assert response.status_code == HTTPStatus.OK
+    assert deadlines == [0.05, 20.0]
+
+
+def test_search_deadline_per_backend(monkeypatch, client):
+    deadlines = []
+
+    class DeadlineSearch(StubSearch):
+        def search(self):
+            deadlines.append(self.deadline)
+            return super().search()
+
+    monkeypatch.setattr(catalog_searcher.app, 'get_search_class', lambda _: DeadlineSearch)
+    monkeypatch.setattr(deadline_policy, 'timeouts', {'alma': 5.0})
+    monkeypatch.setattr(deadline_policy, 'default_timeout', 20.0)
+    client.get('/search?q=maryland&backend=alma')
+    client.get('/search?q=maryland&backend=primo')
+    # a client can shorten the deadline, but not extend it
+    client.get('/search?q=maryland&backend=primo&timeout=2&cache=false')
+    client.get('/search?q=maryland&backend=worldcat&timeout=60')
+    assert [deadline.seconds for deadline in deadlines] == [5.0, 20.0, 2.0, 20.0]
+
+
+@pytest.mark.parametrize('timeout', ['0', '-1', 'soon'])
+def test_search_bad_timeout(client, timeout):
+    response = client.get(f'/search?q=maryland&timeout={timeout}')
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_search_circuit_open(monkeypatch, client):
+    calls = []
+
+    class FailingSearch(Search):
+        def search(self):
+            calls.append(1)
+            raise SearchError('Search error')
+
+    monkeypatch.setattr(catalog_searcher.app, 'get_search_class', lambda _: FailingSearch)
+    breaker = circuit_breakers.get('primo')
+    monkeypatch.setattr(breaker, 'minimum_calls', 2)
+    for _ in range(2):
+        assert client.get('/search?q=maryland').status_code == HTTPStatus.INTERNAL_SERVER_ERROR
+
+    response = client.get('/search?q=maryland')
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.json['error']['msg'] == 'Backend primo is unavailable'
+    assert len(calls) == 2
+    assert client.get('/stats').json['circuit_breakers']['primo']['state'] == 'open'
+
+
+def test_search_client_timeouts_do_not_open_circuit(monkeypatch, client):
+    class SlowSearch(Search):
+        def search(self):
+            time.sleep(0.02)
+            self.deadline.check(endpoint=self.endpoint)
+            return SearchResponse(results=[], total=0, module_link='', raw={})
+
+    monkeypatch.setattr(catalog_searcher.app, 'get_search_class', lambda _: SlowSearch)
+    monkeypatch.setattr(circuit_breakers.get('primo'), 'minimum_calls', 2)
+    for n in range(10):
+        response = client.get(f'/search?q=maryland{n}&backend=primo&timeout=0.001')
+        assert response.status_code == HTTPStatus.GATEWAY_TIMEOUT
+    assert client.get('/stats').json['circuit_breakers']['primo']['state'] == 'closed'
+    assert client.get('/search?q=maryland&backend=primo').status_code == HTTPStatus.OK
+
+
+def test_search_prefetches_next_page(monkeypatch, client):
+    pages = []
+
+    class PagedSearch(Search):
+        def search(self):
+            pages.append(self.page)
+            return SearchResponse(results=[SearchResult(title=f'page {self.page}')], total=5, module_link='', raw={})
+
+    monkeypatch.setattr(catalog_searcher.app, 'get_search_class', lambda _: PagedSearch)
+    monkeypatch.setattr(prefetcher, 'enabled', True)
+    client.get('/search?q=maryland&per_page=2&page=1')
+    prefetcher.shutdown()
+
+    response = client.get('/search?q=maryland&per_page=2&page=2')
+    assert response.json['results'][0]['title'] == 'page 2'
+    # page 2 came from the cache, and as the last page, did not lead to another prefetch
+    assert pages == [1, 2]
+    assert client.get('/stats').json['prefetch']['completed'] == 1
+
+
+class OffsetSearch(Search):
+    """Returns results whose titles are their offsets, out of 20 results."""
+    requests: list[tuple[int, int]] = []
+
+    def search(self):
+        self.requests.append((self.page, self.per_page))
+        first = self.page * self.per_page
+        return SearchResponse(
+            results=[SearchResult(title=str(n)) for n in range(first, min(first + self.per_page, 20))],
+            total=20,
+            module_link='',
+            raw={},
+        )
+
+
+@pytest.mark.parametrize(
+    ('block_sizes', 'page', 'per_page', 'expected'),
+    [
+        ({}, 0, 3, None),
+        ({'primo': 10}, 0, 3, BlockWindow(blocks=range(0, 1), size=10, start=0)),
+        ({'primo': 10}, 2, 3, BlockWindow(blocks=range(0, 1), size=10, start=6)),
+        ({'primo': 10}, 3, 3, BlockWindow(blocks=range(0, 2), size=10, start=9)),
+        ({'primo': 10}, 5, 4, BlockWindow(blocks=range(2, 3), size=10, start=0)),
+        ({'primo': 10}, 0, 10, None),
+        ({'alma': 10}, 0, 3, None),
+    ]
+)
+def test_get_block_window(monkeypatch, block_sizes, page, per_page, expected):
+    monkeypatch.setattr(catalog_searcher.app, 'search_block_sizes', block_sizes)
+    assert get_block_window('primo', page, per_page) == expected
+
+
+def test_search_block_fetching(monkeypatch, client):
+    monkeypatch.setattr(catalog_searcher.app, 'get_search_class', lambda _: OffsetSearch)
+    monkeypatch.setattr(catalog_searcher.app, 'search_block_size', 10)
+    monkeypatch.setattr(OffsetSearch, 'requests', [])
+
+    def titles(query_string):
+        return [result['title'] for result in client.get(f'/search?q=maryland&{query_string}').json['results']]
+
+    assert titles('page=0&per_page=3') == ['0', '1', '2']
+    assert titles('page=1&per_page=3') == ['3', '4', '5']
+    assert titles('page=1&per_page=5') == ['5', '6', '7', '8', '9']
+    assert OffsetSearch.requests == [(0, 10)]
+    # spans the first and second blocks
+    assert titles('page=3&per_page=3') == ['9', '10', '11']
+    assert OffsetSearch.requests == [(0, 10), (1, 10)]
+    # the last page stops at the total, without searching the block past it
+    assert titles('page=6&per_page=3') == ['18', '19']
+    # pages as large as a block are searched directly, which here is the cached second block
+    assert titles('page=1&per_page=10') == [str(n) for n in range(10, 20)]
+    assert OffsetSearch.requests == [(0, 10), (1, 10)]
+
+
+@httpretty.activate
+def test_metrics(client: FlaskClient, alma_search_request_args: dict[str, str]):
+    httpretty.register_uri(**alma_search_request_args)
+    client.get('/search?q=maryland&backend=alma')
+    client.get('/search?q=maryland&backend=alma')
+
+    response = client.get('/metrics')
+    assert response.status_code == HTTPStatus.OK
+    assert response.content_type == 'text/plain; version=0.0.4; charset=utf-8'
+    lines = response.text.splitlines()
+    # the metrics are process-wide, so other tests may have added to the counts
+    assert any(
+        line.startswith('catalog_searcher_http_requests_total{route="/search",backend="alma",endpoint="books-and-more"')
+        for line in lines
+    )
+    for prefix in (
+        'catalog_searcher_upstream_duration_seconds_count{backend="alma"',
+        'catalog_searcher_parse_duration_seconds_count{backend="alma"',
+        'catalog_searcher_search_cache_lookups_total{backend="alma",result="miss"}',
+        'catalog_searcher_search_cache_lookups_total{backend="alma",result="hit"}',
+        'catalog_searcher_search_cache_hit_ratio ',
+    ):
+        assert any(line.startswith(prefix) for line in lines), prefix
+    assert 'catalog_searcher_http_requests_in_flight{route="/metrics"} 1' in lines
+
+
+class StubSearch(Search):
+    """Returns a single result whose title is the endpoint; fails for the "journals" endpoint."""
+    def search(self):
+        if self.endpoint == 'journals':
+            raise SearchError('Search error', endpoint=self.endpoint)
+        return SearchResponse(
+            results=[SearchResult(title=self.endpoint)],
+            total=1,
+            module_link=f'http://example.com/{self.endpoint}',
+            raw={},
+        )
+
+
+def test_bento(monkeypatch, client):
+    monkeypatch.setattr(catalog_searcher.app, 'get_search_class', lambda _: StubSearch)
+    response = client.get('/bento?q=maryland')
+    assert response.status_code == HTTPStatus.OK
+    endpoints = response.json['endpoints']
+    assert set(endpoints.keys()) == {'books-and-more', 'articles', 'journals', 'general'}
+    assert endpoints['books-and-more']['results'][0]['title'] == 'books'
+    assert endpoints['articles']['total'] == 1
+    assert endpoints['articles']['module_link'] == 'http://example.com/articles'
+    assert endpoints['journals']['error'] == {'msg': 'Search error'}
+    assert server_timing_names(response)[-2:] == ['serialize', 'total']
+
+
+def test_bento_unexpected_error(monkeypatch, client):
+    class BrokenSearch(StubSearch):
+        def search(self):
+            if self.endpoint == 'articles':
+                raise RuntimeError('unexpected')
+            return super().search()
+
+    monkeypatch.setattr(catalog_searcher.app, 'get_search_class', lambda _: BrokenSearch)
+    response = client.get('/bento?q=maryland&endpoints=books-and-more,articles')
+    assert response.status_code == HTTPStatus.OK
+    assert response.json['endpoints']['articles'] == {'error': {'msg': 'Search error'}}
+    assert response.json['endpoints']['books-and-more']['total'] == 1
+
+
+def test_bento_selected_endpoints(monkeypatch, client):
+    monkeypatch.setattr(catalog_searcher.app, 'get_search_class', lambda _: StubSearch)
+    response = client.get('/bento?q=maryland&endpoints=articles,general')
+    assert set(response.json['endpoints'].keys()) == {'articles', 'general'}
+
+
+@pytest.mark.parametrize(
+    ('query_string',),
+    [
+        ('',),
+        ('q=maryland&endpoints=articles,foo',),
+        ('q=maryland&per_page=five',),
+        ('q=maryland&per_page=0',),
+        ('q=maryland&backend=foo',),
+        ('q=maryland&timeout=none',),
+    ]
+)
+def test_bento_bad_request(client, query_string):
+    response = client.get(f'/bento?{query_string}')
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+def make_federated_search_class(backend: str, delay: float = 0, fail: bool = False) -> type[Search]:
+    class FederatedStubSearch(Search):
+        def search(self):
+            time.sleep(delay)
+            if fail:
+                raise SearchError('Search error', endpoint=self.endpoint)
+            return SearchResponse(
+                results=[
+                    SearchResult(title=f'{backend} 1', identifiers={'oclc': '123'}),
+                    SearchResult(title=f'{backend} 2', identifiers={'oclc': f'{backend}-2'}),
+                ],
+                total=10 if backend == 'primo' else 20,
+                module_link=f'http://{backend}.example.com/',
+                raw={},
+            )
+    return FederatedStubSearch
+
+
+def test_federated_search(monkeypatch, client):
+    search_classes = {name: make_federated_search_class(name) for name in ('primo', 'worldcat')}
+    monkeypatch.setattr(catalog_searcher.app, 'get_search_class', lambda name: search_classes[name])
+    response = client.get('/search?q=maryland&backend=primo,worldcat')
+    assert response.status_code == HTTPStatus.OK
+    assert [r['title'] for r in response.json['results']] == ['primo 1', 'primo 2', 'worldcat 2']
+    # the identifiers are only used to find the duplicates
+    assert all('identifiers' not in r for r in response.json['results'])
+    assert response.json['total'] == 20
+    assert response.json['backend'] == 'primo,worldcat'
+    assert response.json['partial'] is False
+    assert response.json['backends']['worldcat'] == {'total': 20, 'module_link': 'http://worldcat.example.com/'}
+
+
+def test_federated_search_per_page(monkeypatch, client):
+    search_classes = {name: make_federated_search_class(name) for name in ('primo', 'worldcat')}
+    monkeypatch.setattr(catalog_searcher.app, 'get_search_class', lambda name: search_classes[name])
+    response = client.get('/search?q=maryland&backend=primo,worldcat&per_page=2')
+    assert response.status_code == HTTPStatus.OK
+    assert [r['title'] for r in response.json['results']] == ['primo 1', 'primo 2']
+    assert response.json['per_page'] == 2
+
+
+def test_federated_search_partial(monkeypatch, client):
+    search_classes = {
+        'alma': make_federated_search_class('alma', fail=True),
+        'primo': make_federated_search_class('primo'),
+        'worldcat': make_federated_search_class('worldcat', delay=1),
+    }
+    monkeypatch.setattr(catalog_searcher.app, 'get_search_class', lambda name: search_classes[name])
+    monkeypatch.setattr(catalog_searcher.app, 'federated_deadline', 0.2)
+    # use a query of its own, since the slow search keeps running (and populates the cache) after the test
+    response = client.get('/search?q=slow&backend=alma,primo,worldcat')
+    assert response.status_code == HTTPStatus.OK
+    assert [r['title'] for r in response.json['results']] == ['primo 1', 'primo 2']
+    assert response.json['partial'] is True
+    assert 'error' in response.json['backends']['alma']
+    assert 'error' in response.json['backends']['worldcat']
+
+
+def test_federated_search_unexpected_error(monkeypatch, client):
+    class BrokenSearch(Search):
+        def search(self):
+            raise RuntimeError('unexpected')
+
+    search_classes = {'primo': make_federated_search_class('primo'), 'worldcat': BrokenSearch}
+    monkeypatch.setattr(catalog_searcher.app, 'get_search_class', lambda name: search_classes[name])
+    response = client.get('/search?q=maryland&backend=primo,worldcat')
+    assert response.status_code == HTTPStatus.OK
+    assert response.json['partial'] is True
+    assert response.json['backends']['worldcat'] == {'error': {'msg': 'Search error'}}
+
+
+def test_federated_search_all_failed(monkeypatch, client):
+    monkeypatch.setattr(
+        catalog_searcher.app,
+        'get_search_class',
+        lambda name: make_federated_search_class(name, fail=True),
+    )
+    response = client.get('/search?q=maryland&backend=primo,worldcat')
+    assert response.status_code == HTTPStatus.INTERNAL_SERVER_ERROR
+
+
+def test_federated_search_bad_backend(client):
+    response = client.get('/search?q=maryland&backend=primo,foo')
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
 @pytest.mark.parametrize(
     ('backend', 'expected_class'),
     [
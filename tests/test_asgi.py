@@ -0,0 +1,156 @@
+import asyncio
+import json
+from http import HTTPStatus
+from pathlib import Path
+
+import httpx
+import pytest
+
+import catalog_searcher.app
+import catalog_searcher.asgi
+from catalog_searcher.asgi import app as asgi_app
+from catalog_searcher.capture import RawCapture
+from catalog_searcher.search import SearchResponse
+from catalog_searcher.search.aio import AsyncSearch, async_client_pool
+from catalog_searcher.search.breaker import circuit_breakers
+from catalog_searcher.search.cache import search_cache
+from catalog_searcher.search.deadline import deadline_policy
+
+
+@pytest.fixture(autouse=True)
+def clear_search_cache():
+    search_cache.clear()
+    circuit_breakers.reset()
+
+
+@pytest.fixture
+def primo_upstream(shared_datadir: Path, monkeypatch: pytest.MonkeyPatch) -> list[httpx.Request]:
+    requests = []
+    response_body = (shared_datadir / 'primo_article_search_response.json').read_bytes()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(HTTPStatus.OK, content=response_body)
+
+    monkeypatch.setattr(async_client_pool, 'transport', httpx.MockTransport(handler))
+    monkeypatch.setattr(async_client_pool, '_loop', None)
+    return requests
+
+
+def get(*urls: str, headers: dict[str, str] | None = None) -> list[httpx.Response]:
+    async def _get():
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://testserver') as client:
+            return await asyncio.gather(*(client.get(url, headers=headers) for url in urls))
+
+    return asyncio.run(_get())
+
+
+def test_ping():
+    response, = get('/ping')
+    assert response.json() == {'status': 'ok'}
+
+
+def test_search(primo_upstream: list[httpx.Request]):
+    response, = get('/search?q=maryland&endpoint=articles&backend=primo')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['Content-Type'] == 'application/json'
+    # httpx accepts compressed responses, and decodes them
+    assert response.headers['Content-Encoding'] in ('br', 'gzip')
+    body = response.json()
+    assert body['total'] == 377254
+    assert len(body['results']) == 3
+    assert body['results'][0]['title'] == 'Maryland'
+    assert body['next_page'] == 'http://testserver/search?q=maryland&endpoint=articles&backend=primo&page=1'
+    server_timing = [metric.split(';')[0] for metric in response.headers['Server-Timing'].split(', ')]
+    assert server_timing == ['search', 'upstream', 'parse', 'pagination', 'serialize', 'compress', 'total']
+
+
+def test_search_not_modified(primo_upstream: list[httpx.Request]):
+    response, = get('/search?q=maryland&endpoint=articles&backend=primo')
+    etag = response.headers['ETag']
+    response, = get('/search?q=maryland&endpoint=articles&backend=primo', headers={'If-None-Match': etag})
+
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.content == b''
+    assert response.headers['ETag'] == etag
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+
+def test_search_raw_capture(primo_upstream: list[httpx.Request], monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    monkeypatch.setattr(catalog_searcher.app, 'debug', True)
+    monkeypatch.setattr(catalog_searcher.app, 'raw_capture', RawCapture(directory=tmp_path))
+    response, = get('/search?q=maryland&endpoint=articles&backend=primo&raw=true')
+
+    raw = response.json()['raw']
+    assert raw['truncated'] == ['data']
+    stored = json.loads((tmp_path / f'{raw["capture_id"]}.json').read_text())
+    assert stored['data']['info']['total'] == 377254
+
+
+def test_concurrent_searches_share_upstream_request(primo_upstream: list[httpx.Request]):
+    responses = get(*['/search?q=maryland&endpoint=articles&backend=primo'] * 3)
+
+    assert all(response.status_code == HTTPStatus.OK for response in responses)
+    assert len(primo_upstream) == 1
+
+
+def test_joined_search_timeout_searches_again(monkeypatch: pytest.MonkeyPatch):
+    deadlines = []
+
+    class SlowSearch(AsyncSearch):
+        async def search(self) -> SearchResponse:  # type: ignore[override]
+            deadlines.append(self.deadline.seconds)
+            started.set()
+            await asyncio.sleep(0.1)
+            self.deadline.check(endpoint=self.endpoint)
+            return SearchResponse(results=[], total=0, module_link='', raw={})
+
+    async def _get():
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://testserver') as client:
+            short = asyncio.create_task(client.get('/search?q=maryland&timeout=0.05'))
+            await started.wait()
+            # joins the search with the shorter deadline, which times out
+            return await asyncio.gather(short, client.get('/search?q=maryland'))
+
+    monkeypatch.setattr(catalog_searcher.asgi, 'get_async_search_class', lambda _: SlowSearch)
+    monkeypatch.setattr(deadline_policy, 'default_timeout', 20.0)
+    started = asyncio.Event()
+    short, response = asyncio.run(_get())
+    assert short.status_code == HTTPStatus.GATEWAY_TIMEOUT
+    assert response.status_code == HTTPStatus.OK
+    assert deadlines == [0.05, 20.0]
+
+
+def test_search_block_fetching(primo_upstream: list[httpx.Request], monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(catalog_searcher.app, 'search_block_size', 30)
+    first_page, second_page = get(
+        '/search?q=maryland&endpoint=articles&backend=primo&page=0',
+        '/search?q=maryland&endpoint=articles&backend=primo&page=1',
+    )
+
+    assert [r['title'] for r in first_page.json()['results']] == ['Maryland'] * 3
+    # the upstream fixture only has 3 results
+    assert second_page.json()['results'] == []
+    assert len(primo_upstream) == 1
+    assert primo_upstream[0].url.params['limit'] == '30'
+
+
+def test_search_no_query():
+    response, = get('/search')
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json()['error']['msg'] == 'q parameter is required'
+
+
+def test_search_bad_request(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(async_client_pool, 'transport', httpx.MockTransport(lambda request: httpx.Response(400)))
+    monkeypatch.setattr(async_client_pool, '_loop', None)
+    response, = get('/search?q=maryland&backend=primo')
+    assert response.status_code == HTTPStatus.INTERNAL_SERVER_ERROR
+
+
+def test_stats():
+    response, = get('/stats')
+    assert {'async_http_pools', 'async_search_coalescing', 'search_cache'} <= response.json().keys()
@@ -0,0 +1,163 @@
+import asyncio
+import time
+
+import pytest
+from environs import Env
+
+from catalog_searcher.search import SearchError, SearchTimeout
+from catalog_searcher.search.breaker import CircuitBreaker, CircuitBreakers, CircuitOpen, State, is_failure
+
+
+def fail():
+    raise SearchError('Search error')
+
+
+def succeed():
+    return 'result'
+
+
+@pytest.fixture
+def breaker() -> CircuitBreaker:
+    return CircuitBreaker('primo', failure_rate=0.5, minimum_calls=4, window_size=10, cooldown=0.05)
+
+
+def call(breaker: CircuitBreaker, fn):
+    try:
+        return breaker.call(fn)
+    except SearchError as e:
+        return e
+
+
+def test_stays_closed_below_minimum_calls(breaker: CircuitBreaker):
+    for _ in range(3):
+        call(breaker, fail)
+    assert breaker.state == State.CLOSED
+
+
+def test_opens_at_failure_rate(breaker: CircuitBreaker):
+    for fn in (succeed, fail, succeed, fail):
+        call(breaker, fn)
+    assert breaker.state == State.OPEN
+    assert breaker.stats()['times_opened'] == 1
+
+
+def test_client_errors_do_not_open(breaker: CircuitBreaker):
+    def bad_request():
+        raise SearchError('Received 400', cause='upstream_status', status=400)
+
+    for _ in range(10):
+        call(breaker, bad_request)
+    assert breaker.state == State.CLOSED
+    assert breaker.stats()['failure_rate'] == 0
+
+
+def test_client_limited_timeouts_do_not_open(breaker: CircuitBreaker):
+    def timeout():
+        raise SearchTimeout('Search did not complete within 0.001 seconds')
+
+    for _ in range(4):
+        with pytest.raises(SearchTimeout):
+            breaker.call(timeout, client_limited=True)
+    assert breaker.state == State.CLOSED
+
+    for _ in range(4):
+        with pytest.raises(SearchTimeout):
+            breaker.call(timeout)
+    assert breaker.state == State.OPEN
+
+
+@pytest.mark.parametrize(
+    ('error', 'expected'),
+    [
+        (SearchError('Search error', cause='connection'), True),
+        (SearchTimeout('Search timed out'), True),
+        (SearchError('Received 503', cause='upstream_status', status=503), True),
+        (SearchError('Received 429', cause='upstream_status', status=429), True),
+        (SearchError('Received 400', cause='upstream_status', status=400), False),
+        (SearchError('Received 404', cause='upstream_status', status=404), False),
+        (KeyError('docs'), True),
+    ]
+)
+def test_is_failure(error: Exception, expected: bool):
+    assert is_failure(error) is expected
+
+
+def test_is_failure_client_limited():
+    assert is_failure(SearchTimeout('Search timed out'), client_limited=True) is False
+    assert is_failure(SearchError('Search error', cause='connection'), client_limited=True) is True
+
+
+def test_open_circuit_fails_fast(breaker: CircuitBreaker):
+    for _ in range(4):
+        call(breaker, fail)
+
+    calls = []
+    with pytest.raises(CircuitOpen):
+        breaker.call(lambda: calls.append(1))
+    assert calls == []
+    assert breaker.stats()['rejected'] == 1
+
+
+def test_opens_at_slow_call_rate():
+    breaker = CircuitBreaker('alma', slow_call_rate=0.5, slow_call_duration=0.01, minimum_calls=2)
+    for _ in range(2):
+        breaker.call(lambda: time.sleep(0.02))
+    assert breaker.state == State.OPEN
+
+
+def test_half_open_trial_success_closes(breaker: CircuitBreaker):
+    for _ in range(4):
+        call(breaker, fail)
+    time.sleep(0.06)
+    assert breaker.state == State.HALF_OPEN
+    assert breaker.call(succeed) == 'result'
+    assert breaker.state == State.CLOSED
+
+
+def test_half_open_trial_failure_reopens(breaker: CircuitBreaker):
+    for _ in range(4):
+        call(breaker, fail)
+    time.sleep(0.06)
+    call(breaker, fail)
+    assert breaker.state == State.OPEN
+    assert breaker.stats()['times_opened'] == 2
+
+
+def test_half_open_limits_trial_calls(breaker: CircuitBreaker):
+    for _ in range(4):
+        call(breaker, fail)
+    time.sleep(0.06)
+    breaker.allow()
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+
+def test_call_async(breaker: CircuitBreaker):
+    async def async_fail():
+        fail()
+
+    for _ in range(4):
+        with pytest.raises(SearchError):
+            asyncio.run(breaker.call_async(async_fail))
+    with pytest.raises(CircuitOpen):
+        asyncio.run(breaker.call_async(async_fail))
+
+
+def test_registry(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('CIRCUIT_BREAKER_MINIMUM_CALLS', '2')
+    monkeypatch.setenv('CIRCUIT_BREAKER_COOLDOWN', '60')
+    breakers = CircuitBreakers()
+    breakers.configure(Env())
+    breaker = breakers.get('primo')
+    assert breakers.get('primo') is breaker
+    assert breaker.minimum_calls == 2
+    assert breaker.cooldown == 60
+
+    for _ in range(2):
+        call(breaker, fail)
+    stats = breakers.stats()['primo']
+    assert stats['state'] == 'open'
+    assert 0 < stats['retry_in'] <= 60
+
+    breakers.reset()
+    assert breaker.state == State.CLOSED
@@ -0,0 +1,125 @@
+import pytest
+
+from catalog_searcher.search import SearchResponse, SearchResult
+from catalog_searcher.search.cache import SearchCache, approximate_size, cache_key, normalize_query
+
+
+def make_response(title: str = 'foo') -> SearchResponse:
+    return SearchResponse(results=[SearchResult(title=title)], total=1, module_link='', raw={})
+
+
+@pytest.fixture
+def cache() -> SearchCache:
+    return SearchCache(max_entries=2, default_ttl=60, ttls={'worldcat': 0})
+
+
+@pytest.mark.parametrize(
+    ('query', 'expected_query'),
+    [
+        ('maryland', 'maryland'),
+        ('  black   metal ', 'black metal'),
+        ('Café', 'Café'),
+    ]
+)
+def test_normalize_query(query, expected_query):
+    assert normalize_query(query) == expected_query
+
+
+def test_cache_key_normalizes_query():
+    assert cache_key('primo', 'articles', ' black  metal', 0, 3) == cache_key('primo', 'articles', 'black metal', 0, 3)
+
+
+def test_get_put(cache: SearchCache):
+    key = cache_key('primo', 'articles', 'maryland', 0, 3)
+    assert cache.get(key) is None
+    response = make_response()
+    cache.put(key, response)
+    assert cache.get(key) is response
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['entries'] == 1
+
+
+def test_zero_ttl_not_cached(cache: SearchCache):
+    key = cache_key('worldcat', 'articles', 'maryland', 0, 3)
+    cache.put(key, make_response())
+    assert cache.get(key) is None
+
+
+def test_expiration(cache: SearchCache):
+    cache.default_ttl = 0.000001
+    key = cache_key('primo', 'articles', 'maryland', 0, 3)
+    cache.put(key, make_response())
+    assert cache.get(key) is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_lru_eviction_by_entries(cache: SearchCache):
+    keys = [cache_key('primo', 'articles', 'maryland', page, 3) for page in range(3)]
+    cache.put(keys[0], make_response())
+    cache.put(keys[1], make_response())
+    # make keys[0] the most recently used entry
+    cache.get(keys[0])
+    cache.put(keys[2], make_response())
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[2]) is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_eviction_by_bytes():
+    response = make_response()
+    cache = SearchCache(max_entries=10, max_bytes=approximate_size(response) * 2, default_ttl=60)
+    keys = [cache_key('primo', 'articles', 'maryland', page, 3) for page in range(3)]
+    for key in keys:
+        cache.put(key, make_response())
+    assert cache.get(keys[0]) is None
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['bytes'] <= cache.max_bytes
+
+
+def test_attachments(cache: SearchCache):
+    key = cache_key('primo', 'articles', 'maryland', 0, 3)
+    cache.attach(key, 'gzip', b'no entry')
+    assert cache.get_attachment(key, 'gzip') is None
+
+    cache.put(key, make_response())
+    size = cache.stats()['bytes']
+    cache.attach(key, 'gzip', b'compressed')
+    assert cache.get_attachment(key, 'gzip') == b'compressed'
+    assert cache.get_attachment(key, 'br') is None
+    assert cache.stats()['bytes'] == size + approximate_size(b'compressed')
+    # attachment lookups are not counted as cache lookups
+    assert cache.stats()['hits'] == 0
+    assert cache.stats()['misses'] == 0
+
+    # replacing the response drops its attachments
+    cache.put(key, make_response())
+    assert cache.get_attachment(key, 'gzip') is None
+    assert cache.stats()['bytes'] == size
+
+
+def test_attachments_bounded():
+    cache = SearchCache(default_ttl=60, max_attachments=2)
+    key = cache_key('primo', 'articles', 'maryland', 0, 3)
+    cache.put(key, make_response())
+    size = cache.stats()['bytes']
+    for name in ('a', 'b', 'c'):
+        cache.attach(key, name, name.encode())
+    assert cache.get_attachment(key, 'a') is None
+    assert cache.get_attachment(key, 'b') == b'b'
+    assert cache.get_attachment(key, 'c') == b'c'
+    assert cache.stats()['bytes'] == size + approximate_size(b'b') + approximate_size(b'c')
+
+
+def test_attachments_count_toward_max_bytes():
+    response = make_response()
+    cache = SearchCache(max_entries=10, max_bytes=approximate_size(response) * 2, default_ttl=60)
+    keys = [cache_key('primo', 'articles', 'maryland', page, 3) for page in range(2)]
+    for key in keys:
+        cache.put(key, make_response())
+    cache.attach(keys[1], 'gzip', b'x' * 100)
+    assert cache.get(keys[0]) is None
+    assert cache.get_attachment(keys[1], 'gzip') is not None
+    assert cache.stats()['bytes'] <= cache.max_bytes
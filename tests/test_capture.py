@@ -0,0 +1,96 @@
+import json
+from pathlib import Path
+
+import pytest
+from environs import Env
+
+from catalog_searcher.capture import RawCapture, truncate
+
+
+@pytest.fixture
+def raw_capture(tmp_path: Path) -> RawCapture:
+    return RawCapture(max_inline_bytes=20, directory=tmp_path / 'raw', max_files=2)
+
+
+@pytest.mark.parametrize(
+    ('value', 'expected'),
+    [
+        ('short', ('short', False)),
+        ('a' * 30, ('a' * 20, True)),
+        ({'a': 1}, ({'a': 1}, False)),
+        ({'docs': ['x' * 30]}, ('{"docs": ["xxxxxxxxx', True)),
+        # a multibyte character that would be cut in half is dropped
+        ('a' * 19 + 'é', ('a' * 19, True)),
+    ]
+)
+def test_truncate(value, expected):
+    assert truncate(value, 20) == expected
+
+
+@pytest.mark.parametrize(
+    ('args', 'sample_rate', 'expected'),
+    [
+        ({}, 0.0, False),
+        ({'raw': 'true'}, 0.0, True),
+        ({'raw': 'false'}, 0.0, False),
+        ({}, 1.0, True),
+    ]
+)
+def test_requested(raw_capture: RawCapture, args, sample_rate, expected):
+    raw_capture.sample_rate = sample_rate
+    assert raw_capture.requested(args) == expected
+
+
+def test_capture(raw_capture: RawCapture):
+    raw = {'request_url': 'http://example.com', 'xml_response': '<xml>' + 'x' * 100 + '</xml>'}
+    inline = raw_capture.capture(raw)
+    assert inline['request_url'] == 'http://example.com'
+    assert inline['xml_response'] == raw['xml_response'][:20]
+    assert inline['truncated'] == ['xml_response']
+    assert json.loads(raw_capture.load(inline['capture_id'])) == raw
+    stats = raw_capture.stats()
+    assert stats['captured'] == 1
+    assert stats['truncated'] == 1
+    assert stats['stored'] == 1
+
+
+@pytest.mark.parametrize('title', ['Café ☃', 'lone surrogate \ud800'])
+def test_capture_stored_as_utf8(raw_capture: RawCapture, title: str):
+    capture_id = raw_capture.store({'title': title})
+    data = raw_capture.load(capture_id)
+    assert json.loads(data.decode('utf-8')) == {'title': title}
+
+
+def test_capture_rotation(raw_capture: RawCapture):
+    capture_ids = [raw_capture.capture({'n': n})['capture_id'] for n in range(3)]
+    assert len(list(raw_capture.directory.iterdir())) == 2
+    assert raw_capture.load(capture_ids[0]) is None
+    assert json.loads(raw_capture.load(capture_ids[2])) == {'n': 2}
+
+
+def test_capture_not_stored(raw_capture: RawCapture):
+    raw_capture.max_files = 0
+    inline = raw_capture.capture({'n': 1})
+    assert inline == {'n': 1}
+    assert not raw_capture.directory.exists()
+
+
+def test_capture_store_error(raw_capture: RawCapture, tmp_path: Path):
+    raw_capture.directory = tmp_path / 'file'
+    raw_capture.directory.write_text('not a directory')
+    assert raw_capture.capture({'n': 1}) == {'n': 1}
+    assert raw_capture.stats()['store_errors'] == 1
+
+
+@pytest.mark.parametrize('capture_id', ['../secret', '20250101T120000.000000-01234567.json', ''])
+def test_load_invalid_id(raw_capture: RawCapture, capture_id: str):
+    assert raw_capture.load(capture_id) is None
+
+
+def test_configure(monkeypatch, raw_capture: RawCapture, tmp_path: Path):
+    monkeypatch.setenv('RAW_CAPTURE_SAMPLE_RATE', '0.05')
+    monkeypatch.setenv('RAW_CAPTURE_DIR', str(tmp_path))
+    raw_capture.configure(Env())
+    assert raw_capture.sample_rate == 0.05
+    assert raw_capture.directory == tmp_path
+    assert raw_capture.max_files == 2
@@ -0,0 +1,128 @@
+import gzip
+
+import brotli
+import pytest
+from environs import Env
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+from werkzeug.wrappers import Response
+
+from catalog_searcher.compression import Compressor
+from catalog_searcher.search import SearchResponse
+from catalog_searcher.search.cache import cache_key, search_cache
+
+BODY = b'{"results":[' + b','.join(b'{"title":"Maryland"}' for _ in range(100)) + b']}'
+
+
+@pytest.fixture
+def compressor() -> Compressor:
+    return Compressor(min_size=100)
+
+
+def accept(value: str):
+    return parse_accept_header(value)
+
+
+@pytest.mark.parametrize(
+    ('header', 'expected_encoding'),
+    [
+        ('gzip, deflate, br', 'br'),
+        ('gzip', 'gzip'),
+        ('br;q=0.5, gzip', 'gzip'),
+        ('*', 'br'),
+        ('identity', None),
+        ('gzip;q=0, br;q=0', None),
+        ('', None),
+    ]
+)
+def test_negotiate(compressor: Compressor, header: str, expected_encoding: str | None):
+    assert compressor.negotiate(accept(header)) == expected_encoding
+
+
+def test_negotiate_without_brotli(monkeypatch, compressor: Compressor):
+    monkeypatch.setattr('catalog_searcher.compression.brotli', None)
+    assert compressor.available() == ['gzip']
+    assert compressor.negotiate(accept('br')) is None
+    assert compressor.negotiate(accept('gzip, br')) == 'gzip'
+
+
+def test_compress_response(compressor: Compressor):
+    response = Response(BODY, mimetype='application/json')
+    assert compressor.compress_response(response, accept('gzip'))
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Content-Length'] == str(len(response.get_data()))
+    assert 'Accept-Encoding' in response.vary
+    assert gzip.decompress(response.get_data()) == BODY
+
+    response = Response(BODY, mimetype='application/json')
+    assert compressor.compress_response(response, accept('br'))
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.get_data()) == BODY
+
+
+def test_compress_response_below_min_size(compressor: Compressor):
+    response = Response(b'{}', mimetype='application/json')
+    assert not compressor.compress_response(response, accept('gzip'))
+    assert 'Content-Encoding' not in response.headers
+    # the response still depends on the request's Accept-Encoding header
+    assert 'Accept-Encoding' in response.vary
+    assert response.get_data() == b'{}'
+
+
+@pytest.mark.parametrize(
+    'response',
+    [
+        Response(BODY, status=400),
+        Response(BODY, headers=Headers({'Content-Encoding': 'gzip'})),
+    ]
+)
+def test_compress_response_skipped(compressor: Compressor, response: Response):
+    assert not compressor.compress_response(response, accept('gzip'))
+    assert response.get_data() == BODY
+
+
+def test_compress_response_disabled(compressor: Compressor):
+    compressor.encodings = []
+    response = Response(BODY)
+    assert not compressor.compress_response(response, accept('gzip'))
+    assert 'Accept-Encoding' not in response.vary
+
+
+def test_compressed_body_attached_to_cache_entry(monkeypatch, compressor: Compressor):
+    key = cache_key('primo', 'articles', 'maryland', 0, 3)
+    search_cache.put(key, SearchResponse(results=[], total=0, module_link='', raw={}))
+    try:
+        assert compressor.compress_response(Response(BODY), accept('gzip'), key)
+
+        # a second response with the same body reuses the attached bytes
+        monkeypatch.setattr(compressor, 'compress', pytest.fail)
+        response = Response(BODY)
+        assert compressor.compress_response(response, accept('gzip'), key)
+        assert gzip.decompress(response.get_data()) == BODY
+        stats = compressor.stats()
+        assert stats['compressed'] == 1
+        assert stats['reused'] == 1
+        assert stats['ratio'] < 1
+    finally:
+        search_cache.clear()
+
+
+def test_gzip_output_is_deterministic(compressor: Compressor):
+    assert compressor.compress(BODY, 'gzip') == compressor.compress(BODY, 'gzip')
+
+
+def test_configure(monkeypatch, compressor: Compressor):
+    monkeypatch.setenv('COMPRESSION_ENCODINGS', 'gzip')
+    monkeypatch.setenv('COMPRESSION_MIN_SIZE', '2048')
+    monkeypatch.setenv('COMPRESSION_GZIP_LEVEL', '1')
+    compressor.configure(Env())
+    assert compressor.encodings == ['gzip']
+    assert compressor.min_size == 2048
+    assert compressor.gzip_level == 1
+    assert compressor.brotli_quality == 4
+
+
+def test_configure_unknown_encoding(monkeypatch, compressor: Compressor):
+    monkeypatch.setenv('COMPRESSION_ENCODINGS', 'br,zstd')
+    with pytest.raises(ValueError):
+        compressor.configure(Env())
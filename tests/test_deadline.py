@@ -0,0 +1,59 @@
+import time
+
+import pytest
+from environs import Env
+
+from catalog_searcher.search import SearchTimeout
+from catalog_searcher.search.deadline import Deadline, DeadlinePolicy
+
+
+def test_timeout():
+    connect, read = Deadline(10, connect_timeout=3).timeout()
+    assert connect == 3
+    assert 9 < read <= 10
+
+
+def test_connect_timeout_is_limited_by_deadline():
+    connect, read = Deadline(1, connect_timeout=3).timeout()
+    assert connect == read
+    assert 0 < read <= 1
+
+
+def test_expired_deadline():
+    deadline = Deadline(0.01)
+    time.sleep(0.02)
+    assert deadline.expired
+    assert deadline.remaining() == 0
+    with pytest.raises(SearchTimeout):
+        deadline.check()
+    with pytest.raises(SearchTimeout):
+        deadline.timeout()
+
+
+def test_policy():
+    policy = DeadlinePolicy(default_timeout=20, connect_timeout=2, timeouts={'alma': 5})
+    assert policy.deadline('alma').seconds == 5
+    assert policy.deadline('primo').seconds == 20
+    assert policy.deadline('primo', requested=3).seconds == 3
+    assert policy.deadline('alma', requested=30).seconds == 5
+    assert policy.deadline('alma').connect_timeout == 2
+
+
+def test_policy_client_limited():
+    policy = DeadlinePolicy(default_timeout=20)
+    assert not policy.deadline('primo').client_limited
+    assert policy.deadline('primo', requested=3).client_limited
+    assert not policy.deadline('primo', requested=20).client_limited
+    assert not policy.deadline('primo', requested=60).client_limited
+
+
+def test_configure(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('SEARCH_TIMEOUT', '15')
+    monkeypatch.setenv('SEARCH_CONNECT_TIMEOUT', '1.5')
+    monkeypatch.setenv('SEARCH_TIMEOUTS', 'worldcat=8')
+    policy = DeadlinePolicy()
+    policy.configure(Env())
+    assert policy.default_timeout == 15
+    assert policy.connect_timeout == 1.5
+    assert policy.timeout('worldcat') == 8
+    assert policy.timeout('alma') == 15
@@ -0,0 +1,40 @@
+import pytest
+
+from catalog_searcher.search import SearchResult, identifiers
+from catalog_searcher.search.federated import merge_results
+
+
+@pytest.mark.parametrize(
+    ('kwargs', 'expected_identifiers'),
+    [
+        ({}, {}),
+        ({'oclc': '(OCoLC)0007642696'}, {'oclc': '7642696'}),
+        ({'oclc': '(ocolc)1009106548'}, {'oclc': '1009106548'}),
+        ({'mms': '9963619025208238'}, {'mms': '9963619025208238'}),
+        ({'doi': 'https://doi.org/10.1515/ABC'}, {'doi': '10.1515/abc'}),
+        ({'doi': '10.3138/JEHR-2023-0023'}, {'doi': '10.3138/jehr-2023-0023'}),
+    ]
+)
+def test_identifiers(kwargs, expected_identifiers):
+    assert identifiers(**kwargs) == expected_identifiers
+
+
+def test_merge_results_interleaves():
+    a = [SearchResult(title='a1'), SearchResult(title='a2'), SearchResult(title='a3')]
+    b = [SearchResult(title='b1')]
+    assert [r.title for r in merge_results([a, b])] == ['a1', 'b1', 'a2', 'a3']
+
+
+def test_merge_results_removes_duplicates():
+    primo = [
+        SearchResult(title='p1', identifiers={'mms': '991', 'oclc': '123'}),
+        SearchResult(title='p2', identifiers={'doi': '10.1/x'}),
+    ]
+    worldcat = [
+        {'title': 'w1', 'identifiers': {'oclc': '123'}},
+        {'title': 'w2', 'identifiers': {'oclc': '456', 'doi': '10.1/x'}},
+        {'title': 'w3', 'identifiers': {}},
+    ]
+    merged = merge_results([primo, worldcat])
+    titles = [r.title if isinstance(r, SearchResult) else r['title'] for r in merged]
+    assert titles == ['p1', 'p2', 'w3']
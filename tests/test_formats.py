@@ -0,0 +1,51 @@
+from catalog_searcher.search.formats import FormatClassifier, FormatRule
+
+RULES = (
+    FormatRule('mono-video', 'video', 'monographic', forms=('videorecording',), genres=(('marcgt', 'videorecording'),)),
+    FormatRule('mono-print', 'book', 'monographic', forms=('print',)),
+    FormatRule('serial-journal', 'journal', 'serial', genres=(('marcgt', 'periodical'),)),
+)
+
+
+def test_first_matching_rule_wins():
+    classifier = FormatClassifier(RULES)
+
+    # both the video and print rules match; the video rule comes first
+    match = classifier.classify(['monographic'], ['print', 'videorecording'], [])
+    assert match.item_format == 'video'
+    assert match.rule is RULES[0]
+
+
+def test_rule_order_across_issuances():
+    classifier = FormatClassifier(RULES)
+
+    match = classifier.classify(['serial', 'monographic'], ['print'], [('marcgt', 'periodical')])
+    assert match.rule.name == 'mono-print'
+
+
+def test_genre_authority_must_match():
+    classifier = FormatClassifier(RULES)
+
+    assert classifier.classify(['serial'], [], [('fast', 'periodical')]).item_format == 'other'
+    assert classifier.classify(['serial'], [], [('marcgt', 'periodical')]).item_format == 'journal'
+
+
+def test_issuance_must_match():
+    classifier = FormatClassifier(RULES)
+
+    assert classifier.classify(['serial'], ['print'], []).rule is None
+
+
+def test_default_format():
+    classifier = FormatClassifier(RULES, default='unknown')
+
+    match = classifier.classify([], [], [])
+    assert match.item_format == 'unknown'
+    assert match.rule is None
+
+
+def test_classify_accepts_iterators():
+    classifier = FormatClassifier(RULES)
+
+    genres = iter([('marcgt', 'videorecording')])
+    assert classifier.classify(iter(['monographic']), iter([]), genres).item_format == 'video'
@@ -3,7 +3,7 @@ from unittest.mock import MagicMock
 import pytest
 from pymods import Genre, MODSRecord
 
-from catalog_searcher.search.alma import GenreLookup, get_item_format
+from catalog_searcher.search.alma import classify_item, get_item_format
 
 
 @pytest.mark.parametrize(
@@ -32,12 +32,20 @@ def test_get_item_format(issuance, form, genre, expected_format):
     assert get_item_format(item) == expected_format
 
 
-def test_genre_lookup():
-    genre = [('marcgt', 'newspaper'), ('fast', 'Periodicals.')]
-    genre_list = [MagicMock(spec=Genre, authority=g[0], text=g[1]) for g in genre]
+def test_classify_item_reports_rule():
+    genre_list = [
+        MagicMock(spec=Genre, authority=None, text='periodical'),
+        MagicMock(spec=Genre, authority='fast', text='Periodicals.'),
+    ]
+    item = MagicMock(spec=MODSRecord, issuance=['serial'], form=[], genre=genre_list)
+
+    match = classify_item(item)
+    assert match.item_format == 'journal'
+    assert match.rule.name == 'serial-journal'
+
+
+def test_classify_item_ignores_genres_without_authority():
+    genre_list = [MagicMock(spec=Genre, authority=None, text='newspaper')]
+    item = MagicMock(spec=MODSRecord, issuance=['serial'], form=[], genre=genre_list)
 
-    genres = GenreLookup().parse(genre_list)
-    assert 'newspaper' in genres.marcgt
-    assert 'Periodicals.' in genres.fast
-    assert 'foobar' not in genres.marcgt
-    assert 'newspaper' not in genres.foobar
+    assert classify_item(item) == ('other', None)
@@ -0,0 +1,104 @@
+from http import HTTPStatus
+
+import pytest
+from environs import Env
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request, Response
+
+from catalog_searcher.httpcache import HTTPCachePolicy
+
+
+@pytest.fixture
+def policy() -> HTTPCachePolicy:
+    return HTTPCachePolicy(
+        max_age=60,
+        stale_while_revalidate=30,
+        max_ages={'worldcat': 0, 'primo:articles': 300},
+        stale_while_revalidates={'primo': 600},
+    )
+
+
+def make_request(headers: dict[str, str] | None = None, method: str = 'GET') -> Request:
+    return Request(EnvironBuilder(path='/search', method=method, headers=headers).get_environ())
+
+
+@pytest.mark.parametrize(
+    ('backends', 'endpoint', 'expected_freshness'),
+    [
+        (['alma'], 'articles', (60, 30)),
+        (['primo'], 'articles', (300, 600)),
+        (['primo'], 'books-and-more', (60, 600)),
+        (['worldcat'], 'articles', (0, 30)),
+        (['primo', 'alma'], 'articles', (60, 30)),
+        (['primo', 'worldcat'], 'articles', (0, 30)),
+    ]
+)
+def test_freshness(policy: HTTPCachePolicy, backends, endpoint, expected_freshness):
+    assert policy.freshness(backends, endpoint) == expected_freshness
+
+
+def test_apply(policy: HTTPCachePolicy):
+    response = Response(b'{"total":1}', mimetype='application/json')
+    policy.apply(response, make_request(), ['alma'], 'articles')
+    assert response.status_code == HTTPStatus.OK
+    etag, weak = response.get_etag()
+    assert weak
+    assert response.headers['Cache-Control'] == 'public, max-age=60, stale-while-revalidate=30'
+
+    # the same body has the same ETag
+    other_response = Response(b'{"total":1}', mimetype='application/json')
+    policy.apply(other_response, make_request(), ['alma'], 'articles')
+    assert other_response.get_etag() == (etag, True)
+
+    other_response = Response(b'{"total":2}', mimetype='application/json')
+    policy.apply(other_response, make_request(), ['alma'], 'articles')
+    assert other_response.get_etag() != (etag, True)
+
+
+def test_apply_revalidate(policy: HTTPCachePolicy):
+    response = Response(b'{"total":1}', mimetype='application/json')
+    policy.apply(response, make_request(), ['worldcat'], 'articles')
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+
+@pytest.mark.parametrize(
+    ('if_none_match', 'expected_status'),
+    [
+        (None, HTTPStatus.OK),
+        ('W/"{etag}"', HTTPStatus.NOT_MODIFIED),
+        ('"{etag}"', HTTPStatus.NOT_MODIFIED),
+        ('W/"other", W/"{etag}"', HTTPStatus.NOT_MODIFIED),
+        ('*', HTTPStatus.NOT_MODIFIED),
+        ('W/"other"', HTTPStatus.OK),
+    ]
+)
+def test_apply_conditional(policy: HTTPCachePolicy, if_none_match: str | None, expected_status):
+    response = Response(b'{"total":1}', mimetype='application/json')
+    policy.apply(response, make_request(), ['alma'], 'articles')
+    etag, _ = response.get_etag()
+
+    headers = {'If-None-Match': if_none_match.format(etag=etag)} if if_none_match else {}
+    response = Response(b'{"total":1}', mimetype='application/json')
+    policy.apply(response, make_request(headers), ['alma'], 'articles')
+    assert response.status_code == expected_status
+    assert response.get_etag() == (etag, True)
+    assert 'Cache-Control' in response.headers
+
+
+def test_apply_skips_errors(policy: HTTPCachePolicy):
+    response = Response(b'{"error":{}}', status=HTTPStatus.BAD_REQUEST, mimetype='application/json')
+    policy.apply(response, make_request({'If-None-Match': '*'}), ['alma'], 'articles')
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert 'ETag' not in response.headers
+    assert 'Cache-Control' not in response.headers
+
+
+def test_configure(monkeypatch, policy: HTTPCachePolicy):
+    monkeypatch.setenv('HTTP_CACHE_MAX_AGE', '120')
+    monkeypatch.setenv('HTTP_CACHE_MAX_AGES', 'alma=10,primo:journals=20')
+    policy.configure(Env())
+    assert policy.max_age == 120
+    assert policy.stale_while_revalidate == 30
+    assert policy.freshness(['alma'], 'articles') == (10, 30)
+    assert policy.freshness(['primo'], 'journals') == (20, 600)
+    assert policy.freshness(['primo'], 'articles') == (120, 600)
@@ -0,0 +1,78 @@
+from datetime import datetime, timezone
+
+import pytest
+from flask import Flask
+from urlobject import URLObject
+
+from catalog_searcher.jsonprovider import SearchJSONProvider
+from catalog_searcher.search import SearchResult
+
+PAYLOAD = {
+    'results': [
+        SearchResult(
+            title='Feriado',
+            author='Centro de Estudios para la Producción Audiovisual (Argentina)',
+            identifiers={'oclc': '886895', 'doi': '10.1000/182'},
+        ),
+    ],
+    'total': 377254,
+    'next_page': URLObject('http://localhost:5000/search?q=maryland&page=1'),
+    'partial': False,
+    'module_link': None,
+    'raw': {'timings': {'search': 12.3, 'upstream': 10.0}, 'retrieved': datetime(2024, 1, 2, tzinfo=timezone.utc)},
+}
+
+
+@pytest.fixture
+def app() -> Flask:
+    app = Flask(__name__)
+    app.json = SearchJSONProvider(app)
+    app.json.ensure_ascii = False
+    return app
+
+
+@pytest.fixture
+def stdlib_app() -> Flask:
+    stdlib_app = Flask(__name__)
+    stdlib_app.json = SearchJSONProvider(stdlib_app)
+    stdlib_app.json.ensure_ascii = False
+    stdlib_app.json.use_orjson = False  # type: ignore[attr-defined]
+    return stdlib_app
+
+
+@pytest.mark.parametrize('debug', [False, True])
+def test_response_matches_stdlib(app: Flask, stdlib_app: Flask, debug: bool):
+    pytest.importorskip('orjson')
+    app.debug = stdlib_app.debug = debug
+    with app.app_context():
+        response = app.json.response(PAYLOAD)
+    with stdlib_app.app_context():
+        stdlib_response = stdlib_app.json.response(PAYLOAD)
+
+    assert app.json._orjson_dumps(PAYLOAD, {'indent': 2} if debug else {'separators': (',', ':')}) is not None
+    assert response.get_data() == stdlib_response.get_data()
+    assert response.mimetype == 'application/json'
+    assert 'Producción'.encode() in response.get_data()
+
+
+def test_dumps_matches_stdlib(app: Flask, stdlib_app: Flask):
+    assert app.json.dumps(PAYLOAD) == stdlib_app.json.dumps(PAYLOAD)
+    assert app.json.dumps(PAYLOAD, separators=(',', ':')) == stdlib_app.json.dumps(PAYLOAD, separators=(',', ':'))
+
+
+def test_search_result(app: Flask):
+    assert app.json.dumps(SearchResult(title='Maryland'), separators=(',', ':')) == (
+        '{"author":"","availability":"","date":"","description":"","identifiers":{},"item_format":"",'
+        '"link":"","title":"Maryland"}'
+    )
+
+
+def test_ensure_ascii(app: Flask):
+    app.json.ensure_ascii = True
+    assert app.json.dumps({'author': 'Producción'}) == '{"author": "Producci\\u00f3n"}'
+
+
+def test_large_integer(app: Flask):
+    # orjson only supports 64-bit integers
+    with app.app_context():
+        assert app.json.response({'total': 2 ** 70}).get_data() == b'{"total":1180591620717411303424}\n'
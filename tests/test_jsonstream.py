@@ -0,0 +1,78 @@
+import json
+
+import pytest
+from environs import Env
+
+from catalog_searcher.search import jsonstream
+from catalog_searcher.search.jsonstream import KEEP, ResponseDecoder, select
+
+DOCUMENT = {
+    'info': {'total': 2, 'first': 1, 'last': 2},
+    'docs': [
+        {'id': 'a', 'pnx': {'display': {'title': ['A'], 'subject': ['x', 'y']}}, 'score': 1.5},
+        {'id': 'b', 'pnx': {'display': {'subject': []}, 'links': {}}, 'score': 0.5},
+    ],
+    'facets': [{'name': 'type', 'values': [{'value': 'book', 'count': 10}]}],
+}
+
+
+@pytest.mark.parametrize(
+    ('selector', 'expected'),
+    [
+        (KEEP, DOCUMENT),
+        ({}, {}),
+        ({'info': {'total': KEEP}}, {'info': {'total': 2}}),
+        ({'info': KEEP, 'missing': KEEP}, {'info': DOCUMENT['info']}),
+        ({'docs': {'id': KEEP}}, {'docs': [{'id': 'a'}, {'id': 'b'}]}),
+        (
+            {'docs': {'pnx': {'display': {'title': KEEP}}, 'score': KEEP}},
+            {'docs': [{'pnx': {'display': {'title': ['A']}}, 'score': 1.5}, {'pnx': {'display': {}}, 'score': 0.5}]},
+        ),
+        ({'facets': {'values': {'count': KEEP}}}, {'facets': [{'values': [{'count': 10}]}]}),
+    ]
+)
+def test_select(selector, expected):
+    assert select(json.dumps(DOCUMENT).encode(), selector) == expected
+
+
+def test_select_scalar_document():
+    assert select(b'"text"', {'key': KEEP}) == 'text'
+
+
+def test_select_numbers_match_json_loads():
+    body = b'{"int": 10, "float": 1.25, "exp": 1e3, "null": null, "bool": true}'
+    assert select(body, KEEP) == json.loads(body)
+
+
+@pytest.mark.parametrize(
+    ('select_min_bytes', 'selective'),
+    [
+        (0, False),
+        (1, True),
+        (len(json.dumps(DOCUMENT)), True),
+        (len(json.dumps(DOCUMENT)) + 1, False),
+    ]
+)
+def test_response_decoder(monkeypatch, select_min_bytes, selective):
+    calls = []
+    monkeypatch.setattr(jsonstream, 'select', lambda *args: calls.append(args) or select(*args))
+    selector = {'info': {'total': KEEP}}
+
+    data = ResponseDecoder(select_min_bytes).decode(json.dumps(DOCUMENT).encode(), selector)
+
+    assert data == ({'info': {'total': 2}} if selective else DOCUMENT)
+    assert bool(calls) == selective
+
+
+def test_response_decoder_configure(monkeypatch):
+    monkeypatch.setenv('JSON_SELECT_MIN_BYTES', '1048576')
+    decoder = ResponseDecoder()
+    decoder.configure(Env())
+    assert decoder.select_min_bytes == 1048576
+
+
+def test_response_decoder_configure_without_ijson(monkeypatch):
+    monkeypatch.setenv('JSON_SELECT_MIN_BYTES', '1048576')
+    monkeypatch.setattr(jsonstream, 'find_spec', lambda name: None)
+    with pytest.raises(ValueError, match='requires the ijson package'):
+        ResponseDecoder().configure(Env())
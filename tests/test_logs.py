@@ -0,0 +1,114 @@
+import logging
+from io import StringIO
+from queue import Queue
+
+import pytest
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+from catalog_searcher.logs import AccessLogMiddleware, DeferredQueueHandler, QueueLogging
+
+
+def make_record(msg: str, *args) -> logging.LogRecord:
+    return logging.LogRecord('test', logging.INFO, __file__, 1, msg, args, None)
+
+
+def test_immutable_args_are_formatted_later():
+    handler = DeferredQueueHandler(Queue())
+    record = make_record('%s of %d', 'page', 3)
+    handler.emit(record)
+    queued = handler.queue.get_nowait()
+    assert queued.msg == '%s of %d'
+    assert queued.args == ('page', 3)
+    assert queued.getMessage() == 'page of 3'
+
+
+def test_mutable_args_are_formatted_now():
+    handler = DeferredQueueHandler(Queue())
+    values = ['a']
+    record = make_record('values: %s', values)
+    handler.emit(record)
+    values.append('b')
+    queued = handler.queue.get_nowait()
+    assert queued.getMessage() == "values: ['a']"
+    # the original record is left for any other handlers
+    assert record.args == (values,)
+
+
+def test_full_queue_drops_records():
+    handler = DeferredQueueHandler(Queue(maxsize=1))
+    handler.emit(make_record('first'))
+    handler.emit(make_record('second'))
+    assert handler.dropped == 1
+    assert handler.queue.get_nowait().msg == 'first'
+
+
+@pytest.mark.parametrize('enabled', [True, False])
+def test_queue_logging(enabled: bool):
+    stream = StringIO()
+    logger = logging.getLogger(f'test_logs.{enabled}')
+    queue_logging = QueueLogging(enabled=enabled)
+    queue_logging.start(logging.INFO, '%(levelname)s:%(message)s', stream=stream, logger=logger)
+    try:
+        logger.info('found %d results', 10)
+        logger.debug('not logged')
+        try:
+            raise ValueError('bad value')
+        except ValueError:
+            logger.exception('search failed')
+        assert queue_logging.stats()['enabled'] == enabled
+    finally:
+        queue_logging.stop()
+        for handler in logger.handlers[:]:
+            logger.removeHandler(handler)
+
+    lines = stream.getvalue().splitlines()
+    assert lines[0] == 'INFO:found 10 results'
+    assert lines[1] == 'ERROR:search failed'
+    assert lines[-1] == 'ValueError: bad value'
+    assert 'not logged' not in stream.getvalue()
+
+
+def test_queue_logging_leaves_configured_logger_alone():
+    logger = logging.getLogger('test_logs.configured')
+    handler = logging.NullHandler()
+    logger.addHandler(handler)
+    queue_logging = QueueLogging()
+    try:
+        queue_logging.start(logging.INFO, '%(message)s', logger=logger)
+        assert logger.handlers == [handler]
+        assert queue_logging.listener is None
+    finally:
+        logger.removeHandler(handler)
+
+
+def app(environ, start_response):
+    status = int(environ['PATH_INFO'].strip('/') or 200)
+    return Response('{}', status=status, mimetype='application/json')(environ, start_response)
+
+
+@pytest.fixture
+def access_log() -> logging.Logger:
+    logger = logging.getLogger('test_logs.access')
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def test_access_log(caplog, access_log: logging.Logger):
+    client = Client(AccessLogMiddleware(app, logger=access_log))
+    with caplog.at_level(logging.INFO, logger=access_log.name):
+        client.get('/?q=maryland', headers={'User-Agent': 'test', 'X-Forwarded-For': '10.0.0.1'})
+    line, = caplog.messages
+    assert line.startswith('10.0.0.1 - - [')
+    assert line.endswith('] "GET /?q=maryland HTTP/1.1" 200 2 "-" "test"')
+
+
+def test_access_log_sampling(caplog, monkeypatch, access_log: logging.Logger):
+    client = Client(AccessLogMiddleware(app, sample_rate=0.5, logger=access_log))
+    monkeypatch.setattr('catalog_searcher.logs.random.random', iter([0.1, 0.9, 0.9]).__next__)
+    with caplog.at_level(logging.INFO, logger=access_log.name):
+        client.get('/200')
+        client.get('/304')
+        # errors are always logged
+        client.get('/500')
+    assert [message.split('"')[2].split()[0] for message in caplog.messages] == ['200', '500']
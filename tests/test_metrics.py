@@ -0,0 +1,93 @@
+from threading import Thread
+
+from catalog_searcher.metrics import CallbackGauge, Counter, Gauge, Histogram, MetricsRegistry, count_search_error
+from catalog_searcher.search import SearchError, SearchTimeout
+from catalog_searcher.search.breaker import CircuitOpen
+
+
+def test_counter():
+    counter = Counter('requests_total', 'Requests', labels=('backend', 'status'))
+    counter.inc('primo', '200')
+    counter.inc('primo', '200')
+    counter.inc('alma', '500', amount=3)
+
+    assert counter.render() == '\n'.join([
+        '# HELP requests_total Requests',
+        '# TYPE requests_total counter',
+        'requests_total{backend="alma",status="500"} 3',
+        'requests_total{backend="primo",status="200"} 2',
+    ])
+
+
+def test_counter_threads():
+    counter = Counter('requests_total', 'Requests')
+
+    def count():
+        for _ in range(1000):
+            counter.inc()
+
+    threads = [Thread(target=count) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.totals() == {(): 4000}
+
+
+def test_gauge():
+    gauge = Gauge('in_flight', 'In flight')
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    assert gauge.totals() == {(): 1}
+
+
+def test_callback_gauge():
+    gauge = CallbackGauge('queue_depth', 'Queue depth', lambda: {(): 4})
+    assert gauge.render().endswith('\nqueue_depth 4')
+
+
+def test_histogram():
+    histogram = Histogram('duration_seconds', 'Duration', labels=('backend',), buckets=(0.1, 1.0))
+    histogram.observe('primo', value=0.05)
+    histogram.observe('primo', value=0.1)
+    histogram.observe('primo', value=0.5)
+    histogram.observe('primo', value=5.0)
+
+    assert histogram.render().split('\n')[2:] == [
+        'duration_seconds_bucket{backend="primo",le="0.1"} 2',
+        'duration_seconds_bucket{backend="primo",le="1"} 3',
+        'duration_seconds_bucket{backend="primo",le="+Inf"} 4',
+        'duration_seconds_sum{backend="primo"} 5.65',
+        'duration_seconds_count{backend="primo"} 4',
+    ]
+
+
+def test_label_escaping():
+    counter = Counter('queries_total', 'Queries', labels=('query',))
+    counter.inc('say "hi"\\\n')
+    assert counter.render().endswith('queries_total{query="say \\"hi\\"\\\\\\n"} 1')
+
+
+def test_registry():
+    registry = MetricsRegistry()
+    registry.counter('a_total', 'A').inc()
+    registry.gauge('b', 'B')
+
+    assert registry.render() == '# HELP a_total A\n# TYPE a_total counter\na_total 1\n# HELP b B\n# TYPE b gauge\n'
+
+
+def test_count_search_error(monkeypatch):
+    counter = Counter('errors_total', 'Errors', labels=('backend', 'cause'))
+    monkeypatch.setattr('catalog_searcher.metrics.search_errors', counter)
+    for error in (SearchTimeout(), CircuitOpen(), SearchError(cause='connection'), SearchError(), KeyError()):
+        count_search_error('primo', error)
+
+    assert counter.totals() == {
+        ('primo', 'timeout'): 1,
+        ('primo', 'circuit_open'): 1,
+        ('primo', 'connection'): 1,
+        ('primo', 'error'): 1,
+        ('primo', 'exception'): 1,
+    }
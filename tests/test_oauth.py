@@ -0,0 +1,84 @@
+import json
+from http import HTTPStatus
+
+import httpretty
+import pytest
+import requests
+
+from catalog_searcher.search import SearchTimeout
+from catalog_searcher.search.deadline import Deadline
+from catalog_searcher.search.oauth import TokenManager, clear_token_managers, get_token_manager
+
+TOKEN_URL = 'https://auth.example.com/token'
+
+
+def register_token_url(*tokens: str, expires_in: int | None = 1200):
+    httpretty.register_uri(
+        uri=TOKEN_URL,
+        method=httpretty.POST,
+        responses=[
+            httpretty.Response(
+                body=json.dumps({'access_token': token, **({'expires_in': expires_in} if expires_in else {})}),
+                status=HTTPStatus.OK,
+                adding_headers={'Content-Type': 'application/json'},
+            )
+            for token in tokens
+        ],
+    )
+
+
+@pytest.fixture
+def token_manager() -> TokenManager:
+    return TokenManager(TOKEN_URL, client_id='CLIENT_ID', client_secret='SECRET', scope='test', refresh_margin=60)
+
+
+@httpretty.activate
+def test_token_is_cached(token_manager: TokenManager):
+    register_token_url('TOKEN1', 'TOKEN2')
+    assert token_manager.get_token() == 'TOKEN1'
+    assert token_manager.get_token() == 'TOKEN1'
+    assert len(httpretty.latest_requests()) == 1
+
+
+@httpretty.activate
+def test_token_without_expiry_is_not_cached(token_manager: TokenManager):
+    register_token_url('TOKEN1', 'TOKEN2', expires_in=None)
+    assert token_manager.get_token() == 'TOKEN1'
+    assert token_manager.get_token() == 'TOKEN2'
+
+
+@httpretty.activate
+def test_token_refreshed_within_margin(token_manager: TokenManager):
+    register_token_url('TOKEN1', 'TOKEN2', expires_in=30)
+    assert token_manager.get_token() == 'TOKEN1'
+    assert token_manager.get_token() == 'TOKEN2'
+
+
+@httpretty.activate
+def test_invalidate(token_manager: TokenManager):
+    register_token_url('TOKEN1', 'TOKEN2', 'TOKEN3')
+    assert token_manager.get_token() == 'TOKEN1'
+    token_manager.invalidate('OTHER_TOKEN')
+    assert token_manager.get_token() == 'TOKEN1'
+    token_manager.invalidate('TOKEN1')
+    assert token_manager.get_token() == 'TOKEN2'
+    token_manager.invalidate()
+    assert token_manager.get_token() == 'TOKEN3'
+
+
+def test_get_token_manager():
+    clear_token_managers()
+    manager = get_token_manager(TOKEN_URL, 'CLIENT_ID', 'SECRET', 'test')
+    assert get_token_manager(TOKEN_URL, 'CLIENT_ID', 'SECRET', 'test') is manager
+    assert get_token_manager(TOKEN_URL, 'OTHER_CLIENT_ID', 'SECRET', 'test') is not manager
+    assert get_token_manager(TOKEN_URL, 'CLIENT_ID', 'NEW_SECRET', 'test') is not manager
+
+
+def test_token_request_timeout(token_manager: TokenManager, monkeypatch: pytest.MonkeyPatch):
+    def read_timeout(*_args, **kwargs):
+        assert kwargs['timeout'] is not None
+        raise requests.ReadTimeout
+
+    monkeypatch.setattr(requests.Session, 'post', read_timeout)
+    with pytest.raises(SearchTimeout):
+        token_manager.get_token(deadline=Deadline(5))
@@ -0,0 +1,57 @@
+from http import HTTPStatus
+
+import httpretty
+import pytest
+from environs import Env
+
+from catalog_searcher.search.pool import SessionPool
+
+
+@pytest.fixture
+def pool() -> SessionPool:
+    return SessionPool(pool_size=5, max_idle=60.0, host_limits={'b.example.com': 2})
+
+
+def test_session_per_host(pool: SessionPool):
+    session_a = pool.session('https://a.example.com/search?q=foo')
+    assert pool.session('https://a.example.com/other') is session_a
+    assert pool.session('https://b.example.com/search') is not session_a
+
+
+def test_host_limits(pool: SessionPool):
+    adapter_a = pool.session('https://a.example.com/').get_adapter('https://a.example.com/')
+    adapter_b = pool.session('https://b.example.com/').get_adapter('https://b.example.com/')
+    assert adapter_a._pool_maxsize == 5
+    assert adapter_b._pool_maxsize == 2
+
+
+def test_idle_reset(pool: SessionPool):
+    pool.max_idle = 0
+    session = pool.session('https://a.example.com/')
+    assert pool.session('https://a.example.com/') is not session
+    assert pool.stats()['a.example.com']['idle_resets'] == 1
+
+
+@httpretty.activate
+def test_stats(pool: SessionPool):
+    httpretty.register_uri(uri='https://a.example.com/search', method=httpretty.GET, status=HTTPStatus.OK, body='ok')
+    pool.get('https://a.example.com/search')
+    pool.get('https://a.example.com/search')
+    stats = pool.stats()['a.example.com']
+    assert stats['requests'] == 2
+    assert stats['sessions_created'] == 1
+    assert stats['max_connections'] == 5
+
+
+def test_configure(pool: SessionPool, monkeypatch: pytest.MonkeyPatch):
+    session = pool.session('https://a.example.com/')
+    monkeypatch.setenv('HTTP_POOL_SIZE', '20')
+    monkeypatch.setenv('HTTP_POOL_MAX_IDLE', '30')
+    monkeypatch.setenv('HTTP_POOL_HOST_LIMITS', 'a.example.com=3')
+    monkeypatch.setenv('HTTP_POOL_BLOCK', 'true')
+    pool.configure(Env())
+    assert pool.pool_size == 20
+    assert pool.max_idle == 30.0
+    assert pool.host_limits == {'a.example.com': 3}
+    assert pool.block
+    assert pool.session('https://a.example.com/') is not session
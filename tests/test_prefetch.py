@@ -0,0 +1,97 @@
+from threading import Event
+
+import pytest
+from environs import Env
+
+from catalog_searcher.search.breaker import circuit_breakers
+from catalog_searcher.search.prefetch import Prefetcher
+
+
+@pytest.fixture(autouse=True)
+def reset_breakers():
+    circuit_breakers.reset()
+
+
+@pytest.fixture
+def prefetcher():
+    prefetcher = Prefetcher(enabled=True, queue_size=3, budget=2)
+    yield prefetcher
+    prefetcher.shutdown()
+
+
+def test_prefetch(prefetcher: Prefetcher):
+    calls = []
+
+    assert prefetcher.submit('primo', 'key', lambda: calls.append(1))
+    prefetcher.shutdown()
+
+    assert calls == [1]
+    assert prefetcher.stats() == {
+        'enabled': True, 'pending': 0, 'scheduled': 1, 'completed': 1, 'failed': 0, 'dropped': 0, 'unhealthy': 0,
+    }
+
+
+def test_prefetch_disabled():
+    prefetcher = Prefetcher()
+    assert not prefetcher.submit('primo', 'key', lambda: None)
+    assert prefetcher.stats()['scheduled'] == 0
+
+
+def test_prefetch_limits(prefetcher: Prefetcher):
+    release = Event()
+
+    def blocked():
+        release.wait(5)
+
+    assert prefetcher.submit('primo', 'page 1', blocked)
+    # the same search is only scheduled once
+    assert not prefetcher.submit('primo', 'page 1', blocked)
+    assert prefetcher.submit('primo', 'page 2', blocked)
+    # over the budget for this backend
+    assert not prefetcher.submit('primo', 'page 3', blocked)
+    assert prefetcher.submit('alma', 'page 1 (alma)', blocked)
+    # the queue is full
+    assert not prefetcher.submit('worldcat', 'page 1 (worldcat)', blocked)
+    assert prefetcher.stats()['dropped'] == 2
+    assert prefetcher.stats()['pending'] == 3
+
+    release.set()
+    prefetcher.shutdown()
+    assert prefetcher.stats()['pending'] == 0
+    assert prefetcher.submit('primo', 'page 3', lambda: None)
+
+
+def test_prefetch_failure(prefetcher: Prefetcher):
+    def fail():
+        raise RuntimeError('upstream error')
+
+    assert prefetcher.submit('primo', 'key', fail)
+    prefetcher.shutdown()
+    assert prefetcher.stats()['failed'] == 1
+
+
+@pytest.mark.parametrize(
+    ('failed', 'duration', 'expected'),
+    [
+        (False, 0.1, True),
+        (True, 0.1, False),
+        (False, 5.0, False),
+    ]
+)
+def test_prefetch_only_healthy_backends(prefetcher: Prefetcher, failed: bool, duration: float, expected: bool):
+    circuit_breakers.get('primo').record(failed=failed, duration=duration)
+
+    assert prefetcher.healthy('primo') is expected
+    assert prefetcher.submit('primo', 'key', lambda: None) is expected
+    assert prefetcher.stats()['unhealthy'] == int(not expected)
+
+
+def test_configure(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('PREFETCH_ENABLED', 'true')
+    monkeypatch.setenv('PREFETCH_BUDGET', '1')
+    prefetcher = Prefetcher()
+    prefetcher.configure(Env())
+
+    assert prefetcher.enabled
+    assert prefetcher.budget == 1
+    assert prefetcher.queue_size == 16
@@ -1,3 +1,5 @@
+import json
+from dataclasses import asdict
 from pathlib import Path
 from typing import Callable
 
@@ -6,8 +8,10 @@ import pytest
 import requests
 from environs import Env
 
-from catalog_searcher.search import SearchError
-from catalog_searcher.search.primo import PrimoSearch, parse_field
+from catalog_searcher.search import SearchError, SearchTimeout
+from catalog_searcher.search.deadline import Deadline
+from catalog_searcher.search.jsonstream import response_decoder
+from catalog_searcher.search.primo import PNXExtractor, PNXField, PrimoSearch, get_subfield, parse_field
 
 
 @httpretty.activate
@@ -63,10 +67,29 @@ def test_primo_search_connection_error(
     monkeypatch: pytest.MonkeyPatch,
     raise_connection_error: Callable,
 ):
-    monkeypatch.setattr(requests, 'get', raise_connection_error)
+    monkeypatch.setattr(requests.Session, 'get', raise_connection_error)
 
-    with pytest.raises(SearchError):
+    with pytest.raises(SearchError) as exc_info:
         primo_article_search()
+    assert exc_info.value.cause == 'connection'
+
+
+def test_primo_search_timeout(env: Env, monkeypatch: pytest.MonkeyPatch):
+    timeouts = []
+
+    def read_timeout(*_args, **kwargs):
+        timeouts.append(kwargs['timeout'])
+        raise requests.ReadTimeout
+
+    monkeypatch.setattr(requests.Session, 'get', read_timeout)
+    search = PrimoSearch(PrimoSearch.configure(env), endpoint='articles', query='maryland', page=0, per_page=3,
+                         deadline=Deadline(10, connect_timeout=2))
+
+    with pytest.raises(SearchTimeout):
+        search()
+    connect, read = timeouts[0]
+    assert connect == 2
+    assert 9 < read <= 10
 
 
 @pytest.mark.parametrize(
@@ -82,3 +105,56 @@ def test_primo_search_connection_error(
 )
 def test_parse_field(field, expected_dict):
     assert parse_field(field) == expected_dict
+
+
+@pytest.mark.parametrize(
+    'field',
+    ['', '$$Afoo', '$$Afoo$$B123', '$$Afoo$$B123$$C', 'foo$$Qbar', 'notags', '$$Afoo$$Abar'],
+)
+@pytest.mark.parametrize('code', ['A', 'B', 'C', 'Q'])
+def test_get_subfield(field, code):
+    assert get_subfield(field, code) == parse_field(field).get(code)
+
+
+@httpretty.activate
+@pytest.mark.parametrize('include_raw', [True, False])
+@pytest.mark.parametrize('select_min_bytes', [0, 1])
+def test_primo_search_selective_decoding(
+    monkeypatch: pytest.MonkeyPatch,
+    primo_book_search: PrimoSearch,
+    primo_book_search_request_args: dict[str, str],
+    include_raw: bool,
+    select_min_bytes: int,
+):
+    httpretty.register_uri(**primo_book_search_request_args)
+    monkeypatch.setattr(response_decoder, 'select_min_bytes', select_min_bytes)
+    primo_book_search.include_raw = include_raw
+    response = primo_book_search()
+
+    expected = json.loads(primo_book_search_request_args['body'])
+    assert response.total == expected['info']['total']
+    assert [asdict(result) for result in response.results] == [
+        asdict(primo_book_search.parse_result(doc)) for doc in expected['docs']
+    ]
+    assert ('data' in response.raw) == include_raw
+
+
+@pytest.mark.parametrize(('name', 'query'), [('article', 'maryland'), ('book', 'black metal')])
+def test_parse_result_matches_fixtures(shared_datadir: Path, env: Env, name: str, query: str):
+    search = PrimoSearch(PrimoSearch.configure(env), endpoint='articles', query=query, page=0, per_page=3)
+    data = json.loads((shared_datadir / f'primo_{name}_search_response.json').read_text())
+    expected = json.loads((shared_datadir / f'primo_{name}_search_results.json').read_text())
+
+    assert [asdict(search.parse_result(doc)) for doc in data['docs']] == expected
+
+
+def test_pnx_extractor():
+    extractor = PNXExtractor([
+        PNXField('date', 'display', ('date', 'creationdate')),
+        PNXField('creators', 'display', ('creator', 'contributor'), multiple=True),
+        PNXField('doi', 'addata', ('doi',)),
+    ])
+    pnx = {'display': {'creationdate': ['2014'], 'contributor': ['A', 'B']}, 'addata': {'doi': []}}
+
+    assert extractor.extract(pnx) == {'date': '2014', 'creators': ['A', 'B'], 'doi': None}
+    assert extractor.extract({}) == {'date': None, 'creators': [], 'doi': None}
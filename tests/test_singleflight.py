@@ -0,0 +1,130 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+
+import pytest
+
+from catalog_searcher.search import SearchError
+from catalog_searcher.search.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def wait_for_followers(flights: SingleFlight, count: int):
+    deadline = time.monotonic() + 5
+    while flights.collapsed < count and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def test_concurrent_calls_are_collapsed():
+    flights = SingleFlight()
+    release = Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return 'result'
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = [executor.submit(flights.do, 'key', fn) for _ in range(5)]
+        wait_for_followers(flights, 4)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert results == ['result'] * 5
+    assert len(calls) == 1
+    assert flights.stats() == {'in_flight': 0, 'calls': 1, 'collapsed': 4}
+
+
+def test_errors_are_propagated():
+    flights = SingleFlight()
+    release = Event()
+
+    def fn():
+        release.wait(5)
+        raise SearchError('Search error')
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(flights.do, 'key', fn) for _ in range(3)]
+        wait_for_followers(flights, 2)
+        release.set()
+        for future in futures:
+            with pytest.raises(SearchError):
+                future.result()
+
+    # the failed call is not remembered
+    assert flights.do('key', lambda: 'retry') == 'retry'
+
+
+def test_follower_timeout():
+    flights = SingleFlight()
+    release = Event()
+
+    def fn():
+        release.wait(5)
+        return 'result'
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(flights.do, 'key', fn)
+        while flights.stats()['in_flight'] == 0:
+            time.sleep(0.001)
+        with pytest.raises(TimeoutError):
+            flights.do('key', fn, timeout=0.01)
+        release.set()
+        # the shared call is not interrupted
+        assert leader.result() == 'result'
+
+
+def test_different_keys_are_not_collapsed():
+    flights = SingleFlight()
+    assert flights.do('a', lambda: 1) == 1
+    assert flights.do('b', lambda: 2) == 2
+    assert flights.stats()['collapsed'] == 0
+
+
+def test_async_concurrent_calls_are_collapsed():
+    flights = AsyncSingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'result'
+
+    async def run():
+        return await asyncio.gather(*(flights.do('key', fn) for _ in range(5)))
+
+    assert asyncio.run(run()) == ['result'] * 5
+    assert len(calls) == 1
+    assert flights.stats() == {'in_flight': 0, 'calls': 1, 'collapsed': 4}
+
+
+def test_async_errors_are_propagated():
+    flights = AsyncSingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.01)
+        raise SearchError('Search error')
+
+    async def run():
+        return await asyncio.gather(*(flights.do('key', fn) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, SearchError) for result in asyncio.run(run()))
+    assert flights.stats()['in_flight'] == 0
+
+
+def test_async_cancelled_follower_does_not_cancel_call():
+    flights = AsyncSingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.05)
+        return 'result'
+
+    async def run():
+        leader = asyncio.create_task(flights.do('key', fn))
+        follower = asyncio.create_task(flights.do('key', fn))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        return await leader
+
+    assert asyncio.run(run()) == 'result'
@@ -0,0 +1,48 @@
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from pymods import MODSReader, MODSRecord
+
+from catalog_searcher.search.alma import AlmaSearch
+from catalog_searcher.search.sru import SRUReader
+
+
+@pytest.fixture
+def alma_response(shared_datadir: Path) -> bytes:
+    return (shared_datadir / 'alma_response.xml').read_bytes()
+
+
+def test_total(alma_response: bytes):
+    assert SRUReader(BytesIO(alma_response)).total == 108
+
+
+def test_records(alma_response: bytes):
+    records = list(SRUReader(BytesIO(alma_response)))
+    assert len(records) == 3
+    assert all(isinstance(record, MODSRecord) for record in records)
+
+
+def test_same_results_as_mods_reader(alma_search: AlmaSearch, alma_response: bytes):
+    expected = [alma_search.parse_result(record) for record in MODSReader(BytesIO(alma_response))]
+    assert [alma_search.parse_result(record) for record in SRUReader(BytesIO(alma_response))] == expected
+
+
+def test_consumed_records_are_cleared(alma_response: bytes):
+    records = list(SRUReader(BytesIO(alma_response)))
+    root = records[-1].getroottree().getroot()
+    # only the last record is still attached to the document, and it has been emptied
+    sru_records = root.findall('{http://www.loc.gov/zing/srw/}records/{http://www.loc.gov/zing/srw/}record')
+    assert len(sru_records) == 1
+    assert len(sru_records[0]) == 0
+
+
+def test_no_records():
+    response = (
+        b'<searchRetrieveResponse xmlns="http://www.loc.gov/zing/srw/">'
+        b'<version>1.2</version><numberOfRecords>0</numberOfRecords>'
+        b'</searchRetrieveResponse>'
+    )
+    reader = SRUReader(BytesIO(response))
+    assert reader.total == 0
+    assert list(reader) == []
@@ -0,0 +1,35 @@
+import pytest
+
+from catalog_searcher.search.timing import Timings
+
+
+def test_phase(monkeypatch):
+    clock = iter([1.0, 1.25, 2.0, 2.5])
+    monkeypatch.setattr('catalog_searcher.search.timing.time.perf_counter', lambda: next(clock))
+    timings = Timings()
+    with timings.phase('upstream'):
+        pass
+    with pytest.raises(RuntimeError):
+        with timings.phase('upstream'):
+            raise RuntimeError
+
+    # the durations of repeated phases add up, including those that failed
+    assert timings.durations == {'upstream': 0.75}
+
+
+def test_update():
+    timings = Timings()
+    timings.add('search', 0.5)
+    timings.update({'upstream': 0.25, 'parse': 0.125}, prefix='articles.')
+    timings.update({'upstream': 0.25})
+
+    assert timings.durations == {'search': 0.5, 'articles.upstream': 0.25, 'articles.parse': 0.125, 'upstream': 0.25}
+
+
+def test_server_timing():
+    timings = Timings()
+    timings.add('auth', 0.01234)
+    timings.add('upstream', 0.5)
+
+    assert timings.milliseconds() == {'auth': 12.3, 'upstream': 500.0}
+    assert timings.server_timing() == 'auth;dur=12.3, upstream;dur=500.0'
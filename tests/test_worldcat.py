@@ -10,9 +10,16 @@ from pytest import MonkeyPatch
 from requests import ConnectionError
 
 from catalog_searcher.search import SearchError
+from catalog_searcher.search.jsonstream import response_decoder
+from catalog_searcher.search.oauth import clear_token_managers
 from catalog_searcher.search.worldcat import WorldcatSearch
 
 
+@pytest.fixture(autouse=True)
+def clear_tokens():
+    clear_token_managers()
+
+
 @pytest.fixture
 def response_body(datadir) -> str:
     return (datadir / 'response.json').read_text()
@@ -25,10 +32,16 @@ def no_records_response_body(datadir) -> str:
 
 @pytest.fixture
 def search(env: Env) -> WorldcatSearch:
-    return WorldcatSearch(env, endpoint='books-and-more', query='maryland', page=1, per_page=3)
+    return WorldcatSearch(
+        WorldcatSearch.configure(env),
+        endpoint='books-and-more',
+        query='maryland',
+        page=1,
+        per_page=3,
+    )
 
 
-def register_auth_url(token: str = 'TOKEN', status: int = HTTPStatus.OK):
+def register_auth_url(token: str = 'TOKEN', status: int = HTTPStatus.OK, expires_in: int | None = None):
     if status >= HTTPStatus.BAD_REQUEST:
         # we are mocking an error response, omit the token from the body
         httpretty.register_uri(
@@ -42,7 +55,7 @@ def register_auth_url(token: str = 'TOKEN', status: int = HTTPStatus.OK):
             method=httpretty.POST,
             status=status,
             adding_headers={'Content-Type': 'application/json'},
-            body=json.dumps({'access_token': token}),
+            body=json.dumps({'access_token': token, **({'expires_in': expires_in} if expires_in else {})}),
         )
 
 
@@ -52,13 +65,13 @@ def register_search_url(search: WorldcatSearch) -> Callable:
         if status >= HTTPStatus.BAD_REQUEST:
             # we are mocking an error response, omit the body form the response
             httpretty.register_uri(
-                uri=search.search_url.url,
+                uri=search.config.search_url,
                 method=httpretty.GET,
                 status=status,
             )
         else:
             httpretty.register_uri(
-                uri=search.search_url.url,
+                uri=search.config.search_url,
                 method=httpretty.GET,
                 status=status,
                 adding_headers={'Content-Type': 'application/json'},
@@ -77,8 +90,65 @@ def test_worldcat_search(register_search_url: Callable, response_body: str, sear
 
     assert response.total == 868034
     assert response.module_link == 'https://umaryland.on.worldcat.org/search?expandSearch=off&queryString=maryland'
-    assert response.results[0]['title'] == "Michie's annotated code of the public general laws of Maryland"
-    assert response.results[0]['link'] == 'https://umaryland.on.worldcat.org/oclc/886895'
+    assert response.results[0].title == "Michie's annotated code of the public general laws of Maryland"
+    assert response.results[0].link == 'https://umaryland.on.worldcat.org/oclc/886895'
+    assert list(search.timings.durations) == ['auth', 'upstream', 'parse']
+
+
+@httpretty.activate
+@pytest.mark.parametrize('select_min_bytes', [0, 1])
+def test_worldcat_search_selective_decoding(
+    monkeypatch: MonkeyPatch,
+    register_search_url: Callable,
+    response_body: str,
+    env: Env,
+    select_min_bytes: int,
+):
+    register_auth_url()
+    register_search_url(body=response_body)
+    monkeypatch.setattr(response_decoder, 'select_min_bytes', select_min_bytes)
+    config = WorldcatSearch.configure(env)
+
+    full_response = WorldcatSearch(config, 'books-and-more', 'maryland', 1, 3, include_raw=True)()
+    selective_response = WorldcatSearch(config, 'books-and-more', 'maryland', 1, 3, include_raw=False)()
+
+    assert selective_response.results == full_response.results
+    assert selective_response.total == full_response.total
+    assert full_response.raw == json.loads(response_body)
+    assert selective_response.raw == {}
+
+
+@httpretty.activate
+def test_worldcat_search_reuses_auth_token(register_search_url: Callable, response_body: str, search: WorldcatSearch):
+    register_auth_url(expires_in=1199)
+    register_search_url(body=response_body)
+
+    search()
+    search()
+
+    auth_requests = [r for r in httpretty.latest_requests() if r.path.startswith('/token')]
+    assert len(auth_requests) == 1
+
+
+@httpretty.activate
+def test_worldcat_search_unauthorized_retry(register_search_url: Callable, response_body: str, search: WorldcatSearch):
+    register_auth_url(expires_in=1199)
+    httpretty.register_uri(
+        uri=search.config.search_url,
+        method=httpretty.GET,
+        responses=[
+            httpretty.Response(body='', status=HTTPStatus.UNAUTHORIZED),
+            httpretty.Response(body=response_body, status=HTTPStatus.OK, adding_headers={
+                'Content-Type': 'application/json',
+            }),
+        ],
+    )
+
+    response = search()
+
+    assert response.total == 868034
+    auth_requests = [r for r in httpretty.latest_requests() if r.path.startswith('/token')]
+    assert len(auth_requests) == 2
 
 
 @httpretty.activate
@@ -100,8 +170,9 @@ def test_worldcat_search_bad_request(register_search_url: Callable, search: Worl
     register_auth_url()
     register_search_url(status=HTTPStatus.BAD_REQUEST)
 
-    with pytest.raises(SearchError):
+    with pytest.raises(SearchError) as exc_info:
         search()
+    assert exc_info.value.status == HTTPStatus.BAD_REQUEST
 
 
 def raise_connection_error(*_args, **_kwargs):
@@ -112,36 +183,40 @@ def raise_connection_error(*_args, **_kwargs):
 def test_worldcat_search_connection_error(search: WorldcatSearch, monkeypatch: MonkeyPatch):
     register_auth_url()
 
-    monkeypatch.setattr(requests, 'get', raise_connection_error)
+    monkeypatch.setattr(requests.Session, 'get', raise_connection_error)
     with pytest.raises(SearchError):
         search()
 
 
 def test_auth_connection_error(search: WorldcatSearch, monkeypatch: MonkeyPatch):
-    monkeypatch.setattr(requests, 'post', raise_connection_error)
-    with pytest.raises(RuntimeError):
+    monkeypatch.setattr(requests.Session, 'post', raise_connection_error)
+    with pytest.raises(SearchError) as exc_info:
         search.get_auth_token()
+    assert exc_info.value.cause == 'auth'
 
 
 @httpretty.activate
 def test_auth_bad_request(search: WorldcatSearch):
     register_auth_url(status=HTTPStatus.BAD_REQUEST)
-    with pytest.raises(RuntimeError):
+    with pytest.raises(SearchError) as exc_info:
         search.get_auth_token()
+    assert exc_info.value.cause == 'auth'
 
 
 @httpretty.activate
 def test_auth_none_token(search: WorldcatSearch):
     register_auth_url(token=None)
-    with pytest.raises(RuntimeError):
+    with pytest.raises(SearchError) as exc_info:
         search.get_auth_token()
+    assert exc_info.value.cause == 'auth'
 
 
 @httpretty.activate
 def test_auth_empty_token(search: WorldcatSearch):
     register_auth_url(token='')
-    with pytest.raises(RuntimeError):
+    with pytest.raises(SearchError) as exc_info:
         search.get_auth_token()
+    assert exc_info.value.cause == 'auth'
 
 
 @pytest.mark.parametrize(